@@ -0,0 +1,56 @@
+# alignment.py — Smallow • Satu frame lebar yang sejajar waktu untuk KPI, grafik & AI coach
+# ==========================================================
+# main.py mengirim ke-11 variabel dalam satu payload, tetapi timestamp tiap variabel bisa
+# berbeda beberapa milidetik sehingga pivot_table biasa menghasilkan baris-baris jarang (banyak NaN).
+# align_wide mengelompokkan timestamp yang berdekatan (≤ toleransi) menjadi satu baris lalu
+# mengisi array padat per variabel — dibangun sekali per refresh dan dipakai ulang di semua bagian.
+
+import numpy as np
+import pandas as pd
+
+ALIGN_TOLERANCE_MS = 2000   # titik dalam 2 detik dianggap satu payload
+
+
+def align_wide(df_long: pd.DataFrame, tz: str, tolerance_ms: int = ALIGN_TOLERANCE_MS) -> pd.DataFrame:
+    """
+    Long [time, value, variable] → wide (index time_local, satu kolom per variabel, float64).
+    Timestamp baris = timestamp pertama di kelompoknya; jika satu variabel muncul dua kali
+    dalam kelompok yang sama, nilai terakhir yang dipakai (seperti aggfunc="last").
+    """
+    if df_long.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], tz=tz, name="time_local"), dtype=np.float64)
+    t_ms = (pd.to_datetime(df_long["time"], utc=True).astype("int64") // 1_000_000).to_numpy()
+    values = pd.to_numeric(df_long["value"], errors="coerce").to_numpy(np.float64)
+    var = pd.Categorical(df_long["variable"].astype(str))
+
+    order = np.argsort(t_ms, kind="stable")
+    t_sorted = t_ms[order]
+    breaks = np.diff(t_sorted) > tolerance_ms
+    row = np.concatenate(([0], np.cumsum(breaks)))
+    row_time = t_sorted[np.concatenate(([0], np.flatnonzero(breaks) + 1))]
+
+    dense = np.full((len(row_time), len(var.categories)), np.nan)
+    dense[row, var.codes[order]] = values[order]
+    index = pd.DatetimeIndex(pd.to_datetime(row_time, unit="ms", utc=True).tz_convert(tz), name="time_local")
+    return pd.DataFrame(dense, index=index, columns=list(var.categories))
+
+
+def latest_values(wide: pd.DataFrame) -> pd.DataFrame:
+    """Nilai valid terakhir per variabel → [variable, time_local, value] (urutan kolom wide)."""
+    rows = []
+    for col in wide.columns:
+        arr = wide[col].to_numpy()
+        valid = np.flatnonzero(~np.isnan(arr))
+        if valid.size:
+            rows.append({"variable": col, "time_local": wide.index[valid[-1]], "value": arr[valid[-1]]})
+    return pd.DataFrame(rows, columns=["variable", "time_local", "value"])
+
+
+def to_long(wide: pd.DataFrame, vars_) -> pd.DataFrame:
+    """Kolom terpilih → long [time_local, variable, value] tanpa NaN (untuk Altair)."""
+    cols = [v for v in vars_ if v in wide.columns]
+    if not cols:
+        return pd.DataFrame(columns=["time_local", "variable", "value"])
+    return (wide[cols].reset_index()
+            .melt(id_vars="time_local", var_name="variable", value_name="value")
+            .dropna(subset=["value"]))
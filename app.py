@@ -6,52 +6,31 @@
 import sys
 import time
 from datetime import datetime, timezone
-import requests
-import pandas as pd
-import numpy as np
-import altair as alt
+
 import streamlit as st
 
-# ---- Guard untuk pymongo agar errornya jelas jika belum ter-install
-try:
-    from pymongo import MongoClient, UpdateOne
-except ModuleNotFoundError:
-    st.error(
-        "✖ Modul 'pymongo' belum ter-install.\n"
-        "Tambahkan baris berikut ke requirements.txt, lalu Clear cache & Reboot app:\n\n"
-        "pymongo[srv]==4.9.2"
-    )
-    st.stop()
+# pandas/numpy/altair/pymongo & modul repo dimuat saat pertama dipakai (lihat smallow/__init__.py)
+from smallow import (PYMONGO_HINT, Settings, alignment, alt, available, downsample, mongo_store, mqtt_feed,
+                     pd, sleep_analysis, sleep_sessions, ubidots_client)
+from smallow.loaders import get_feed, load_wide
+from stage_timing import TIMINGS
 
 # ================== KONFIGURASI via Secrets ==================
-TOKEN    = st.secrets.get("UBIDOTS_TOKEN", "")
-DEVICE   = st.secrets.get("UBIDOTS_DEVICE", "smallow")
-BASE     = st.secrets.get("UBIDOTS_BASE", "https://industrial.api.ubidots.com")
-
-# 📌 REVISI 1: DAFTAR VARIABEL HARUS SESUAI DENGAN main.py
-VARS = [
-    "temp-c", 
-    "hum-rh", 
-    "co2-ppm", 
-    "tvoc-ppb", 
-    "max-red", 
-    "max-ir", 
-    "fsr1-raw", # FSR1 & FSR2 digunakan untuk deteksi tidur
-    "fsr2-raw",
-    "eog-mag",  # EOG digunakan untuk deteksi kantuk/aktivitas
-    "vibration",
-    "lead-off"
-]
-VARS_STR = ",".join(VARS) # Digunakan untuk Secrets jika perlu default value
-VARS     = [v.strip() for v in st.secrets.get("UBIDOTS_VARS", VARS_STR).split(",") if v.strip()]
-LOCAL_TZ = st.secrets.get("LOCAL_TZ", "Asia/Jakarta")
-
-# MongoDB Atlas
-MONGO_URI = st.secrets.get("MONGO_URI", "")
-DB_NAME   = st.secrets.get("MONGO_DB", "smallow")
-COLL_NAME = st.secrets.get("MONGO_COLL", "sensor_data")
-
-HEADERS = {"X-Auth-Token": TOKEN, "Content-Type": "application/json"}
+# 📌 REVISI 1: DAFTAR VARIABEL default = smallow.DEFAULT_VARS (sesuai main.py); UBIDOTS_VARS menggantinya
+CFG = Settings(st.secrets)
+TOKEN, DEVICE, BASE, VARS, LOCAL_TZ = CFG.token, CFG.device, CFG.base, CFG.vars, CFG.local_tz
+
+# MongoDB Atlas; READ_ONLY → ingest.py yang menarik & menyimpan data, dashboard hanya membaca MongoDB
+MONGO_URI, DB_NAME, COLL_NAME, READ_ONLY = CFG.mongo_uri, CFG.db_name, CFG.coll_name, CFG.read_only
+
+# MQTT (opsional): broker Ubidots atau broker lokal (mosquitto) → KPI terbaru tanpa polling
+MQTT_HOST, MQTT_PORT = CFG.mqtt_host, CFG.mqtt_port
+
+# Histogram waktu per tahap → GET http://127.0.0.1:<METRICS_PORT>/metrics (format Prometheus); 0 = mati
+METRICS_PORT = CFG.metrics_port
+
+# Refresh per bagian (st.fragment): KPI cepat, grafik tiap `refresh` detik, AI coach hanya saat malam baru
+KPI_EVERY_S = 2
 
 # Target/heuristik AI
 TARGET_SLEEP_H = 8.0
@@ -64,193 +43,188 @@ TARGET_TVOC = 250        # ppb (Target TVOC di bawah 250)
 st.set_page_config(page_title="Smallow • AI Sleep Dashboard", layout="wide")
 st.title("😴 Smallow • Realtime Sleep & Environment Dashboard")
 
-refresh = st.sidebar.slider("Refresh (detik)", 5, 60, 10)
+refresh = st.sidebar.slider("Refresh grafik (detik)", 5, 60, 10)
 days    = st.sidebar.slider("Rentang data (hari)", 1, 30, 7)
 limit   = st.sidebar.slider("Jumlah titik/variabel", 50, 1000, 400, step=50)
+chart_ds = st.sidebar.selectbox("Downsampling grafik", ["lttb", "minmax", None],
+                                format_func=lambda m: {"lttb": "LTTB", "minmax": "Min/Max envelope", None: "Semua titik"}[m])
+debug   = st.sidebar.checkbox("Tampilkan debug (waktu per tahap)")
 st.sidebar.caption(f"Device: `{DEVICE}` • Vars: {', '.join(VARS)}")
-st.sidebar.caption("Sumber data: Ubidots → (backup) MongoDB")
+st.sidebar.caption(CFG.source_label)
 
-# Auto-refresh (tanpa sleep blocking)
-st.autorefresh(interval=refresh * 1000, key="auto_refresh")
+# ---- pymongo hanya dibutuhkan jika MONGO_URI diisi; dicek tanpa import, setelah judul & sidebar tampil
+if MONGO_URI and not available("pymongo"):
+    st.error(PYMONGO_HINT)
+    st.stop()
 
 # ================== Helper & Koneksi Ubidots/Mongo (TIDAK BERUBAH) ==================
 
-def now_ms() -> int:
-    return int(time.time() * 1000)
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_coach(device: str, vars_: tuple, days_back: int, limit_points: int):
+    """Satu IncrementalCoach per jendela data (per proses), dipakai semua sesi."""
+    return sleep_analysis.IncrementalCoach()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_sessions(days_back: int):
+    """
+    Sesi tidur dari MongoDB → (sesi, sumber): indeks sesi (diisi ingest.py) atau, selama indeks masih
+    kosong, segmentasi titik mentah tersimpan. None jika Mongo tidak dipakai → frame yang dimuat.
+    """
+    coll = mongo_store.open_collection(MONGO_URI, DB_NAME, COLL_NAME) if MONGO_URI else None
+    if coll is None:
+        return None
+    end = ubidots_client.now_ms()
+    sessions, indexed = sleep_sessions.read_or_segment(coll, LOCAL_TZ, end - days_back * ubidots_client.DAY_MS, end)
+    return sessions, ("indeks sesi MongoDB" if indexed
+                      else "segmentasi titik mentah MongoDB (indeks sesi belum diisi ingest.py)")
+
+feed = None
+if MQTT_HOST:
+    if mqtt_feed.AVAILABLE:
+        feed = get_feed(CFG, tuple(VARS))
+        st.sidebar.caption(f"MQTT: {'terhubung' if feed.connected else 'menghubungkan…'} • {feed.messages} pesan")
+    else:
+        st.sidebar.info("MQTT_HOST diisi tetapi 'paho-mqtt' belum ter-install (tambahkan ke requirements.txt).")
 
-@st.cache_data(ttl=15, show_spinner=False)
-def fetch_var_from_ubidots(var: str, days_back: int, limit_points: int) -> pd.DataFrame:
-    """Ambil 1 variabel dari Ubidots /values dengan fallback /lv."""
-    end = now_ms()
-    start = end - days_back * 24 * 60 * 60 * 1000
-    url_values = f"{BASE}/api/v1.6/devices/{DEVICE}/{var}/values"
+if METRICS_PORT:
     try:
-        r = requests.get(
-            url_values, headers=HEADERS,
-            params={"start": start, "end": end, "page_size": min(limit_points, 200)},
-            timeout=12
-        )
-        
-        def fetch_lv() -> pd.DataFrame:
-            url_lv = f"{BASE}/api/v1.6/devices/{DEVICE}/{var}/lv"
-            r2 = requests.get(url_lv, headers=HEADERS, timeout=10)
-            r2.raise_for_status()
-            last = r2.json()
-            return pd.DataFrame([{
-                "time": pd.to_datetime(last.get("timestamp", end), unit="ms", utc=True),
-                "value": last.get("value", np.nan),
-                "variable": var
-            }])
-
-        if r.status_code in (401, 403, 404):
-            return fetch_lv()
-
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results", [])
-        if not results:
-            return fetch_lv()
-
-        rows = [{
-            "time": pd.to_datetime(x["timestamp"], unit="ms", utc=True),
-            "value": x["value"],
-            "variable": var
-        } for x in results[::-1]]
-        return pd.DataFrame(rows)
-
-    except Exception as e:
-        st.warning(f"{var}: gagal ambil dari Ubidots → {e}")
-        return pd.DataFrame(columns=["time", "value", "variable"])
-
-def save_dataframe_to_mongo(df: pd.DataFrame, uri: str, db_name: str, coll_name: str) -> str:
-    """Simpan DF ke Mongo sebagai upsert (variable + time_utc unik)."""
-    if not uri: return "Mongo URI kosong (lewati simpan)."
-    if df.empty: return "Tidak ada data untuk disimpan."
-    try:
-        client = MongoClient(uri, serverSelectionTimeoutMS=6000)
-        db = client[db_name]
-        coll = db[coll_name]
-        try:
-            coll.create_index([("variable", 1), ("time_utc", 1)], unique=True, background=True)
-        except Exception:
-            pass
-
-        ops = []
-        for _, row in df.iterrows():
-            doc = {
-                "variable": str(row["variable"]),
-                "value": float(row["value"]),
-                "time_utc": pd.to_datetime(row["time"]).tz_convert("UTC").to_pydatetime()
-                                     if hasattr(row["time"], "tz_convert") else pd.to_datetime(row["time"], utc=True).to_pydatetime(),
-                "saved_at": datetime.utcnow()
-            }
-            ops.append(
-                UpdateOne(
-                    {"variable": doc["variable"], "time_utc": doc["time_utc"]},
-                    {"$set": doc},
-                    upsert=True
-                )
-            )
-        result = coll.bulk_write(ops, ordered=False)
-        client.close()
-        return f"Mongo upsert OK: matched={result.matched_count}, upserted={len(result.upserted_ids)}, modified={result.modified_count}"
-    except Exception as e:
-        return f"Mongo save gagal: {e}"
+        TIMINGS.serve(METRICS_PORT)   # sekali per proses
+        st.sidebar.caption(f"Metrics: http://127.0.0.1:{METRICS_PORT}/metrics")
+    except OSError as e:
+        st.sidebar.caption(f"Metrics endpoint gagal: {e}")
 
 # ================== Ambil data semua variabel ==================
-frames = []
-for v in VARS:
-    df = fetch_var_from_ubidots(v, days, limit)
-    if not df.empty:
-        frames.append(df)
+df_all, wide, fetch_errors = load_wide(CFG, tuple(VARS), days, limit)
+for v, err in fetch_errors.items():
+    st.warning(f"{v}: gagal ambil dari {'MongoDB' if READ_ONLY else 'Ubidots'} → {err}")
 
-if not frames:
+if debug:
+    with st.sidebar.expander("⏱️ Waktu per tahap (proses ini)", expanded=True):
+        st.dataframe(TIMINGS.snapshot().round(1), use_container_width=True, hide_index=True)
+        st.caption("fetch = per variabel (Ubidots/Mongo); ubidots_http = per request; "
+                   "chart & coach per rerun; mongo_save di worker latar; import = modul berat dimuat (sekali per proses).")
+
+if wide.empty:
     st.warning("Tidak ada data yang bisa ditampilkan. Cek token/device/variable di Secrets, atau naikkan rentang hari.")
     st.stop()
 
-df_all = pd.concat(frames, ignore_index=True).sort_values("time")
-df_all["time_local"] = df_all["time"].dt.tz_convert(LOCAL_TZ)
-
-# ================== Simpan ke MongoDB (opsional) ==================
-with st.expander("📦 Penyimpanan ke MongoDB (log)"):
-    msg = save_dataframe_to_mongo(df_all, MONGO_URI, DB_NAME, COLL_NAME)
-    st.caption(msg)
-
-# ================== KPI terakhir ==================
-latest = df_all.groupby("variable", as_index=False).tail(1).reset_index(drop=True)
-# Menampilkan KPI dari sensor yang relevan saja (tidak semua 11 var)
-kpi_vars = ["temp-c", "hum-rh", "co2-ppm", "eog-mag", "vibration"]
-latest_kpi = latest[latest['variable'].isin(kpi_vars)]
-
-cols = st.columns(max(1, min(5, len(latest_kpi))))
-for i, (_, row) in enumerate(latest_kpi.iterrows()):
-    c = cols[i % len(cols)]
-    val = row["value"]
-    label = str(row["variable"])
-    ts = row["time_local"]
-    try:
-        c.metric(label, f"{float(val):.2f}")
-    except Exception:
-        c.metric(label, str(val))
-    c.caption(f"⏱️ {ts.strftime('%H:%M:%S')}") # Hanya tampilkan jam/menit
-
-# ================== Grafik (TIDAK BERUBAH) ==================
-st.subheader("📈 Tren Variabel")
-sel = st.multiselect("Pilih variabel untuk grafik", options=sorted(df_all["variable"].unique()),
-                     default=[v for v in ["temp-c", "hum-rh", "fsr1-raw"] if v in df_all["variable"].unique()][:3])
-plot_df = df_all[df_all["variable"].isin(sel)].dropna(subset=["value"])
-if not plot_df.empty:
-    chart = alt.Chart(plot_df).mark_line().encode(
-        x=alt.X("time_local:T", title=f"Waktu ({LOCAL_TZ})"),
-        y=alt.Y("value:Q", title="Nilai"),
-        color="variable:N",
-        tooltip=["time_local:T", "variable:N", "value:Q"]
-    ).properties(height=320).interactive()
-    st.altair_chart(chart, use_container_width=True)
+# Malam dari titik terakhir; AI coach (di bawah) hanya dihitung pada rerun penuh
+NIGHT = sleep_analysis.night_key(wide.index)
+
+# ================== KPI terakhir (fragment cepat) ==================
+@st.fragment(run_every=KPI_EVERY_S if feed is not None else refresh)
+def kpi_section():
+    _, wide, _ = load_wide(CFG, tuple(VARS), days, limit)   # cache 15 s; nilai terbaru lewat MQTT
+    latest = mqtt_feed.merge_latest(alignment.latest_values(wide), feed, LOCAL_TZ)
+    # Menampilkan KPI dari sensor yang relevan saja (tidak semua 11 var)
+    kpi_vars = ["temp-c", "hum-rh", "co2-ppm", "eog-mag", "vibration"]
+    latest_kpi = latest[latest['variable'].isin(kpi_vars)]
+
+    cols = st.columns(max(1, min(5, len(latest_kpi))))
+    for i, (_, row) in enumerate(latest_kpi.iterrows()):
+        c = cols[i % len(cols)]
+        val = row["value"]
+        label = str(row["variable"])
+        ts = row["time_local"]
+        try:
+            c.metric(label, f"{float(val):.2f}")
+        except Exception:
+            c.metric(label, str(val))
+        c.caption(f"⏱️ {ts.strftime('%H:%M:%S')}") # Hanya tampilkan jam/menit
+
+kpi_section()
+
+# ================== Grafik & simpan (fragment tiap `refresh` detik) ==================
+@st.fragment(run_every=refresh)
+def chart_section():
+    df_all, wide, _ = load_wide(CFG, tuple(VARS), days, limit)
+    if sleep_analysis.night_key(wide.index) != NIGHT:
+        st.rerun()   # data malam baru → rerun penuh agar AI coach dihitung ulang
+
+    st.subheader("📈 Tren Variabel")
+    sel = st.multiselect("Pilih variabel untuk grafik", options=sorted(wide.columns),
+                         default=[v for v in ["temp-c", "hum-rh", "fsr1-raw"] if v in wide.columns][:3])
+    with TIMINGS.time("chart"):
+        plot_df = alignment.to_long(wide, sel)
+        plot_df = downsample.downsample_frame(plot_df, n_out=downsample.CHART_POINTS, method=chart_ds)
+        if not plot_df.empty:
+            chart = alt.Chart(plot_df).mark_line().encode(
+                x=alt.X("time_local:T", title=f"Waktu ({LOCAL_TZ})"),
+                y=alt.Y("value:Q", title="Nilai"),
+                color="variable:N",
+                tooltip=["time_local:T", "variable:N", "value:Q"]
+            ).properties(height=320).interactive()
+            st.altair_chart(chart, use_container_width=True)
+        else:
+            st.info("Tidak ada data untuk variabel terpilih.")
+
+    with st.expander("📦 Penyimpanan ke MongoDB (log)"):
+        msg = ("Disimpan oleh ingest.py (dashboard hanya membaca)." if READ_ONLY
+               else mongo_store.save_in_background(df_all, MONGO_URI, DB_NAME, COLL_NAME, LOCAL_TZ) if MONGO_URI
+               else "Mongo URI kosong (lewati simpan).")
+        st.caption(msg)
+        if MONGO_URI:
+            h = mongo_store.health(MONGO_URI)
+            st.caption(f"Koneksi Mongo: OK ({h['latency_ms']} ms)" if h["ok"] else f"Koneksi Mongo: gagal → {h['error']}")
+    st.caption(f"Grafik diperbarui: {datetime.now().astimezone().strftime('%H:%M:%S %Z')} — tiap {refresh}s")
+
+chart_section()
+
+# ================== Sesi tidur per malam ==================
+loaded = load_sessions(days)
+if loaded is not None:
+    sessions, session_src = loaded
+    st.subheader("🛌 Sesi Tidur per Malam")
+else:
+    # tanpa Mongo: hanya `limit` titik terakhir per variabel → bisa hanya sebagian malam terakhir
+    st.subheader("🛌 Sesi Tidur (titik yang dimuat)")
+    spacing = wide.index.to_series().diff().median()
+    if pd.isna(spacing) or spacing > pd.Timedelta(seconds=sleep_analysis.SESSION_GAP_S):
+        # baris rollup berjarak > jeda sesi → tiap titik tertekan jadi run nol detik
+        sessions = pd.DataFrame(columns=sleep_analysis.SESSION_COLS)
+        session_src = "frame yang dimuat terlalu jarang untuk segmentasi"
+    else:
+        sessions = sleep_analysis.segment_sessions(wide)
+        span_h = (wide.index[-1] - wide.index[0]).total_seconds() / 3600
+        session_src = f"segmentasi {limit} titik terakhir per variabel (±{span_h:.1f} jam terakhir)"
+if sessions.empty:
+    st.info("Belum ada sesi tidur (tekanan FSR berkelanjutan) pada rentang ini.")
 else:
-    st.info("Tidak ada data untuk variabel terpilih.")
+    table = sessions.assign(start=sessions["start"].dt.tz_convert(LOCAL_TZ),
+                            end=sessions["end"].dt.tz_convert(LOCAL_TZ))
+    per_night = sessions.groupby("night", as_index=False)["duration_h"].sum()
+    bars = alt.Chart(per_night).mark_bar().encode(
+        x=alt.X("night:O", title="Malam"), y=alt.Y("duration_h:Q", title="Durasi tidur (jam)"),
+        tooltip=["night:O", alt.Tooltip("duration_h:Q", format=".1f")])
+    target = alt.Chart(pd.DataFrame({"y": [TARGET_SLEEP_H]})).mark_rule(strokeDash=[4, 4]).encode(y="y:Q")
+    st.altair_chart((bars + target).properties(height=220), use_container_width=True)
+    st.dataframe(table[["night", "start", "end", "duration_h", "score", "temp_mean", "hum_mean", "co2_mean",
+                        "eog_mean", "open"]].round(2), use_container_width=True, hide_index=True)
+st.caption(f"Sumber: {session_src} • sesi = FSR > {sleep_analysis.SESSION_FSR_MIN} "
+           f"(jeda ≤ {sleep_analysis.SESSION_GAP_S // 60} menit, minimal {sleep_analysis.SESSION_MIN_S // 60} menit)")
 
 # ================== AI ANALISIS & SARAN (REVISI LOGIKA) ==================
 st.subheader("🧠 AI Coach — Analisis Tidur & Rekomendasi")
 
-# Normalisasi nama kolom agar pencarian fleksibel
-pivot = df_all.pivot_table(index="time_local", columns="variable", values="value", aggfunc="last").sort_index()
-cols_lower = {c: c.lower() for c in pivot.columns}
-pivot = pivot.rename(columns=cols_lower)
-
-# 📌 REVISI 2: AMBIL SERIES DENGAN NAMA BARU
-fsr1_series  = pivot.get("fsr1-raw").dropna() if "fsr1-raw" in pivot.columns else None
-fsr2_series  = pivot.get("fsr2-raw").dropna() if "fsr2-raw" in pivot.columns else None
-eog_series   = pivot.get("eog-mag").dropna()  if "eog-mag" in pivot.columns else None
-temp_series  = pivot.get("temp-c").dropna()   if "temp-c" in pivot.columns else None
-hum_series   = pivot.get("hum-rh").dropna()   if "hum-rh" in pivot.columns else None
-co2_series   = pivot.get("co2-ppm").dropna()  if "co2-ppm" in pivot.columns else None
-tvoc_series  = pivot.get("tvoc-ppb").dropna() if "tvoc-ppb" in pivot.columns else None
-
-# --- Estimasi Durasi Tidur (Gunakan FSR1 & FSR2) ---
-sleep_hours = 0.0
-# Gabungkan FSR1 dan FSR2 untuk mendapatkan rata-rata tekanan
-if fsr1_series is not None and fsr2_series is not None:
-    combined_fsr = pd.concat([fsr1_series, fsr2_series]).groupby(level=0).mean()
-    if not combined_fsr.empty:
-        # Gunakan persentil untuk ambang batas (diasumsikan nilai FSR yang lebih tinggi berarti ada tekanan/tidur)
-        thr = float(np.nanpercentile(combined_fsr.values, 30))
-        # Rasio waktu di mana tekanan terdeteksi (di atas ambang batas)
-        asleep_ratio = float(np.mean(combined_fsr.values > thr))
-        # Estimasi durasi tidur berdasarkan rasio * TARGET_SLEEP_H
-        sleep_hours = asleep_ratio * TARGET_SLEEP_H
-
-# --- Penghitungan Rata-rata ---
-temp_mean = float(np.nanmean(temp_series.values)) if temp_series is not None and not temp_series.empty else None
-hum_mean  = float(np.nanmean(hum_series.values))  if hum_series is not None and not hum_series.empty else None
-co2_mean  = float(np.nanmean(co2_series.values))  if co2_series is not None and not co2_series.empty else None
-tvoc_mean = float(np.nanmean(tvoc_series.values)) if tvoc_series is not None and not tvoc_series.empty else None
+coach_t0 = time.perf_counter()
+# Mean suhu/RH/CO2/TVOC/EOG + rasio FSR (fsr1/fsr2) di atas persentil ke-30 dari agregat berjalan:
+# hanya baris baru/terbuang sejak refresh sebelumnya yang diproses (sleep_analysis.IncrementalCoach)
+stats = get_coach(DEVICE, tuple(VARS), days, limit).update(wide)
+sleep_hours = stats["sleep_hours"]
+# Total sesi malam terakhir (segmentasi) ditampilkan terpisah; skor & saran tetap memakai estimasi coach
+last_night = sessions[sessions["night"] == sessions["night"].max()] if not sessions.empty else sessions
+temp_mean, hum_mean = stats["temp_mean"], stats["hum_mean"]
+co2_mean, tvoc_mean = stats["co2_mean"], stats["tvoc_mean"]
 # Metrik EOG untuk aktivitas
-eog_mean = float(np.nanmean(eog_series.values)) if eog_series is not None and not eog_series.empty else None
+eog_mean = stats["eog_mean"]
+TIMINGS.observe("coach", time.perf_counter() - coach_t0)
 
 colA, colB = st.columns(2)
 with colA:
     st.write(f"- Durasi tidur estimasi: **{sleep_hours:.1f} jam** (target {TARGET_SLEEP_H:.0f} jam)")
+    if not last_night.empty:
+        st.write(f"- Total sesi tidur malam {last_night['night'].iloc[0]}: "
+                 f"**{float(last_night['duration_h'].sum()):.1f} jam** ({len(last_night)} sesi)")
     if temp_mean is not None:
         st.write(f"- Suhu rata-rata: **{temp_mean:.1f}°C**")
     else:
@@ -350,4 +324,5 @@ with colB:
         st.write("**Catatan:**")
         for n in notes: st.write("- " + n)
 
-st.caption(f"Terakhir diperbarui: {datetime.now().astimezone().strftime('%Y-%m-%d %H:%M:%S %Z')} — auto refresh {refresh}s")
+st.caption(f"AI Coach dihitung: {datetime.now().astimezone().strftime('%Y-%m-%d %H:%M:%S %Z')} "
+           f"(malam {NIGHT}; dihitung ulang saat data malam baru masuk)")
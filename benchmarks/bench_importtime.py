@@ -0,0 +1,188 @@
+# bench_importtime.py — Smallow • Waktu import & first paint dashboard (cold start)
+# ==========================================================
+# 1) `python -X importtime`: import tingkat-modul yang dijalankan dashboard sebelum st.set_page_config
+#    (diambil dari AST skrip, termasuk yang di dalam try/if) → total dan modul termahal.
+# 2) First paint: `streamlit run` baru per percobaan (proses dingin) + satu klien websocket →
+#    waktu dari permintaan run sampai elemen pertama (judul) terkirim dan sampai skrip selesai.
+#    Data dari emulator lokal (ubidots_emulator.py), MONGO_URI kosong.
+# --baseline REV membandingkan dengan pohon git lain (git archive ke direktori sementara).
+#
+#   python benchmarks/bench_importtime.py --baseline caf34ec
+#   python benchmarks/bench_importtime.py --app newapp.py --trials 5 --no-paint
+
+import argparse
+import ast
+import asyncio
+import compileall
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ClientState_pb2 import ClientState
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+from load_harness import RUN_TIMEOUT_S, free_port, percentile, start_dashboard  # noqa: E402
+from ubidots_emulator import Config, start  # noqa: E402
+
+APPS = ("app.py", "app2.py", "newapp.py", "app yang pertama.py")
+# Variabel yang ada di emulator (default app2/app yang pertama tidak ada di data sintetis)
+VARS = "temp-c,hum-rh,co2-ppm,tvoc-ppb,fsr1-raw,fsr2-raw,eog-mag,vibration"
+
+
+# ================== -X importtime ==================
+
+def pre_paint_imports(path: str) -> str:
+    """Statement import tingkat-modul sebelum st.set_page_config → kode untuk `python -c`."""
+    with open(path, encoding="utf-8") as f:
+        src = f.read()
+    tree = ast.parse(src)
+    lines = []
+    for stmt in tree.body:
+        if "set_page_config" in (ast.get_source_segment(src, stmt) or ""):
+            break
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                continue
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                lines.append(ast.get_source_segment(src, node))
+    return "\n".join(lines)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int]]:
+    """Baris `import time: self | cumulative | nama` tingkat teratas → [(nama, µs kumulatif)]."""
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):      # modul yang di-import langsung oleh kode, bukan turunannya
+            out.append((name.strip(), int(cum)))
+    return out
+
+
+def _importtime_once(tree: str, code: str) -> List[Tuple[str, int]]:
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=tree, capture_output=True, text=True)
+    if r.returncode != 0:
+        raise SystemExit(f"import gagal di {tree}:\n{r.stderr[-1500:]}")
+    return parse_importtime(r.stderr)
+
+
+def importtime(tree: str, code: str, runs: int) -> List[Tuple[str, int]]:
+    """Run terbaik (total terkecil) dari beberapa proses baru; modul start-up interpreter tidak dihitung."""
+    startup = {name for name, _ in _importtime_once(tree, "pass")}
+    best = None
+    for _ in range(runs):
+        mods = [m for m in _importtime_once(tree, code) if m[0] not in startup]
+        if best is None or sum(c for _, c in mods) < sum(c for _, c in best):
+            best = mods
+    return best
+
+
+# ================== First paint ==================
+
+async def first_paint(url: str) -> Tuple[float, float]:
+    """(detik sampai elemen pertama, detik sampai script_finished) untuk satu run penuh."""
+    ws = await websocket_connect(url, subprotocols=["streamlit"], max_message_size=256 * 2 ** 20)
+    try:
+        msg = BackMsg(rerun_script=ClientState(query_string=""))
+        t0 = time.perf_counter()
+        await ws.write_message(msg.SerializeToString(), binary=True)
+        paint = None
+        while True:
+            raw = await asyncio.wait_for(ws.read_message(), RUN_TIMEOUT_S)
+            if raw is None:
+                raise ConnectionError("websocket ditutup server")
+            fwd = ForwardMsg.FromString(raw)
+            kind = fwd.WhichOneof("type")
+            if paint is None and kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                paint = time.perf_counter() - t0
+            elif kind == "script_finished":
+                done = time.perf_counter() - t0
+                return (paint if paint is not None else done), done
+    finally:
+        ws.close()
+
+
+def paint_trials(tree: str, app: str, secrets: Dict[str, str], trials: int) -> Tuple[List[float], List[float]]:
+    paints, dones = [], []
+    for _ in range(trials):
+        port = free_port()
+        with tempfile.TemporaryDirectory(prefix="smallow-paint-") as workdir:
+            proc = start_dashboard(os.path.join(tree, app), secrets, workdir, port)
+            try:
+                p, d = asyncio.run(first_paint(f"ws://127.0.0.1:{port}/_stcore/stream"))
+            finally:
+                proc.terminate()
+                proc.wait(10)
+        paints.append(p)
+        dones.append(d)
+    return paints, dones
+
+
+# ================== Main ==================
+
+def export_tree(rev: str, dest: str) -> str:
+    """Isi commit `rev` (git archive) ke dest, sudah di-compile ke .pyc seperti pohon kerja."""
+    data = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(dest)
+    compileall.compile_dir(dest, quiet=1)
+    return dest
+
+
+def fmt_mods(mods: List[Tuple[str, int]], top: int) -> str:
+    return ", ".join(f"{n} {c / 1e3:.0f}" for n, c in sorted(mods, key=lambda m: -m[1])[:top])
+
+
+def report(label: str, mods: List[Tuple[str, int]], paint: Optional[Tuple[List[float], List[float]]], top: int):
+    total = sum(c for _, c in mods) / 1e3
+    print(f"  {label:<14} import sebelum set_page_config {total:7.0f} ms   ({fmt_mods(mods, top)})")
+    if paint:
+        p, d = paint
+        print(f"  {'':<14} first paint p50 {percentile(p, 50) * 1e3:7.0f} ms   maks {max(p) * 1e3:7.0f} ms"
+              f"   •   skrip selesai p50 {percentile(d, 50) * 1e3:7.0f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Waktu import & first paint dashboard Smallow (cold start)")
+    ap.add_argument("--app", nargs="+", default=list(APPS), help="file dashboard (relatif ke root repo)")
+    ap.add_argument("--baseline", metavar="REV", help="commit pembanding (mis. caf34ec)")
+    ap.add_argument("--runs", type=int, default=5, help="proses -X importtime per app (diambil terbaik)")
+    ap.add_argument("--trials", type=int, default=3, help="proses streamlit baru per app untuk first paint")
+    ap.add_argument("--no-paint", action="store_true", help="lewati pengukuran first paint")
+    ap.add_argument("--top", type=int, default=5, help="jumlah modul termahal yang ditampilkan")
+    args = ap.parse_args()
+
+    srv = None
+    secrets = {}
+    if not args.no_paint:
+        srv = start(Config(days=3))
+        secrets = {"UBIDOTS_BASE": srv.base, "UBIDOTS_TOKEN": "bench", "UBIDOTS_DEVICE": "smallow-001",
+                   "UBIDOTS_VARS": VARS, "MONGO_URI": ""}
+
+    with tempfile.TemporaryDirectory(prefix="smallow-base-") as tmp:
+        trees = [("pohon kerja", ROOT)]
+        if args.baseline:
+            trees.insert(0, (args.baseline, export_tree(args.baseline, tmp)))
+        for app in args.app:
+            print(app)
+            for label, tree in trees:
+                if not os.path.exists(os.path.join(tree, app)):
+                    print(f"  {label:<14} (tidak ada)")
+                    continue
+                mods = importtime(tree, pre_paint_imports(os.path.join(tree, app)), args.runs)
+                paint = None if args.no_paint else paint_trials(tree, app, secrets, args.trials)
+                report(label, mods, paint, args.top)
+
+
+if __name__ == "__main__":
+    main()
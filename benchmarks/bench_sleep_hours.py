@@ -0,0 +1,90 @@
+# bench_sleep_hours.py — Smallow • Benchmark regresi estimate_sleep_hours
+# ==========================================================
+# Membandingkan versi vektor (sleep_analysis) dengan loop per-baris lama pada
+# data sintetis 10k / 100k / 1M sampel, sekaligus memastikan hasilnya sama.
+#
+#   python benchmarks/bench_sleep_hours.py            # loop lama hanya s/d 100k (1M ≈ menit)
+#   python benchmarks/bench_sleep_hours.py --max-loop 1000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sleep_analysis import RMS_MOV_LOW_G, estimate_sleep_hours  # noqa: E402
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def estimate_sleep_hours_loop(pv: pd.DataFrame) -> float:
+    """Implementasi lama (loop per baris) — acuan kebenaran."""
+    if pv.empty: return 0.0
+    fsr = pv["fsr"].dropna() if "fsr" in pv.columns else pd.Series(dtype=float)
+    if fsr.empty: return 0.0
+    have_acc = all(v in pv.columns for v in ("accel_x","accel_y","accel_z"))
+    a_mag = (np.sqrt(pv["accel_x"]**2 + pv["accel_y"]**2 + pv["accel_z"]**2).dropna()
+             if have_acc else pd.Series(dtype=float))
+    fsr_th = float(np.nanpercentile(fsr.values, 30)) if fsr.size else np.inf
+    times = pv.index.to_list(); asleep = 0.0
+    for i in range(1, len(times)):
+        dt = (times[i]-times[i-1]).total_seconds(); dt = max(0.5, min(dt, 60.0))
+        fsr_now = pv.iloc[i].get("fsr", np.nan)
+        fsr_ok = pd.notna(fsr_now) and fsr_now > fsr_th
+        motion_ok = True
+        if have_acc and (times[i] in a_mag.index) and (times[i-1] in a_mag.index):
+            motion_ok = abs(a_mag.loc[times[i]] - a_mag.loc[times[i-1]]) < RMS_MOV_LOW_G
+        if fsr_ok and motion_ok: asleep += dt
+    return asleep/3600.0
+
+
+def synthetic_wide(n: int, seed: int = 0) -> pd.DataFrame:
+    """Frame lebar seperti alignment.align_wide: jeda 0.2–90 s, ±5% NaN per kolom."""
+    rng = np.random.default_rng(seed)
+    t_ms = 1_700_000_000_000 + np.cumsum(rng.integers(200, 90_000, n))
+    index = pd.DatetimeIndex(pd.to_datetime(t_ms, unit="ms", utc=True).tz_convert("Asia/Jakarta"), name="time_local")
+    cols = {
+        "fsr": rng.gamma(2.0, 300.0, n),
+        "accel_x": rng.normal(0.0, 0.04, n),
+        "accel_y": rng.normal(0.0, 0.04, n),
+        "accel_z": 1.0 + rng.normal(0.0, 0.04, n),
+        "temperature": rng.normal(24.0, 1.0, n),
+    }
+    for v in cols.values():
+        v[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame(cols, index=index)
+
+
+def best_of(fn, pv, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter(); out = fn(pv); best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark estimate_sleep_hours (vektor vs loop)")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    ap.add_argument("--max-loop", type=int, default=100_000, help="ukuran terbesar untuk loop lama")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'n':>10} {'vektor (ms)':>12} {'loop (ms)':>12} {'speedup':>9}  jam tidur")
+    for n in args.sizes:
+        pv = synthetic_wide(n)
+        t_vec, hours = best_of(estimate_sleep_hours, pv, args.repeat)
+        if n <= args.max_loop:
+            t_loop, hours_ref = best_of(estimate_sleep_hours_loop, pv, 1)
+            if not np.isclose(hours, hours_ref, rtol=1e-12, atol=0.0):
+                raise SystemExit(f"HASIL BERBEDA pada n={n}: vektor={hours!r} loop={hours_ref!r}")
+            loop_col, speed_col = f"{t_loop * 1e3:12.1f}", f"{t_loop / t_vec:8.0f}x"
+        else:
+            loop_col, speed_col = f"{'-':>12}", f"{'-':>9}"
+        print(f"{n:>10} {t_vec * 1e3:12.2f} {loop_col} {speed_col}  {hours:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# load_harness.py — Smallow • Uji beban dashboard headless terhadap emulator Ubidots
+# ==========================================================
+# Menjalankan `streamlit run <app>` sungguhan (headless, secrets sementara → emulator lokal)
+# lalu N klien websocket tanpa browser: tiap klien meminta rerun penuh tiap --think-s detik
+# dan, seperti browser, ikut menjalankan fragment `run_every` (pesan auto_rerun).
+# Laporan: latensi rerun penuh & fragment p50/p95/maks, exception di halaman, serta
+# jumlah request upstream per endpoint/status dari emulator (ubidots_emulator.py).
+#
+#   python benchmarks/load_harness.py --sessions 8 --duration 60 --latency-ms 80
+#   python benchmarks/load_harness.py --app newapp.py --values-status 402        # paksa fallback /lv
+#   python benchmarks/load_harness.py --base http://127.0.0.1:8900               # emulator terpisah
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from urllib.error import URLError
+from urllib.request import urlopen
+
+import toml
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ClientState_pb2 import ClientState
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+from ubidots_emulator import Config, parse_fail, start  # noqa: E402
+
+STARTUP_TIMEOUT_S = 60
+RUN_TIMEOUT_S = 120
+
+
+def percentile(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    if not xs:
+        return float("nan")
+    k = (len(xs) - 1) * q / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def upstream_stats(base: str, srv=None) -> Dict[str, int]:
+    if srv is not None:
+        return srv.stats()
+    with urlopen(f"{base}/_stats", timeout=5) as r:
+        return json.loads(r.read())
+
+
+def start_dashboard(app: str, secrets: Dict[str, str], workdir: str, port: int) -> subprocess.Popen:
+    """streamlit run di workdir (berisi .streamlit/secrets.toml sementara; secrets repo tidak disentuh)."""
+    os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        toml.dump(secrets, f)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true",
+         "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < STARTUP_TIMEOUT_S:
+        if proc.poll() is not None:
+            raise SystemExit(f"streamlit berhenti saat start:\n{proc.stderr.read().decode()[-2000:]}")
+        try:
+            with urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return proc
+        except (URLError, OSError):
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("streamlit tidak siap dalam batas waktu")
+
+
+class Session:
+    """Satu klien headless: kirim rerun, tunggu script_finished, jalankan fragment auto_rerun."""
+
+    def __init__(self, url: str, think_s: float, duration_s: float):
+        self.url, self.think_s, self.duration_s = url, think_s, duration_s
+        self.full: List[float] = []
+        self.fragment: List[float] = []
+        self.errors: set = set()
+        self.fragments: Dict[str, float] = {}    # fragment_id → interval (detik)
+
+    async def request(self, ws, fragment_id: str = "") -> Optional[float]:
+        msg = BackMsg(rerun_script=ClientState(query_string="", fragment_id=fragment_id,
+                                               is_auto_rerun=bool(fragment_id)))
+        t0 = time.perf_counter()
+        await ws.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            raw = await asyncio.wait_for(ws.read_message(), RUN_TIMEOUT_S)
+            if raw is None:
+                raise ConnectionError("websocket ditutup server")
+            fwd = ForwardMsg.FromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "auto_rerun":
+                self.fragments[fwd.auto_rerun.fragment_id] = fwd.auto_rerun.interval
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                el = fwd.delta.new_element
+                if el.WhichOneof("type") == "exception":
+                    self.errors.add(f"{el.exception.type}: {el.exception.message}".splitlines()[0])
+            elif kind == "script_finished":
+                if fwd.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return None
+                return time.perf_counter() - t0
+
+    async def run(self):
+        ws = await websocket_connect(self.url, subprotocols=["streamlit"], max_message_size=256 * 2 ** 20)
+        try:
+            deadline = time.monotonic() + self.duration_s
+            next_full = time.monotonic()
+            next_frag: Dict[str, float] = {}
+            while time.monotonic() < deadline:
+                now = time.monotonic()
+                if now >= next_full:
+                    dt = await self.request(ws)
+                    if dt is not None:
+                        self.full.append(dt)
+                    next_full = time.monotonic() + self.think_s
+                    next_frag = {f: time.monotonic() + iv for f, iv in self.fragments.items()}
+                    continue
+                due = [f for f, t in next_frag.items() if t <= now]
+                if due:
+                    dt = await self.request(ws, due[0])
+                    if dt is not None:
+                        self.fragment.append(dt)
+                    next_frag[due[0]] = time.monotonic() + self.fragments[due[0]]
+                    continue
+                await asyncio.sleep(min([next_full] + list(next_frag.values())) - now)
+        finally:
+            ws.close()
+
+
+async def drive(url: str, n: int, think_s: float, duration_s: float, ramp_s: float) -> List[Session]:
+    sessions = [Session(url, think_s, duration_s) for _ in range(n)]
+
+    async def one(i: int, s: Session):
+        await asyncio.sleep(i * ramp_s)
+        try:
+            await s.run()
+        except Exception as e:
+            s.errors.add(f"klien: {type(e).__name__}: {e}")
+
+    await asyncio.gather(*(one(i, s) for i, s in enumerate(sessions)))
+    return sessions
+
+
+def line(name: str, xs: List[float]) -> str:
+    if not xs:
+        return f"  {name:<16} —"
+    return (f"  {name:<16} n={len(xs):<4} p50 {percentile(xs, 50) * 1e3:7.0f} ms   p95 {percentile(xs, 95) * 1e3:7.0f} ms"
+            f"   maks {max(xs) * 1e3:7.0f} ms   mean {statistics.fmean(xs) * 1e3:7.0f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Uji beban dashboard Smallow terhadap emulator Ubidots lokal")
+    ap.add_argument("--app", default="app.py", help="file dashboard (relatif ke root repo)")
+    ap.add_argument("--sessions", type=int, default=4)
+    ap.add_argument("--duration", type=float, default=30.0, help="detik per sesi")
+    ap.add_argument("--think-s", type=float, default=5.0, help="jeda antar rerun penuh per sesi")
+    ap.add_argument("--ramp-s", type=float, default=0.5, help="jeda antar start sesi")
+    ap.add_argument("--base", help="pakai emulator/endpoint yang sudah jalan (tanpa start emulator)")
+    ap.add_argument("--device", default="smallow-001")
+    ap.add_argument("--secret", action="append", metavar="KEY=VAL", help="secret tambahan untuk dashboard")
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--fail", action="append", metavar="STATUS=P")
+    ap.add_argument("--values-status", type=int)
+    ap.add_argument("--rate-limit", type=float, default=0.0)
+    ap.add_argument("--days", type=int, default=7)
+    args = ap.parse_args()
+
+    srv = None
+    base = args.base
+    if not base:
+        srv = start(Config(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, fail=parse_fail(args.fail),
+                           values_status=args.values_status, rate_limit=args.rate_limit, days=args.days))
+        base = srv.base
+    secrets = {"UBIDOTS_BASE": base, "UBIDOTS_TOKEN": "load-test", "UBIDOTS_DEVICE": args.device, "MONGO_URI": ""}
+    secrets.update(dict(s.split("=", 1) for s in args.secret or []))
+
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="smallow-load-") as workdir:
+        proc = start_dashboard(os.path.join(ROOT, args.app), secrets, workdir, port)
+        try:
+            before = upstream_stats(base, srv)
+            t0 = time.perf_counter()
+            sessions = asyncio.run(drive(f"ws://127.0.0.1:{port}/_stcore/stream", args.sessions,
+                                         args.think_s, args.duration, args.ramp_s))
+            wall = time.perf_counter() - t0
+            after = upstream_stats(base, srv)
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+    first = [s.full[0] for s in sessions if s.full]
+    full = [t for s in sessions for t in s.full[1:]]
+    frag = [t for s in sessions for t in s.fragment]
+    errors = set().union(*(s.errors for s in sessions))
+    upstream = {k: after.get(k, 0) - before.get(k, 0) for k in sorted(after) if after.get(k, 0) - before.get(k, 0)}
+    n_runs = len(first) + len(full) + len(frag)
+    n_up = sum(v for k, v in upstream.items() if not k.startswith("status_"))
+
+    print(f"{args.app} • {args.sessions} sesi × {args.duration:.0f} s • upstream {base} • {wall:.1f} s")
+    print(line("run pertama", first))
+    print(line("rerun penuh", full))
+    print(line("fragment", frag))
+    print(f"  upstream: {n_up} request ({n_up / max(1, n_runs):.2f}/run) → "
+          + ", ".join(f"{k}={v}" for k, v in upstream.items()))
+    if errors:
+        print(f"  exception di halaman ({len(errors)} jenis):")
+        for e in sorted(errors):
+            print(f"    - {e[:160]}")
+
+
+if __name__ == "__main__":
+    main()
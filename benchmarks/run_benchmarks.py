@@ -0,0 +1,210 @@
+# run_benchmarks.py — Smallow • Suite benchmark jalur panas dashboard
+# ==========================================================
+# Mengukur tiap tahap refresh pada data sintetis 11 variabel (benchmarks/synthetic.py):
+#   decode_json    bytes /values → parser JSON klien → ubidots_client.decode_results (per variabel)
+#   concat_pivot   pd.concat + pivot_table (cara app lama)
+#   align_wide     alignment.align_wide (frame lebar yang dipakai sekarang)
+#   sleep_hours    sleep_analysis.estimate_sleep_hours
+#   sleep_score    sleep_analysis.sleep_score
+#   coach_full     statistik AI coach app.py dihitung ulang dari seluruh jendela (cara lama)
+#   coach_incr     sleep_analysis.IncrementalCoach.update, jendela bergeser satu baris per refresh
+#   fsr_pct_full   persentil ke-30 FSR dari semua titik mentah fsr1/fsr2 (membaca ulang jendela)
+#   fsr_sketch     persentil yang sama dari sketsa KLL per malam yang digabung (quantile_sketch)
+#   sessions       sleep_analysis.segment_sessions (sesi tidur dari tekanan FSR berkelanjutan)
+#   build_docs     mongo_store.build_documents
+#
+# Hasil ditambahkan ke benchmarks/results/history.jsonl (commit git, mesin, waktu terbaik/median)
+# dan dibandingkan dengan run terakhir di mesin yang sama untuk commit lain.
+#
+#   python benchmarks/run_benchmarks.py                    # 10k, 100k, 1M titik
+#   python benchmarks/run_benchmarks.py --sizes 10000 --only decode_json align_wide
+#   python benchmarks/run_benchmarks.py --save --check     # simpan; exit 1 jika ada regresi
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+import alignment  # noqa: E402
+import quantile_sketch  # noqa: E402
+import sleep_analysis  # noqa: E402
+import ubidots_client  # noqa: E402
+from synthetic import LOCAL_TZ, generate, long_frame, ubidots_body  # noqa: E402
+
+try:
+    import mongo_store  # noqa: E402
+except ModuleNotFoundError:   # pymongo belum ter-install → build_docs dilewati
+    mongo_store = None
+
+SIZES = (10_000, 100_000, 1_000_000)
+RESULTS_PATH = os.path.join(HERE, "results", "history.jsonl")
+REGRESSION_PCT = 20.0     # lebih lambat dari ini (vs run sebelumnya) → ditandai
+MIN_TIME_S = 0.5          # ulangi sampai total waktu ≥ ini (maks. --repeat kali)
+
+
+def _decode(bodies):
+    return pd.concat([ubidots_client.decode_results(ubidots_client.parse_json(b)["results"], v)
+                      for v, b in bodies.items()], ignore_index=True)
+
+
+def _pivot(frames):
+    df = pd.concat(frames, ignore_index=True)
+    df["time_local"] = df["time"].dt.tz_convert(LOCAL_TZ)
+    return df.pivot_table(index="time_local", columns="variable", values="value", aggfunc="last")
+
+
+def _fsr_frame(wide):
+    return pd.DataFrame({"fsr": wide[["fsr1-raw", "fsr2-raw"]].mean(axis=1)}, index=wide.index)
+
+
+def _coach_full(wide):
+    """Blok AI coach app.py sebelum IncrementalCoach: series per variabel, concat FSR, persentil, mean."""
+    g = lambda c: wide[c].dropna() if c in wide.columns else None
+    comb = pd.concat([g("fsr1-raw"), g("fsr2-raw")]).groupby(level=0).mean()
+    thr = float(np.nanpercentile(comb.values, sleep_analysis.FSR_PERCENTILE))
+    hours = float(np.mean(comb.values > thr)) * sleep_analysis.TARGET_SLEEP_H
+    return hours, [float(np.nanmean(g(c).values)) for c in sleep_analysis.COACH_COLS.values()]
+
+
+class _SlidingCoach:
+    """IncrementalCoach yang sudah terisi; tiap panggilan jendela bergeser satu baris (satu payload baru)."""
+
+    def __init__(self, wide):
+        self.wide, self.k = wide, 0
+        self.steps = max(1, min(256, len(wide) // 4))
+        self.n = len(wide) - self.steps
+        self.coach = sleep_analysis.IncrementalCoach()
+        self.coach.update(wide.iloc[:self.n])
+
+    def step(self):
+        self.k = self.k % self.steps + 1
+        return self.coach.update(self.wide.iloc[self.k:self.k + self.n])
+
+
+def _fsr_values(wide):
+    return wide[["fsr1-raw", "fsr2-raw"]].to_numpy(np.float64).ravel()
+
+
+def _night_sketches(wide):
+    """Satu sketsa per malam untuk fsr1+fsr2 (seperti koleksi *_sketch di MongoDB)."""
+    nights = sleep_analysis.night_keys(wide.index)
+    return [quantile_sketch.KLLSketch().update(g[["fsr1-raw", "fsr2-raw"]].to_numpy().ravel())
+            for _, g in wide.groupby(nights, sort=False)]
+
+
+def _sketch_threshold(sketches):
+    return quantile_sketch.merge_all(sketches).percentile(sleep_analysis.FSR_PERCENTILE)
+
+
+# nama → (siapkan input dari data sintetis, fungsi yang diukur)
+CASES = {
+    "decode_json": (lambda s, long, wide: {v: ubidots_body(t, x) for v, (t, x) in s.items()}, _decode),
+    "concat_pivot": (lambda s, long, wide: [g for _, g in long.groupby("variable")], _pivot),
+    "align_wide": (lambda s, long, wide: long, lambda df: alignment.align_wide(df, LOCAL_TZ)),
+    "sleep_hours": (lambda s, long, wide: _fsr_frame(wide), sleep_analysis.estimate_sleep_hours),
+    "sleep_score": (lambda s, long, wide: wide, sleep_analysis.sleep_score),
+    "coach_full": (lambda s, long, wide: wide, _coach_full),
+    "coach_incr": (lambda s, long, wide: _SlidingCoach(wide), _SlidingCoach.step),
+    "fsr_pct_full": (lambda s, long, wide: _fsr_values(wide),
+                     lambda x: float(np.nanpercentile(x, sleep_analysis.FSR_PERCENTILE))),
+    "fsr_sketch": (lambda s, long, wide: _night_sketches(wide), _sketch_threshold),
+    "sessions": (lambda s, long, wide: wide, sleep_analysis.segment_sessions),
+    "build_docs": (lambda s, long, wide: long, lambda df: mongo_store.build_documents(df)),
+}
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def timeit(fn, arg, repeat: int):
+    times = []
+    while len(times) < repeat and (len(times) < 2 or sum(times) < MIN_TIME_S):
+        t0 = time.perf_counter(); fn(arg); times.append(time.perf_counter() - t0)
+    return min(times), statistics.median(times), len(times)
+
+
+def load_history(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous(history, machine: str, commit: str):
+    """Hasil terakhir per (case, n) di mesin ini dari commit lain."""
+    prev = {}
+    for rec in history:
+        if rec["machine"] == machine and rec["commit"] != commit:
+            prev[(rec["case"], rec["n"])] = rec
+    return prev
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark jalur panas dashboard Smallow")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="total titik (semua variabel)")
+    ap.add_argument("--only", nargs="+", choices=list(CASES), help="hanya kasus ini")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--machine", default=platform.node() or "local", help="label mesin di riwayat")
+    ap.add_argument("--save", action="store_true", help=f"tambahkan hasil ke {os.path.relpath(RESULTS_PATH)}")
+    ap.add_argument("--check", action="store_true", help=f"exit 1 jika ada kasus > {REGRESSION_PCT:.0f}%% lebih lambat")
+    args = ap.parse_args()
+
+    commit = git_commit()
+    prev = previous(load_history(RESULTS_PATH), args.machine, commit)
+    cases = [c for c in (args.only or CASES) if not (c == "build_docs" and mongo_store is None)]
+    stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    records, regressions = [], []
+
+    print(f"commit {commit} • mesin {args.machine} • python {platform.python_version()} • pandas {pd.__version__}")
+    print(f"{'kasus':<14} {'n':>9} {'terbaik (ms)':>13} {'median (ms)':>12} {'runs':>5}  vs sebelumnya")
+    for n in args.sizes:
+        series = generate(n)
+        long = long_frame(series)
+        wide = alignment.align_wide(long, LOCAL_TZ)
+        for case in cases:
+            prepare, fn = CASES[case]
+            best, med, runs = timeit(fn, prepare(series, long, wide), args.repeat)
+            note = ""
+            old = prev.get((case, n))
+            if old:
+                pct = (best / old["best_s"] - 1) * 100
+                note = f"{pct:+6.1f}% vs {old['commit']}"
+                if pct > REGRESSION_PCT:
+                    note += "  ← REGRESI"
+                    regressions.append((case, n, pct))
+            print(f"{case:<14} {n:>9} {best * 1e3:13.2f} {med * 1e3:12.2f} {runs:>5}  {note}")
+            records.append({"commit": commit, "date": stamp, "machine": args.machine,
+                            "python": platform.python_version(), "pandas": pd.__version__,
+                            "case": case, "n": n, "best_s": best, "median_s": med, "runs": runs})
+
+    if args.save:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, "a") as f:
+            for rec in records:
+                f.write(json.dumps(rec) + "\n")
+        print(f"{len(records)} hasil disimpan ke {os.path.relpath(RESULTS_PATH)}")
+    if args.check and regressions:
+        raise SystemExit(f"{len(regressions)} regresi > {REGRESSION_PCT:.0f}%: "
+                         + ", ".join(f"{c}@{n} {p:+.0f}%" for c, n, p in regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# synthetic.py — Smallow • Generator data sintetis 11 variabel main.py
+# ==========================================================
+# Deret realistis untuk benchmark: satu payload tiap 60 detik seperti main.py,
+# malam hari kepala di bantal (FSR tinggi, EOG rendah, CO2 naik perlahan), siang kosong.
+# n_points = total titik semua variabel (≈ n_points / 11 payload), ±1% titik hilang
+# (gagal baca sensor) dan jitter timestamp beberapa ms antar variabel.
+
+import json
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+VARIABLES = ["fsr1-raw", "fsr2-raw", "eog-mag", "vibration", "lead-off", "temp-c",
+             "hum-rh", "co2-ppm", "tvoc-ppb", "max-red", "max-ir"]
+START_MS = 1_760_000_000_000   # 2025-10-09 08:53 UTC
+INTERVAL_MS = 60_000           # SEND_INTERVAL_MS di main.py
+LOCAL_TZ = "Asia/Jakarta"
+DROP_RATE = 0.01
+JITTER_MS = 40
+
+
+def _occupied(hour: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Kepala di bantal ±22:30–06:30 lokal, dengan sesekali bangun sebentar."""
+    night = (hour >= 22.5) | (hour < 6.5)
+    wake = rng.random(hour.size) < 0.02
+    return night & ~wake
+
+
+def generate(n_points: int, seed: int = 0, start_ms: int = START_MS,
+             interval_ms: int = INTERVAL_MS) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """variabel → (t_ms int64, nilai float64) urut naik, total ±n_points titik."""
+    rng = np.random.default_rng(seed)
+    n = max(1, -(-n_points // len(VARIABLES)))
+    t0 = start_ms + np.arange(n, dtype=np.int64) * interval_ms
+    hour = ((t0 // 1000 + 7 * 3600) % 86400) / 3600.0          # jam lokal WIB
+    occ = _occupied(hour, rng)
+    day = np.sin(2 * np.pi * (hour - 9) / 24)
+
+    # CO2 naik selama bantal terisi (ruang tertutup), turun lagi saat kosong
+    co2 = np.empty(n)
+    level = 450.0
+    for i, o in enumerate(occ):
+        level += 1.2 if o else -(level - 420.0) * 0.02
+        co2[i] = level
+    pulse = np.sin(2 * np.pi * 1.1 * t0 / 1000.0)
+
+    vals = {
+        "fsr1-raw": np.where(occ, rng.normal(2400, 250, n), rng.gamma(1.5, 30, n)),
+        "fsr2-raw": np.where(occ, rng.normal(2100, 300, n), rng.gamma(1.5, 30, n)),
+        "eog-mag": np.where(occ, rng.gamma(2.0, 40, n), rng.normal(380, 90, n)),
+        "vibration": rng.choice([0, 300, 1023], n, p=[0.93, 0.05, 0.02]).astype(np.float64),
+        "lead-off": (rng.random(n) < 0.03).astype(np.float64),
+        "temp-c": np.round(24.0 + 1.8 * day + rng.normal(0, 0.15, n), 2),
+        "hum-rh": np.round(58.0 - 7.0 * day + rng.normal(0, 0.8, n), 2),
+        "co2-ppm": np.round(co2 + rng.normal(0, 15, n)),
+        "tvoc-ppb": np.round(rng.lognormal(4.3, 0.6, n)),
+        "max-red": np.where(occ, 82_000 + 900 * pulse + rng.normal(0, 300, n), rng.normal(2500, 400, n)),
+        "max-ir": np.where(occ, 95_000 + 1200 * pulse + rng.normal(0, 300, n), rng.normal(3000, 400, n)),
+    }
+    for v in ("fsr1-raw", "fsr2-raw", "eog-mag", "max-red", "max-ir"):
+        vals[v] = np.clip(np.round(vals[v]), 0, None)
+
+    out = {}
+    for v in VARIABLES:
+        keep = rng.random(n) >= DROP_RATE
+        t = t0 + rng.integers(0, JITTER_MS, n)
+        out[v] = (t[keep], vals[v][keep].astype(np.float64))
+    return out
+
+
+def ubidots_body(t_ms: np.ndarray, values: np.ndarray) -> bytes:
+    """Respons /values (terbaru dulu, satu halaman) sebagai bytes JSON."""
+    results = [{"timestamp": int(t), "value": float(v), "context": {}, "created_at": int(t) + 150}
+               for t, v in zip(t_ms[::-1], values[::-1])]
+    return json.dumps({"count": len(results), "next": None, "previous": None, "results": results}).encode()
+
+
+def long_frame(series: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> pd.DataFrame:
+    """Seperti gabungan fetch_many: [time (UTC), value, variable]."""
+    frames = [pd.DataFrame({"time": pd.to_datetime(t, unit="ms", utc=True), "value": v, "variable": var})
+              for var, (t, v) in series.items()]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,289 @@
+# ubidots_emulator.py — Smallow • Pengganti lokal API Ubidots v1.6 untuk uji beban
+# ==========================================================
+# Melayani data sintetis (benchmarks/synthetic.py) untuk device apa pun:
+#   GET /api/v1.6/devices/{device}/{var}/values   start, end, page_size, page (+ link `next`),
+#                                                 aggregation (avg|min|max|sum|count) + resolution (15m, 1h, 1d…)
+#   GET /api/v1.6/devices/{device}/{var}/lv       {"timestamp", "value"}
+#   GET /api/v1.6/datasources/                    device fleet (--devices) dengan paginasi
+#   GET /_stats, POST /_reset                     jumlah request per endpoint / status (untuk harness)
+# Injeksi gangguan: latensi + jitter, status acak (--fail 401=0.05 --fail 500=0.01),
+# /values selalu ditolak (--values-status 402 → klien fallback ke /lv), rate limit per token (429).
+#
+#   python benchmarks/ubidots_emulator.py --port 8900 --latency-ms 80 --jitter-ms 40 --rate-limit 20
+#   → di secrets.toml: UBIDOTS_BASE = "http://127.0.0.1:8900"
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from synthetic import VARIABLES, generate
+
+DAY_MS = 24 * 60 * 60 * 1000
+MAX_PAGE_SIZE = 200
+PATH_RE = re.compile(r"^/api/v1\.6/devices/([^/]+)/([^/]+)/(values|lv)/?$")
+RES_UNITS = {"s": 1_000, "m": 60_000, "t": 60_000, "h": 3_600_000, "d": DAY_MS, "w": 7 * DAY_MS}
+AGGREGATIONS = {"avg": np.mean, "mean": np.mean, "min": np.min, "max": np.max, "sum": np.sum, "count": np.size}
+
+
+class Config:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, fail: Optional[Dict[int, float]] = None,
+                 values_status: Optional[int] = None, rate_limit: float = 0.0, days: int = 7, devices: int = 1,
+                 prefix: str = "smallow", seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail = fail or {}                  # status → peluang per request
+        self.values_status = values_status      # mis. 402: /values selalu ditolak
+        self.rate_limit = rate_limit            # request/detik per token (0 = tanpa batas)
+        self.days = days                        # riwayat yang tersedia mundur dari saat start
+        self.devices = devices
+        self.prefix = prefix
+        self.seed = seed
+
+
+class Store:
+    """Deret per (device, variabel), dibuat sekali saat pertama diminta; titik > sekarang disembunyikan."""
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.start_ms = int(time.time() * 1000) - cfg.days * DAY_MS
+        self._series: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]] = {}
+        self._lock = threading.Lock()
+
+    def series(self, device: str, var: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            if device not in self._series:
+                seed = self.cfg.seed + zlib.crc32(device.encode())
+                # +1 hari agar ada titik "baru" selama uji berjalan
+                n = (self.cfg.days + 1) * 1440 * len(VARIABLES)
+                self._series[device] = generate(n, seed=seed, start_ms=self.start_ms)
+            data = self._series[device].get(var)
+        if data is None:
+            return None
+        t, v = data
+        k = np.searchsorted(t, int(time.time() * 1000), side="right")
+        return t[:k], v[:k]
+
+
+class RateLimiter:
+    """Token bucket per token API."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.rate, now))
+            tokens = min(self.rate, tokens + (now - last) * self.rate)
+            ok = tokens >= 1.0
+            self._buckets[key] = (tokens - 1.0 if ok else tokens, now)
+        return ok
+
+
+def parse_resolution(text: str) -> int:
+    m = re.fullmatch(r"(\d+)\s*([a-zA-Z])", text.strip())
+    if not m or m.group(2).lower() not in RES_UNITS:
+        raise ValueError(f"resolution tidak dikenal: {text!r}")
+    return int(m.group(1)) * RES_UNITS[m.group(2).lower()]
+
+
+def aggregate(t: np.ndarray, v: np.ndarray, how: str, width_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Bucket [t0, t0+width) → (awal bucket, nilai agregat) urut naik."""
+    if how not in AGGREGATIONS:
+        raise ValueError(f"aggregation tidak dikenal: {how!r}")
+    if t.size == 0:
+        return t, v
+    bucket = t // width_ms * width_ms
+    starts, first = np.unique(bucket, return_index=True)
+    fn = AGGREGATIONS[how]
+    vals = np.array([fn(chunk) for chunk in np.split(v, first[1:])], dtype=np.float64)
+    return starts, vals
+
+
+class Emulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, cfg: Config):
+        super().__init__(addr, Handler)
+        self.cfg = cfg
+        self.store = Store(cfg)
+        self.limiter = RateLimiter(cfg.rate_limit)
+        self.counts: Counter = Counter()
+        self.rng = random.Random(cfg.seed)
+        self._lock = threading.Lock()
+
+    def count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+    @property
+    def base(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Emulator
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/_reset":
+            self.server.reset()
+            return self.send_json(200, {"ok": True})
+        self.send_json(404, {"detail": "Not found."})
+
+    def do_GET(self):
+        srv, cfg = self.server, self.server.cfg
+        url = urlparse(self.path)
+        if url.path == "/_stats":
+            return self.send_json(200, srv.stats())
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        m = PATH_RE.match(url.path)
+        endpoint = m.group(3) if m else ("datasources" if url.path.rstrip("/").endswith("/datasources") else "other")
+        srv.count(endpoint)
+
+        delay = cfg.latency_ms + srv.rng.uniform(-cfg.jitter_ms, cfg.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        token = self.headers.get("X-Auth-Token", "")
+        status = self.pick_status(endpoint, token)
+        srv.count(f"status_{status}")
+        if status != 200:
+            return self.send_json(status, {"code": status, "message": "emulated error"})
+
+        try:
+            if endpoint == "datasources":
+                return self.send_json(200, self.page(self.datasources(), q, url.path, list))
+            if not m:
+                return self.send_json(404, {"detail": "Not found."})
+            data = srv.store.series(m.group(1), m.group(2))
+            if data is None:
+                return self.send_json(404, {"detail": "Not found."})
+            t, v = data
+            if endpoint == "lv":
+                if t.size == 0:
+                    return self.send_json(404, {"detail": "Not found."})
+                return self.send_json(200, {"timestamp": int(t[-1]), "value": float(v[-1])})
+            return self.send_json(200, self.page(self.values(t, v, q), q, url.path, self.render))
+        except (ValueError, KeyError) as e:
+            self.send_json(400, {"code": 400, "message": str(e)})
+
+    def pick_status(self, endpoint: str, token: str) -> int:
+        srv, cfg = self.server, self.server.cfg
+        if not token:
+            return 401
+        if not srv.limiter.allow(token):
+            return 429
+        if endpoint == "values" and cfg.values_status:
+            return cfg.values_status
+        r = srv.rng.random()
+        for status, p in cfg.fail.items():
+            if r < p:
+                return status
+            r -= p
+        return 200
+
+    def datasources(self):
+        cfg = self.server.cfg
+        return [{"label": f"{cfg.prefix}-{i:03d}", "name": f"{cfg.prefix}-{i:03d}"} for i in range(1, cfg.devices + 1)]
+
+    @staticmethod
+    def values(t: np.ndarray, v: np.ndarray, q: Dict[str, str]) -> np.ndarray:
+        """Titik dalam [start, end] (opsional diagregasi) → array (n, 2) terbaru dulu."""
+        start = int(q.get("start", 0))
+        end = int(q.get("end", 2 ** 62))
+        lo, hi = np.searchsorted(t, start, side="left"), np.searchsorted(t, end, side="right")
+        t, v = t[lo:hi], v[lo:hi]
+        if "aggregation" in q:
+            t, v = aggregate(t, v, q["aggregation"], parse_resolution(q.get("resolution", "1h")))
+        return np.column_stack((t[::-1].astype(np.float64), v[::-1]))
+
+    @staticmethod
+    def render(rows: np.ndarray):
+        return [{"timestamp": int(ts), "value": float(val)} for ts, val in rows]
+
+    def page(self, items, q: Dict[str, str], path: str, render):
+        """Satu halaman `items` (hanya halaman ini yang diubah ke JSON) + link `next` seperti Ubidots."""
+        size = max(1, min(int(q.get("page_size", 50)), MAX_PAGE_SIZE))
+        page = max(1, int(q.get("page", 1)))
+        chunk = items[(page - 1) * size:page * size]
+        nxt = None
+        if page * size < len(items):
+            nxt = f"{self.server.base}{path}?{urlencode(dict(q, page=page + 1))}"
+        return {"count": len(items), "next": nxt, "previous": None, "results": render(chunk)}
+
+
+def start(cfg: Optional[Config] = None, host: str = "127.0.0.1", port: int = 0) -> Emulator:
+    """Jalankan emulator di thread latar (port 0 = port bebas) → server (server.base untuk UBIDOTS_BASE)."""
+    srv = Emulator((host, port), cfg or Config())
+    threading.Thread(target=srv.serve_forever, name="ubidots-emulator", daemon=True).start()
+    return srv
+
+
+def parse_fail(items) -> Dict[int, float]:
+    out = {}
+    for item in items or []:
+        code, p = item.split("=", 1)
+        out[int(code)] = float(p)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Emulator lokal API Ubidots v1.6 (data sintetis Smallow)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--fail", action="append", metavar="STATUS=P", help="mis. 401=0.05 (boleh berulang)")
+    ap.add_argument("--values-status", type=int, help="tolak semua /values dengan status ini (401/402/404)")
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="request/detik per token → 429")
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--devices", type=int, default=1, help="jumlah device di /datasources")
+    ap.add_argument("--prefix", default="smallow")
+    args = ap.parse_args()
+
+    cfg = Config(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, fail=parse_fail(args.fail),
+                 values_status=args.values_status, rate_limit=args.rate_limit, days=args.days,
+                 devices=args.devices, prefix=args.prefix)
+    srv = Emulator((args.host, args.port), cfg)
+    print(f"Emulator Ubidots di {srv.base} (Ctrl+C untuk berhenti)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# disk_cache.py — Smallow • Cache riwayat kolumnar di disk (warm start)
+# ==========================================================
+# Satu file .npy per device/variabel/hari (UTC) berisi array terstruktur (t: int64 ms, v: float64),
+# dibaca dengan np.load(mmap_mode="r") sehingga hanya potongan yang dipakai yang disentuh.
+# meta.json per (device, variabel) menyimpan awal jendela yang tercakup tanpa celah ("since").
+# Lokasi: env SMALLOW_CACHE_DIR, default ./.cache/history di samping modul ini.
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+DAY_MS = 24 * 60 * 60 * 1000
+DTYPE = np.dtype([("t", "<i8"), ("v", "<f8")])
+DEFAULT_ROOT = Path(os.environ.get("SMALLOW_CACHE_DIR") or Path(__file__).resolve().parent / ".cache" / "history")
+
+
+def _safe(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def _day_str(day: int) -> str:
+    return np.datetime64(int(day), "D").astype(str)
+
+
+def _atomic_save(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+class DiskCache:
+    """File .npy per hari untuk setiap (device, variable) + meta "since"."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = Path(root)
+
+    def _dir(self, device: str, var: str) -> Path:
+        return self.root / _safe(device) / _safe(var)
+
+    def since(self, device: str, var: str) -> Optional[int]:
+        try:
+            return int(json.loads((self._dir(device, var) / "meta.json").read_text())["since"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def load(self, device: str, var: str, start_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(t_ms, values) urut naik untuk t >= start_ms; file lama tidak dibuka sama sekali."""
+        d = self._dir(device, var)
+        first_day = _day_str(start_ms // DAY_MS)
+        parts = []
+        for path in sorted(d.glob("*.npy")) if d.is_dir() else []:
+            if path.stem < first_day:
+                continue
+            arr = np.load(path, mmap_mode="r")
+            parts.append(arr[np.searchsorted(arr["t"], start_ms):])
+        if not parts:
+            return np.empty(0, "<i8"), np.empty(0, "<f8")
+        arr = np.concatenate(parts)
+        return np.asarray(arr["t"]), np.asarray(arr["v"])
+
+    def write(self, device: str, var: str, t_ms: np.ndarray, values: np.ndarray, since_ms: int) -> None:
+        """Gabungkan titik ke file harian masing-masing (dedupe per timestamp, titik baru menang)."""
+        d = self._dir(device, var)
+        d.mkdir(parents=True, exist_ok=True)
+        new = np.empty(len(t_ms), DTYPE)
+        new["t"], new["v"] = t_ms, values
+        days = new["t"] // DAY_MS
+        for day in np.unique(days):
+            path = d / f"{_day_str(day)}.npy"
+            chunk = new[days == day]
+            if path.exists():
+                chunk = np.concatenate([chunk, np.load(path)])
+            # np.unique mengambil kemunculan pertama → titik baru (di depan) menang
+            _, idx = np.unique(chunk["t"], return_index=True)
+            _atomic_save(path, chunk[idx])
+        self.set_since(device, var, since_ms)
+
+    def set_since(self, device: str, var: str, since_ms: int) -> None:
+        d = self._dir(device, var)
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / "meta.json.tmp"
+        tmp.write_text(json.dumps({"since": int(since_ms)}))
+        os.replace(tmp, d / "meta.json")
+
+    def prune(self, device: str, var: str, before_ms: int) -> None:
+        """Hapus file harian yang seluruhnya lebih tua dari before_ms."""
+        d = self._dir(device, var)
+        last_day = _day_str(before_ms // DAY_MS)
+        for path in d.glob("*.npy") if d.is_dir() else []:
+            if path.stem < last_day:
+                path.unlink(missing_ok=True)
@@ -0,0 +1,70 @@
+# downsample.py — Smallow • Downsampling deret waktu sebelum dirender Altair
+# ==========================================================
+# - LTTB (Largest-Triangle-Three-Buckets): bentuk kurva & puncak tetap terjaga
+# - Min/Max envelope: per bucket ambil titik minimum dan maksimum (spike EOG / lonjakan CO2 tidak hilang)
+# Target jumlah titik ≈ lebar grafik dalam piksel; data kecil dikembalikan apa adanya.
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+CHART_POINTS = 800   # ≈ lebar grafik (px) untuk use_container_width
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indeks titik terpilih (urut naik). x harus urut naik dan tanpa NaN."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out-2 bucket di antara titik pertama dan terakhir
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # luas segitiga (titik terpilih sebelumnya, kandidat, rata-rata bucket berikutnya)
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indeks titik min & max per bucket (±n_out titik, urut naik), ditambah titik pertama/terakhir."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = n_out // 2
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))   # per bucket urut menurut y
+    starts = np.searchsorted(bucket, np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    idx = np.concatenate(([0, n - 1], order[starts], order[ends]))
+    return np.unique(idx)
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample_frame(df: pd.DataFrame, x: str = "time_local", y: str = "value", by: str = "variable",
+                     n_out: int = CHART_POINTS, method: Optional[str] = "lttb") -> pd.DataFrame:
+    """Downsample tiap deret (per kolom `by`) ke ±n_out titik; method=None → tanpa downsampling."""
+    if method is None or df.empty:
+        return df
+    pick = METHODS[method]
+    parts = []
+    for _, g in df.groupby(by, sort=False, observed=True):
+        g = g.sort_values(x)
+        xs = g[x].astype("int64").to_numpy() if g[x].dtype.kind == "M" else g[x].to_numpy()
+        ys = pd.to_numeric(g[y], errors="coerce").to_numpy(np.float64)
+        parts.append(g.iloc[pick(xs, ys, n_out)])
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,120 @@
+# endpoint_health.py — Smallow • Registry kesehatan endpoint Ubidots
+# ==========================================================
+# - Mengingat base URL + mode ("values" | "lv") yang terakhir berhasil per (device, variabel)
+# - Circuit breaker per base: setelah gagal, base dilewati selama backoff eksponensial
+# - Retry dengan jitter untuk error sementara (koneksi putus, 429, 5xx)
+# Satu instance REGISTRY dipakai bersama oleh seluruh sesi di proses yang sama.
+
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import requests
+
+BASE_BACKOFF_S = 5.0      # circuit terbuka 5 s setelah gagal pertama, lalu 10, 20, ...
+MAX_BACKOFF_S = 300.0
+LV_RECHECK_S = 600.0      # mode "lv" yang sticky dicoba ulang ke /values setelah 10 menit
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY_S = 0.3
+RETRY_MAX_DELAY_S = 2.0
+
+T = TypeVar("T")
+
+
+def is_transient(exc: Exception) -> bool:
+    """Error yang layak di-retry / dianggap base bermasalah (bukan 4xx biasa)."""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        code = exc.response.status_code
+        return code == 429 or code >= 500
+    return False
+
+
+def retry_call(fn: Callable[[], T], attempts: int = RETRY_ATTEMPTS,
+               base_delay: float = RETRY_BASE_DELAY_S, max_delay: float = RETRY_MAX_DELAY_S) -> T:
+    """
+    Panggil fn; ulangi untuk error sementara dengan backoff eksponensial + full jitter.
+    Timeout tidak di-retry: base yang lambat diserahkan ke circuit breaker.
+    """
+    for i in range(attempts):
+        try:
+            return fn()
+        except requests.RequestException as e:
+            if i == attempts - 1 or isinstance(e, requests.Timeout) or not is_transient(e):
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** i)))
+    raise RuntimeError("unreachable")
+
+
+class EndpointRegistry:
+    """Circuit breaker per base URL + pilihan base/mode yang sticky per (device, variable)."""
+
+    def __init__(self, base_backoff_s: float = BASE_BACKOFF_S, max_backoff_s: float = MAX_BACKOFF_S,
+                 lv_recheck_s: float = LV_RECHECK_S, clock: Callable[[], float] = time.monotonic):
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.lv_recheck_s = lv_recheck_s
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+        self._sticky: Dict[Tuple[str, str], Tuple[str, str, float]] = {}
+
+    def is_open(self, base: str) -> bool:
+        with self._lock:
+            return self._open_until.get(base, 0.0) > self.clock()
+
+    def order(self, bases: List[str], device: str, var: str) -> List[str]:
+        """
+        Urutan base yang dicoba: base sticky lebih dulu, base dengan circuit terbuka dilewati.
+        Jika semua terbuka, kembalikan base yang paling cepat pulih (half-open) agar tetap ada percobaan.
+        """
+        with self._lock:
+            now = self.clock()
+            sticky = self._sticky.get((device, var))
+            ordered = sorted(bases, key=lambda b: 0 if sticky and b == sticky[0] else 1)
+            closed = [b for b in ordered if self._open_until.get(b, 0.0) <= now]
+            if closed:
+                return closed
+            return [min(ordered, key=lambda b: self._open_until.get(b, 0.0))] if ordered else []
+
+    def preferred_mode(self, base: str, device: str, var: str) -> Optional[str]:
+        """Mode terakhir yang berhasil di base ini; "lv" kedaluwarsa setelah lv_recheck_s."""
+        with self._lock:
+            sticky = self._sticky.get((device, var))
+            if not sticky or sticky[0] != base:
+                return None
+            _, mode, since = sticky
+            if mode == "lv" and self.clock() - since > self.lv_recheck_s:
+                return None
+            return mode
+
+    def mark_ok(self, base: str) -> None:
+        """Base merespons normal → tutup circuit."""
+        with self._lock:
+            self._failures.pop(base, None)
+            self._open_until.pop(base, None)
+
+    def record_success(self, base: str, device: str, var: str, mode: str) -> None:
+        """Tutup circuit base dan ingat base/mode ini untuk (device, var) mulai sekarang."""
+        self.mark_ok(base)
+        with self._lock:
+            self._sticky[(device, var)] = (base, mode, self.clock())
+
+    def record_failure(self, base: str) -> None:
+        with self._lock:
+            n = self._failures.get(base, 0) + 1
+            self._failures[base] = n
+            self._open_until[base] = self.clock() + min(self.max_backoff_s, self.base_backoff_s * 2 ** (n - 1))
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Ringkasan untuk panel debug."""
+        with self._lock:
+            now = self.clock()
+            return {b: {"failures": n, "open_for_s": round(max(0.0, self._open_until.get(b, 0.0) - now), 1)}
+                    for b, n in self._failures.items()}
+
+
+REGISTRY = EndpointRegistry()
@@ -0,0 +1,112 @@
+# fleet.py — Smallow • Mode fleet: banyak bantal Smallow dalam satu koleksi MongoDB
+# ==========================================================
+# ingest.py --fleet menulis semua device ke koleksi fleet (dokumen ber-`device`) dan
+# memperbarui koleksi <koleksi>_latest (satu dokumen per device × variabel).
+# Ringkasan dashboard:
+# - KPI terakhir semua device: SATU query ke <koleksi>_latest
+# - Skor tidur per device: dihitung per shard (device) secara paralel dan di-cache;
+#   hanya device yang malamnya berganti atau cache-nya kedaluwarsa yang dihitung ulang.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from pymongo.collection import Collection
+
+import alignment
+import mongo_store
+import sleep_analysis
+from smallow.settings import FLEET_COLL
+
+SCORE_TTL_S = 600        # skor malam berjalan dihitung ulang paling sering tiap 10 menit
+FLEET_WORKERS = 8        # paralelisme query per device
+NIGHT_LIMIT = 2000       # titik mentah per variabel untuk satu malam (1 titik/menit = 1440)
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FLEET_WORKERS, thread_name_prefix="fleet")
+        return _pool
+
+
+def device_wide(coll: Collection, device: str, vars_: Iterable[str], tz: str, start_ms: int, end_ms: int,
+                limit_points: int) -> pd.DataFrame:
+    """Frame lebar sejajar waktu untuk satu device (drill-down & skor)."""
+    frames = [mongo_store.read_recent(coll, v, start_ms, end_ms, limit_points, device=device) for v in vars_]
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return alignment.align_wide(pd.DataFrame(columns=["time", "value", "variable"]), tz)
+    return alignment.align_wide(pd.concat(frames, ignore_index=True), tz)
+
+
+class ScoreCache:
+    """Skor tidur per device, disimpan per (device, malam); kedaluwarsa setelah ttl_s."""
+
+    def __init__(self, ttl_s: float = SCORE_TTL_S):
+        self.ttl_s = ttl_s
+        self._items: Dict[str, Tuple[str, float, dict]] = {}   # device → (malam, dihitung, skor)
+        self._lock = threading.Lock()
+
+    def stale(self, device: str, night: str) -> bool:
+        with self._lock:
+            item = self._items.get(device)
+        return item is None or item[0] != night or time.monotonic() - item[1] > self.ttl_s
+
+    def put(self, device: str, night: str, score: dict):
+        with self._lock:
+            self._items[device] = (night, time.monotonic(), score)
+
+    def get(self, device: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(device)
+        return item[2] if item else None
+
+
+SCORES = ScoreCache()
+
+
+def _night_score(coll: Collection, device: str, vars_: List[str], tz: str, last: pd.Timestamp) -> dict:
+    start, end = sleep_analysis.night_window(last)
+    start_ms, end_ms = int(start.value // 1_000_000), int(end.value // 1_000_000)
+    wide = device_wide(coll, device, vars_, tz, start_ms, end_ms, NIGHT_LIMIT)
+    # ambang FSR dari sketsa malam ini (semua titik, meski NIGHT_LIMIT memotong frame); seri gabungan
+    # fsr1/fsr2 yang sama dengan yang dibandingkan sleep_score
+    sk = mongo_store.read_sketch(coll, (sleep_analysis.FSR_COMBINED,), start_ms, end_ms - 1, tz=tz, device=device)
+    return sleep_analysis.sleep_score(wide, sk.percentile(sleep_analysis.FSR_PERCENTILE) if sk is not None else None)
+
+
+def overview(coll: Collection, vars_: Iterable[str], tz: str, devices: Optional[Iterable[str]] = None,
+             scores: ScoreCache = SCORES) -> pd.DataFrame:
+    """
+    Satu baris per device: last_seen, malam, skor & jam tidur, lalu nilai terakhir tiap variabel.
+    Skor yang basi dihitung ulang paralel (satu tugas per device); sisanya dari cache.
+    """
+    vars_ = list(vars_)
+    latest = mongo_store.read_latest(coll, devices)
+    if latest.empty:
+        return pd.DataFrame(columns=["device", "last_seen", "night", "score", "sleep_hours"] + vars_)
+    latest["time"] = latest["time"].dt.tz_convert(tz)
+    last_seen = latest.groupby("device")["time"].max()
+    nights = {d: sleep_analysis.night_key(pd.DatetimeIndex([t])) for d, t in last_seen.items()}
+
+    todo = [d for d in last_seen.index if scores.stale(d, nights[d])]
+    futures = {d: _get_pool().submit(_night_score, coll, d, vars_, tz, last_seen[d]) for d in todo}
+    for d, fut in futures.items():
+        try:
+            scores.put(d, nights[d], fut.result())
+        except Exception:
+            pass   # device ini tanpa skor; dicoba lagi pada refresh berikutnya
+
+    kpi = latest.pivot_table(index="device", columns="variable", values="value", aggfunc="last")
+    out = pd.DataFrame({"last_seen": last_seen, "night": pd.Series(nights)})
+    out["score"] = [(scores.get(d) or {}).get("score") for d in out.index]
+    out["sleep_hours"] = [(scores.get(d) or {}).get("sleep_hours") for d in out.index]
+    out = out.join(kpi.reindex(columns=[v for v in vars_ if v in kpi.columns]))
+    return out.rename_axis("device").reset_index().sort_values("device", ignore_index=True)
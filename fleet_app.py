@@ -0,0 +1,111 @@
+# fleet_app.py — Smallow • Dashboard fleet (banyak bantal) dari MongoDB
+# ==========================================================
+# Data diisi oleh `python ingest.py --fleet`; halaman ini hanya membaca.
+# Ringkasan semua device (KPI terakhir + skor tidur semalam) lalu drill-down per device.
+
+from datetime import datetime
+
+import streamlit as st
+
+# pandas/altair/pymongo & modul repo dimuat saat pertama dipakai (lihat smallow/__init__.py)
+from smallow import (PYMONGO_HINT, Settings, alignment, alt, available, downsample, fleet, mongo_store, pd,
+                     ubidots_client)
+
+# ================== KONFIGURASI via Secrets ==================
+CFG = Settings(st.secrets)
+VARS, LOCAL_TZ = CFG.vars, CFG.local_tz
+MONGO_URI, DB_NAME, FLEET_COLL = CFG.mongo_uri, CFG.db_name, CFG.fleet_coll
+
+KPI_VARS = ["temp-c", "hum-rh", "co2-ppm", "eog-mag"]
+
+# ================== UI ==================
+st.set_page_config(page_title="Smallow • Fleet", layout="wide")
+st.title("🛏️ Smallow • Fleet Overview")
+
+refresh = st.sidebar.slider("Refresh (detik)", 10, 120, 30)
+days    = st.sidebar.slider("Rentang drill-down (hari)", 1, 30, 2)
+limit   = st.sidebar.slider("Jumlah titik/variabel (drill-down)", 100, 3000, 1000, step=100)
+chart_ds = st.sidebar.selectbox("Downsampling grafik", ["lttb", "minmax", None],
+                                format_func=lambda m: {"lttb": "LTTB", "minmax": "Min/Max envelope", None: "Semua titik"}[m])
+st.sidebar.caption(f"Koleksi: `{DB_NAME}.{FLEET_COLL}` • diisi `python ingest.py --fleet`")
+
+# ---- pymongo wajib (halaman ini hanya membaca MongoDB); dicek tanpa import, setelah judul & sidebar tampil
+if not available("pymongo"):
+    st.error(PYMONGO_HINT)
+    st.stop()
+
+coll = mongo_store.open_collection(MONGO_URI, DB_NAME, FLEET_COLL, by_device=True)
+if coll is None:
+    st.warning("MongoDB belum dikonfigurasi atau tidak bisa dihubungi (MONGO_URI di Secrets).")
+    st.stop()
+
+# ================== Ringkasan semua device ==================
+@st.cache_data(ttl=15, show_spinner=False)
+def load_overview(vars_: tuple) -> pd.DataFrame:
+    return fleet.overview(coll, vars_, LOCAL_TZ)
+
+@st.fragment(run_every=refresh)
+def overview_section():
+    df = load_overview(tuple(VARS))
+    if df.empty:
+        st.info("Belum ada device di koleksi fleet.")
+        return
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Device", len(df))
+    c2.metric("Rata-rata skor tidur", f"{df['score'].mean():.0f}" if df["score"].notna().any() else "N/A")
+    stale = (pd.Timestamp.now(tz=LOCAL_TZ) - df["last_seen"]) > pd.Timedelta(minutes=10)
+    c3.metric("Tidak aktif > 10 menit", int(stale.sum()))
+    cols = ["device", "last_seen", "night", "score", "sleep_hours"] + [v for v in KPI_VARS if v in df.columns]
+    st.dataframe(df[cols].sort_values("score", na_position="first"), use_container_width=True, hide_index=True)
+    st.caption(f"Diperbarui: {datetime.now().astimezone().strftime('%H:%M:%S %Z')} — tiap {refresh}s")
+
+st.subheader("📋 Semua device")
+overview_section()
+
+# ================== Drill-down ==================
+st.subheader("🔎 Detail device")
+devices = sorted(load_overview(tuple(VARS))["device"])
+device = st.selectbox("Device", devices) if devices else None
+
+@st.fragment(run_every=refresh)
+def device_section(device: str):
+    end = ubidots_client.now_ms()
+    wide = fleet.device_wide(coll, device, VARS, LOCAL_TZ, end - days * ubidots_client.DAY_MS, end, limit)
+    if wide.empty:
+        st.info("Tidak ada data untuk device ini pada rentang terpilih.")
+        return
+    latest = alignment.latest_values(wide)
+    cols = st.columns(max(1, min(5, len(latest))))
+    for i, (_, row) in enumerate(latest.iterrows()):
+        c = cols[i % len(cols)]
+        c.metric(str(row["variable"]), f"{float(row['value']):.2f}")
+        c.caption(f"⏱️ {row['time_local'].strftime('%H:%M:%S')}")
+
+    sel = st.multiselect("Pilih variabel untuk grafik", options=list(wide.columns),
+                         default=[v for v in ["temp-c", "hum-rh", "fsr1-raw"] if v in wide.columns][:3])
+    plot_df = downsample.downsample_frame(alignment.to_long(wide, sel), n_out=downsample.CHART_POINTS,
+                                          method=chart_ds)
+    if not plot_df.empty:
+        chart = alt.Chart(plot_df).mark_line().encode(
+            x=alt.X("time_local:T", title=f"Waktu ({LOCAL_TZ})"),
+            y=alt.Y("value:Q", title="Nilai"),
+            color="variable:N",
+            tooltip=["time_local:T", "variable:N", "value:Q"]
+        ).properties(height=320).interactive()
+        st.altair_chart(chart, use_container_width=True)
+
+    score = fleet.SCORES.get(device)
+    if score:
+        st.write(f"- Skor kualitas tidur semalam: **{score['score']:.0f}/100** • "
+                 f"durasi tidur estimasi: **{score['sleep_hours']:.1f} jam**")
+
+    # Indeks sesi (ingest.py --fleet → sleep_sessions.py): satu dokumen per sesi, tanpa memindai titik mentah
+    sessions = mongo_store.read_sessions(coll, end - days * ubidots_client.DAY_MS, end, device=device)
+    if not sessions.empty:
+        sessions["start"] = sessions["start"].dt.tz_convert(LOCAL_TZ)
+        sessions["end"] = sessions["end"].dt.tz_convert(LOCAL_TZ)
+        st.dataframe(sessions[["night", "start", "end", "duration_h", "score", "temp_mean", "co2_mean", "open"]]
+                     .round(2), use_container_width=True, hide_index=True)
+
+if device:
+    device_section(device)
@@ -0,0 +1,148 @@
+# history_store.py — Smallow • Riwayat data per (device, variabel) di memori (+ disk)
+# ==========================================================
+# Menyimpan titik yang sudah pernah diambil dari Ubidots beserta high-water mark
+# (timestamp ms terbaru) sehingga refresh berikutnya cukup meminta start=hw+1.
+# Satu instance STORE dipakai bersama oleh seluruh sesi di proses yang sama.
+# Jika diberi DiskCache, riwayat juga ditulis ke disk (write-through) dan dimuat lazily
+# saat pertama kali diminta setelah restart, sehingga hanya ekor yang hilang diambil dari Ubidots.
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from disk_cache import DiskCache
+
+DAY_MS = 24 * 60 * 60 * 1000
+KEEP_DAYS = 30   # sama dengan batas slider "Rentang data (hari)"
+COLUMNS = ["time", "value", "variable"]
+
+Key = Tuple[str, str]
+
+
+def to_ms(ts) -> int:
+    return int(pd.Timestamp(ts).value // 1_000_000)
+
+
+class HistoryStore:
+    """Riwayat per (device, variable) + high-water mark dan awal jendela yang sudah tercakup."""
+
+    def __init__(self, keep_days: int = KEEP_DAYS, disk: Optional[DiskCache] = None):
+        self.keep_ms = keep_days * DAY_MS
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._frames: Dict[Key, pd.DataFrame] = {}
+        self._hw: Dict[Key, int] = {}
+        self._since: Dict[Key, int] = {}
+
+    def _load_from_disk(self, key: Key) -> None:
+        """Muat riwayat dari disk (sekali per key per proses); dipanggil dengan lock dipegang."""
+        if self.disk is None or key in self._hw:
+            return
+        device, var = key
+        try:
+            since = self.disk.since(device, var)
+            if since is None:
+                return
+            cutoff = int(time.time() * 1000) - self.keep_ms
+            t_ms, values = self.disk.load(device, var, cutoff)
+        except (OSError, ValueError):
+            return  # cache disk rusak/tidak terbaca → anggap kosong, ambil ulang dari Ubidots
+        if not len(t_ms):
+            return
+        self._frames[key] = pd.DataFrame({
+            "time": pd.to_datetime(t_ms, unit="ms", utc=True),
+            "value": values,
+            "variable": var
+        })
+        self._hw[key] = int(t_ms[-1])
+        self._since[key] = max(since, cutoff)
+
+    def _persist(self, key: Key, df: pd.DataFrame) -> None:
+        if self.disk is None:
+            return
+        device, var = key
+        try:
+            if not df.empty:
+                self.disk.write(device, var, (df["time"].astype("int64") // 1_000_000).to_numpy(),
+                                pd.to_numeric(df["value"], errors="coerce").to_numpy(np.float64),
+                                self._since[key])
+            self.disk.prune(device, var, int(time.time() * 1000) - self.keep_ms)
+        except OSError:
+            pass  # disk penuh/read-only → tetap jalan dari memori
+
+    def high_water(self, device: str, var: str) -> Optional[int]:
+        with self._lock:
+            self._load_from_disk((device, var))
+            return self._hw.get((device, var))
+
+    def covers(self, device: str, var: str, start_ms: int, min_points: int = 0) -> bool:
+        """
+        True jika riwayat sudah mencakup jendela mulai start_ms (cukup ambil ekornya saja).
+        Riwayat yang terpotong limit (since > start_ms) tetap dianggap mencakup jika sudah berisi
+        ≥ min_points titik sejak start_ms: `min_points` titik terbaru tidak bergantung pada yang lebih tua.
+        """
+        return self.covering_high_water(device, var, start_ms, min_points) is not None
+
+    def covering_high_water(self, device: str, var: str, start_ms: int, min_points: int = 0) -> Optional[int]:
+        """High-water mark jika riwayat mencakup jendela (lihat covers), dibaca di bawah lock yang sama; else None."""
+        with self._lock:
+            key = (device, var)
+            self._load_from_disk(key)
+            if key not in self._hw:
+                return None
+            if self._since[key] <= start_ms:
+                return self._hw[key]
+            df = self._frames.get(key)
+            start = pd.to_datetime(start_ms, unit="ms", utc=True)
+            covered = min_points > 0 and df is not None and int((df["time"] >= start).sum()) >= min_points
+            return self._hw[key] if covered else None
+
+    def replace(self, device: str, var: str, df: pd.DataFrame, since_ms: int) -> None:
+        """Ganti seluruh riwayat (hasil fetch penuh untuk jendela mulai since_ms)."""
+        key = (device, var)
+        with self._lock:
+            if df.empty:
+                self._frames.pop(key, None); self._hw.pop(key, None); self._since.pop(key, None)
+                return
+            df = df.sort_values("time").reset_index(drop=True)
+            self._frames[key] = df
+            self._hw[key] = to_ms(df["time"].iloc[-1])
+            self._since[key] = since_ms
+            self._persist(key, df)
+
+    def append(self, device: str, var: str, df: pd.DataFrame, now_ms: int) -> None:
+        """Gabungkan titik baru (dedupe per timestamp) lalu buang data lebih tua dari keep_days."""
+        key = (device, var)
+        if df.empty:
+            return
+        with self._lock:
+            old = self._frames.get(key)
+            merged = df if old is None or old.empty else pd.concat([old, df], ignore_index=True)
+            merged = merged.drop_duplicates(subset="time", keep="last").sort_values("time")
+            cutoff = pd.to_datetime(now_ms - self.keep_ms, unit="ms", utc=True)
+            merged = merged[merged["time"] >= cutoff].reset_index(drop=True)
+            self._frames[key] = merged
+            if not merged.empty:
+                self._hw[key] = to_ms(merged["time"].iloc[-1])
+            self._since[key] = max(self._since.get(key, 0), now_ms - self.keep_ms)
+            self._persist(key, df)
+
+    def window(self, device: str, var: str, start_ms: int, max_points: int) -> pd.DataFrame:
+        """Potongan riwayat mulai start_ms, maksimal max_points titik terbaru (urut naik)."""
+        with self._lock:
+            self._load_from_disk((device, var))
+            df = self._frames.get((device, var))
+            if df is None or df.empty:
+                return pd.DataFrame(columns=COLUMNS)
+            start = pd.to_datetime(start_ms, unit="ms", utc=True)
+            return df[df["time"] >= start].tail(max_points).reset_index(drop=True).copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear(); self._hw.clear(); self._since.clear()
+
+
+STORE = HistoryStore(disk=DiskCache())
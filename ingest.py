@@ -0,0 +1,203 @@
+# ingest.py — Smallow • Daemon ingest Ubidots → MongoDB (tanpa Streamlit)
+# ==========================================================
+# Satu proses yang menarik data device secara terjadwal dan menulis ke MongoDB,
+# sehingga dashboard cukup membaca Mongo (secret INGEST_DAEMON = true) dan biaya
+# ambil/simpan dibayar sekali, bukan per tab browser.
+#
+#   python ingest.py                 # loop tiap --interval detik
+#   python ingest.py --once          # satu siklus (cron / systemd timer)
+#   python ingest.py --fleet         # semua device (FLEET_DEVICES atau temuan /datasources
+#                                    # berawalan FLEET_PREFIX) → koleksi fleet (lihat fleet.py)
+#   python ingest.py --metrics-port 9109  # + histogram waktu per tahap di /metrics (Prometheus)
+#
+# Tiap SESSION_EVERY siklus, indeks sesi tidur per device diperbarui (sleep_sessions.py).
+#
+# Konfigurasi: variabel environment, jika tidak ada → .streamlit/secrets.toml
+# (kunci sama dengan dashboard: UBIDOTS_TOKEN, UBIDOTS_DEVICE, UBIDOTS_BASE,
+# UBIDOTS_VARS, MONGO_URI, MONGO_DB, MONGO_COLL, FLEET_DEVICES, FLEET_PREFIX, FLEET_COLL, LOCAL_TZ).
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import toml
+
+import fleet
+import mongo_store
+import sleep_sessions
+import ubidots_client
+from history_store import to_ms
+from smallow.settings import DEFAULT_VARS, INDUSTRIAL_BASE
+from stage_timing import TIMINGS
+
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+DEFAULTS = {
+    "UBIDOTS_TOKEN": "",
+    "UBIDOTS_DEVICE": "smallow",
+    "UBIDOTS_BASE": INDUSTRIAL_BASE,
+    "UBIDOTS_VARS": DEFAULT_VARS,   # sama dengan dashboard (variabel main.py)
+    "MONGO_URI": "",
+    "MONGO_DB": "smallow",
+    "MONGO_COLL": "sensor_data",
+    "FLEET_DEVICES": "",
+    "FLEET_PREFIX": "smallow",
+    "FLEET_COLL": fleet.FLEET_COLL,
+    "LOCAL_TZ": mongo_store.SKETCH_TZ,   # batas malam sketsa FSR
+}
+INTERVAL_S = 30          # main.py mengirim tiap 60 detik
+BACKFILL_DAYS = 1        # variabel yang belum ada di Mongo diisi mundur sejauh ini
+LIMIT_POINTS = 5000      # maks. titik per variabel per siklus
+DISCOVER_EVERY = 20      # mode fleet: daftar device dibaca ulang tiap sekian siklus
+SESSION_EVERY = 10       # indeks sesi tidur diperbarui tiap sekian siklus (30 s × 10 = 5 menit)
+
+log = logging.getLogger("smallow.ingest")
+
+
+def load_config(path: str = SECRETS_PATH) -> Dict[str, str]:
+    cfg = dict(DEFAULTS)
+    if os.path.exists(path):
+        cfg.update({k: str(v) for k, v in toml.load(path).items() if k in DEFAULTS})
+    cfg.update({k: os.environ[k] for k in DEFAULTS if k in os.environ})
+    return cfg
+
+
+def fetch_since(var: str, *, since: Dict[Tuple[str, str], int], base: str, device: str, token: str,
+                days_back: int, limit_points: int, end_ms: int, coll=None, by_device: bool = False) -> pd.DataFrame:
+    """
+    Titik setelah `since[(device, var)]` (atau days_back terakhir untuk deret baru); /values ditolak → /lv.
+    Terpotong limit setelah `since` → sisanya dicatat sebagai celah di coll (diisi saat save_dataframe).
+    """
+    conn = dict(base=base, device=device, token=token)
+    key = (device, var)
+    start = since[key] + 1 if key in since else end_ms - days_back * ubidots_client.DAY_MS
+    try:
+        df = ubidots_client.fetch_values(var, start_ms=start, end_ms=end_ms, limit=limit_points, **conn)
+        first = to_ms(df["time"].iloc[0]) if not df.empty else start
+        if coll is not None and key in since and len(df) >= limit_points and first > start:
+            mongo_store.record_gap(coll, var, start, first - 1, by_device=by_device, **conn)
+        return df
+    except ubidots_client.ValuesUnavailable:
+        df = ubidots_client.fetch_lv(var, default_ts=end_ms, **conn)
+        return df[df["time"] >= pd.to_datetime(start, unit="ms", utc=True)]
+
+
+def split_list(text: str) -> List[str]:
+    return [v.strip() for v in text.split(",") if v.strip()]
+
+
+def fleet_devices(cfg: Dict[str, str]) -> List[str]:
+    """FLEET_DEVICES (daftar eksplisit) atau semua device akun berawalan FLEET_PREFIX."""
+    if split_list(cfg["FLEET_DEVICES"]):
+        return split_list(cfg["FLEET_DEVICES"])
+    return ubidots_client.list_devices(base=cfg["UBIDOTS_BASE"], token=cfg["UBIDOTS_TOKEN"],
+                                       prefix=cfg["FLEET_PREFIX"])
+
+
+def ingest_once(cfg: Dict[str, str], since: Dict[Tuple[str, str], int], backfill_days: int = BACKFILL_DAYS,
+                limit_points: int = LIMIT_POINTS, devices: Optional[List[str]] = None) -> str:
+    """
+    Satu siklus: ambil titik baru semua (device, variabel) lewat scheduler paralel terbatas,
+    simpan delta, majukan `since`. devices=None → satu device (UBIDOTS_DEVICE, koleksi MONGO_COLL);
+    selain itu mode fleet (dokumen ber-device di FLEET_COLL).
+    """
+    vars_ = split_list(cfg["UBIDOTS_VARS"])
+    is_fleet = devices is not None
+    devices = devices if is_fleet else [cfg["UBIDOTS_DEVICE"]]
+    coll_name = cfg["FLEET_COLL"] if is_fleet else cfg["MONGO_COLL"]
+    coll = mongo_store.open_collection(cfg["MONGO_URI"], cfg["MONGO_DB"], coll_name, by_device=is_fleet)
+    if coll is None:
+        return "MongoDB tidak bisa dihubungi — siklus dilewati."
+    for d in devices:
+        missing = [v for v in vars_ if (d, v) not in since]
+        if missing:
+            hw = mongo_store.stored_high_water(coll, missing, device=d if is_fleet else None)
+            since.update({(d, v): t for v, t in hw.items()})
+
+    df, errors = ubidots_client.fetch_fleet(
+        devices, vars_, base=cfg["UBIDOTS_BASE"], token=cfg["UBIDOTS_TOKEN"],
+        days_back=backfill_days, limit_points=limit_points, fetch=partial(fetch_since, since=since, coll=coll, by_device=is_fleet))
+    for (d, v), err in errors.items():
+        log.warning("%s/%s: gagal ambil dari Ubidots → %s", d, v, err)
+    if df.empty:
+        return "Tidak ada titik baru."
+    msg = mongo_store.save_dataframe(df if is_fleet else df.drop(columns="device"),
+                                     cfg["MONGO_URI"], cfg["MONGO_DB"], coll_name, tz=cfg["LOCAL_TZ"])
+    if not msg.startswith("Mongo save gagal"):
+        t_ms = pd.to_datetime(df["time"], utc=True).astype("int64") // 1_000_000
+        for key, t_max in t_ms.groupby([df["device"], df["variable"]], observed=True).max().items():
+            since[key] = max(int(t_max), since.get(key, -1))
+    return msg
+
+
+def refresh_sessions(cfg: Dict[str, str], devices: Optional[List[str]] = None) -> str:
+    """Segmentasi ulang jendela terakhir tiap device → koleksi <coll>_sessions (lihat sleep_sessions.py)."""
+    is_fleet = devices is not None
+    coll_name = cfg["FLEET_COLL"] if is_fleet else cfg["MONGO_COLL"]
+    coll = mongo_store.open_collection(cfg["MONGO_URI"], cfg["MONGO_DB"], coll_name, by_device=is_fleet)
+    if coll is None:
+        return "MongoDB tidak bisa dihubungi — indeks sesi dilewati."
+    n = 0
+    for d in (devices if is_fleet else [None]):
+        try:
+            n += sleep_sessions.refresh(coll, cfg["LOCAL_TZ"], device=d)
+        except Exception:
+            log.exception("Indeks sesi %s gagal", d or cfg["UBIDOTS_DEVICE"])
+    return f"Indeks sesi: {n} sesi ditulis."
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Daemon ingest Ubidots → MongoDB untuk dashboard Smallow")
+    ap.add_argument("--interval", type=float, default=INTERVAL_S, help="detik antar siklus")
+    ap.add_argument("--backfill-days", type=int, default=BACKFILL_DAYS)
+    ap.add_argument("--limit", type=int, default=LIMIT_POINTS, help="maks. titik per variabel per siklus")
+    ap.add_argument("--once", action="store_true", help="jalankan satu siklus lalu keluar")
+    ap.add_argument("--fleet", action="store_true", help="semua device (FLEET_DEVICES / FLEET_PREFIX)")
+    ap.add_argument("--metrics-port", type=int, default=0, help="port /metrics (Prometheus); 0 = mati")
+    ap.add_argument("--secrets", default=SECRETS_PATH)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    cfg = load_config(args.secrets)
+    if not cfg["MONGO_URI"] or not cfg["UBIDOTS_TOKEN"]:
+        raise SystemExit("MONGO_URI dan UBIDOTS_TOKEN wajib diisi (environment atau secrets.toml).")
+
+    if args.metrics_port:
+        TIMINGS.serve(args.metrics_port, host="0.0.0.0")
+        log.info("Metrics di :%d/metrics", args.metrics_port)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    since: Dict[Tuple[str, str], int] = {}
+    devices: Optional[List[str]] = None
+    log.info("Mulai ingest %s vars=%s interval=%ss", "fleet" if args.fleet else f"device={cfg['UBIDOTS_DEVICE']}",
+             cfg["UBIDOTS_VARS"], args.interval)
+    cycle = 0
+    while not stop.is_set():
+        t0 = time.monotonic()
+        try:
+            if args.fleet and (devices is None or cycle % DISCOVER_EVERY == 0):
+                devices = fleet_devices(cfg)
+                log.info("Fleet: %d device", len(devices))
+            with TIMINGS.time("ingest_cycle"):
+                log.info(ingest_once(cfg, since, args.backfill_days, args.limit, devices=devices))
+            if cycle % SESSION_EVERY == 0:
+                log.info(refresh_sessions(cfg, devices))
+        except Exception:
+            log.exception("Siklus ingest gagal")
+        cycle += 1
+        if args.once:
+            break
+        stop.wait(max(0.0, args.interval - (time.monotonic() - t0)))
+    log.info("Ingest berhenti.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,746 @@
+# mongo_store.py — Smallow • Simpan & baca MongoDB (riwayat) + Ubidots (ekor terbaru)
+# ==========================================================
+# Riwayat dibaca dari koleksi sensor_data memakai index (variable, time_utc):
+# per variabel satu range scan terbalik + limit + projection. Ubidots hanya
+# diminta untuk titik yang lebih baru dari titik terakhir yang tersimpan.
+# Rollup min/max/mean/count per bucket (1min/5min/1h/1d) dirawat inkremental
+# saat menyimpan, dan dipakai otomatis bila titik mentah di jendela melebihi limit. FSR juga mendapat sketsa
+# kuantil KLL per malam (quantile_sketch.py) → ambang tidur tanpa membaca titik mentah.
+# Indeks sesi tidur (satu dokumen kecil per sesi, diisi sleep_sessions.py) untuk query per malam.
+# Penyimpanan hanya menulis titik setelah high-water mark per variabel (plus titik lama yang
+# ternyata belum tersimpan — dicek dengan count per deret), dalam potongan bulk_write, di worker
+# thread latar belakang (bukan di thread script). Celah yang tidak terbawa ekor Ubidots (ekor
+# terpotong limit) dicatat lalu diisi dari Ubidots oleh worker yang sama.
+# Semua operasi memakai satu MongoClient per URI (pool koneksi bersama) dan
+# index dibuat sekali per proses.
+
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo.results import BulkWriteResult
+
+import alignment
+import sleep_analysis
+import ubidots_client
+from history_store import STORE, HistoryStore, to_ms
+from quantile_sketch import KLLSketch
+from stage_timing import TIMINGS
+
+PROJECTION = {"_id": 0, "time_utc": 1, "value": 1}
+SAMPLE_MS = 60_000            # main.py mengirim tiap 60 detik
+ROLLUPS = {                   # nama resolusi → lebar bucket (ms), dari yang paling halus
+    "1min": 60_000,
+    "5min": 5 * 60_000,
+    "1h": 60 * 60_000,
+    "1d": 24 * 60 * 60_000,
+}
+ROLLUP_MAX_ROWS = 24 * 60     # batas baris per variabel saat memilih resolusi (1 hari → 1min, 30 hari → 1h = 720)
+ROLLUP_PROJECTION = {"_id": 0, "bucket": 1, "count": 1, "sum": 1, "min": 1, "max": 1}
+SKETCH_VARS = ("fsr1-raw", "fsr2-raw", "fsr", sleep_analysis.FSR_COMBINED)   # (huruf kecil) sketsa kuantil per malam
+SKETCH_TZ = "Asia/Jakarta"    # batas malam (sleep_analysis.NIGHT_SPLIT_HOUR) dalam tz ini; = LOCAL_TZ default
+SKETCH_RETRIES = 5            # percobaan ulang saat sketsa yang sama ditulis proses lain
+SAVE_CHUNK = 1000             # operasi per bulk_write
+SAVE_QUEUE_MAX = 4            # job simpan yang boleh menunggu di antrian worker
+BACKFILL_MAX_POINTS = 10_000  # titik per celah per job simpan; sisanya diisi pada job berikutnya
+
+CLIENT_OPTIONS = dict(        # dipakai bersama semua sesi → koneksi hangat, tanpa SRV/TLS per refresh
+    serverSelectionTimeoutMS=6000,
+    connectTimeoutMS=6000,
+    maxPoolSize=20,
+    minPoolSize=1,
+    maxIdleTimeMS=300_000,
+    retryWrites=True,
+    retryReads=True,
+    appname="smallow",
+)
+HEALTH_TTL_S = 30             # hasil ping di-cache sekian detik
+
+_clients: Dict[str, MongoClient] = {}
+_bootstrapped: set = set()
+_health: Dict[str, Dict[str, object]] = {}
+_clients_lock = threading.Lock()
+_saved_hw: Dict[tuple, int] = {}   # (uri, db, coll, variable | (device, variable)) → ms terakhir tersimpan
+_saved_lock = threading.Lock()
+_gaps: Dict[tuple, tuple] = {}     # (db, coll, device | None, variable) → (start_ms, end_ms, base, device, token)
+
+
+# ================== Client bersama + bootstrap index ==================
+
+def get_client(uri: str) -> MongoClient:
+    """Satu MongoClient per URI untuk seluruh proses (semua sesi & rerun); dibuat saat pertama dipakai."""
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = _clients[uri] = MongoClient(uri, **CLIENT_OPTIONS)
+        return client
+
+
+def ensure_indexes(db: Database, coll_name: str, by_device: bool = False) -> None:
+    """
+    Index data mentah + semua rollup, sekali per (client, db, koleksi) per proses.
+    by_device=True (koleksi fleet): semua index diawali `device`, plus koleksi nilai terakhir.
+    """
+    key = (id(db.client), db.name, coll_name, by_device)
+    with _clients_lock:
+        if key in _bootstrapped:
+            return
+    prefix = [("device", ASCENDING)] if by_device else []
+    db[coll_name].create_index(prefix + [("variable", ASCENDING), ("time_utc", ASCENDING)],
+                               unique=True, background=True)
+    for res in ROLLUPS:
+        rollup_collection(db, coll_name, res).create_index(
+            prefix + [("variable", ASCENDING), ("bucket", ASCENDING)], unique=True, background=True)
+    sessions_collection(db, coll_name).create_index(prefix + [("start", ASCENDING)], unique=True, background=True)
+    sessions_collection(db, coll_name).create_index(prefix + [("night", ASCENDING)], background=True)
+    sketch_collection(db, coll_name).create_index(
+        prefix + [("variable", ASCENDING), ("tz", ASCENDING), ("night", ASCENDING)], unique=True, background=True)
+    if by_device:
+        latest_collection(db, coll_name).create_index(
+            [("device", ASCENDING), ("variable", ASCENDING)], unique=True, background=True)
+    with _clients_lock:
+        _bootstrapped.add(key)
+
+
+def health(uri: str) -> Dict[str, object]:
+    """
+    Ping server (hasil di-cache HEALTH_TTL_S detik) → {ok, latency_ms, error, checked_at}.
+    Saat Mongo tidak bisa dihubungi, pembaca melewati Mongo tanpa menunggu timeout per variabel.
+    """
+    now = time.monotonic()
+    with _clients_lock:
+        cached = _health.get(uri)
+    if cached is not None and now - cached["_mono"] < HEALTH_TTL_S:
+        return cached
+    t0 = time.perf_counter()
+    try:
+        get_client(uri).admin.command("ping")
+        status = {"ok": True, "latency_ms": round((time.perf_counter() - t0) * 1000, 1), "error": None}
+    except PyMongoError as e:
+        status = {"ok": False, "latency_ms": None, "error": str(e)}
+    status.update(checked_at=datetime.now(), _mono=now)
+    with _clients_lock:
+        _health[uri] = status
+    return status
+
+
+def open_collection(uri: str, db_name: str, coll_name: str, by_device: bool = False) -> Optional[Collection]:
+    """
+    Koleksi dari client bersama (index sudah dibuat); None jika URI kosong atau health check gagal.
+    by_device=True untuk koleksi fleet (lihat ensure_indexes).
+    """
+    if not uri or not health(uri)["ok"]:
+        return None
+    db = get_client(uri)[db_name]
+    try:
+        ensure_indexes(db, coll_name, by_device=by_device)
+    except PyMongoError:
+        pass  # user tanpa hak createIndex tetap bisa membaca
+    return db[coll_name]
+
+
+def read_recent(coll: Collection, var: str, start_ms: int, end_ms: int, limit: int,
+                device: Optional[str] = None) -> pd.DataFrame:
+    """
+    Maks. `limit` titik terbaru 1 variabel dalam [start_ms, end_ms] → [time, value, variable] urut naik.
+    device → hanya dokumen device itu (koleksi fleet).
+    """
+    query = {"variable": var, "time_utc": {
+        "$gte": pd.to_datetime(start_ms, unit="ms", utc=True).to_pydatetime(),
+        "$lte": pd.to_datetime(end_ms, unit="ms", utc=True).to_pydatetime(),
+    }}
+    if device is not None:
+        query["device"] = device
+    cursor = coll.find(
+        query,
+        PROJECTION,
+    ).sort("time_utc", DESCENDING).limit(limit)
+    docs = list(cursor)
+    if not docs:
+        return ubidots_client.empty_frame()
+    return pd.DataFrame({
+        "time": pd.to_datetime([d["time_utc"] for d in reversed(docs)], utc=True),
+        "value": [d.get("value") for d in reversed(docs)],
+        "variable": var
+    })
+
+
+def fetch_var_mongo_first(var: str, *, coll: Optional[Collection], base: str, device: str, token: str,
+                          days_back: int, limit_points: int, end_ms: Optional[int] = None,
+                          start_ms: Optional[int] = None, store: HistoryStore = STORE) -> pd.DataFrame:
+    """
+    Riwayat dari MongoDB, lalu hanya titik setelah titik tersimpan terakhir dari Ubidots
+    (lewat fetch_tail sehingga ekor itu pun inkremental). Mongo gagal → jendela penuh dari Ubidots.
+    start_ms menggantikan awal jendela dari days_back (dipakai untuk ekor mentah di bawah rollup).
+    Ekor terpotong limit → titik di antara titik tersimpan terakhir & awal ekor dicatat sebagai
+    celah (record_gap) dan diisi worker simpan.
+    """
+    end = end_ms if end_ms is not None else ubidots_client.now_ms()
+    start = start_ms if start_ms is not None else end - days_back * ubidots_client.DAY_MS
+    conn = dict(base=base, device=device, token=token)
+
+    stored = ubidots_client.empty_frame()
+    if coll is not None:
+        try:
+            stored = read_recent(coll, var, start, end, limit_points)
+        except PyMongoError:
+            pass  # Mongo tidak bisa dihubungi → Ubidots saja
+    tail_start = start if stored.empty else max(start, to_ms(stored["time"].iloc[-1]) + 1)
+
+    try:
+        tail = ubidots_client.fetch_tail(var, start_ms=tail_start, end_ms=end, limit=limit_points,
+                                         store=store, **conn)
+    except ubidots_client.ValuesUnavailable:
+        tail = ubidots_client.empty_frame()
+    if not stored.empty and len(tail) >= limit_points and to_ms(tail["time"].iloc[0]) > tail_start:
+        record_gap(coll, var, tail_start, to_ms(tail["time"].iloc[0]) - 1, **conn)
+
+    parts = [df for df in (stored, tail) if not df.empty]
+    if not parts:
+        return ubidots_client.fetch_lv(var, default_ts=end, **conn)
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return df.drop_duplicates(subset="time", keep="last").tail(limit_points).reset_index(drop=True)
+
+
+# ================== Simpan + rollup ==================
+
+def rollup_collection(db: Database, coll_name: str, resolution: str) -> Collection:
+    return db[f"{coll_name}_rollup_{resolution}"]
+
+
+def update_rollups(db: Database, coll_name: str, df: pd.DataFrame) -> int:
+    """
+    Tambahkan titik BARU (belum pernah masuk rollup) ke semua koleksi rollup:
+    $inc count/sum, $min min, $max max per ([device,] variable, bucket). Return jumlah operasi.
+    """
+    if df.empty:
+        return 0
+    t_ms = pd.to_datetime(df["time"], utc=True).astype("int64") // 1_000_000
+    values = pd.to_numeric(df["value"], errors="coerce")
+    base = pd.DataFrame({"variable": df["variable"].astype(str).to_numpy(),
+                         "t": t_ms.to_numpy(), "value": values.to_numpy()})
+    if "device" in df.columns:
+        base.insert(0, "device", df["device"].astype(str).to_numpy())
+    base = base.dropna(subset=["value"])
+    keys = [c for c in ("device", "variable") if c in base.columns]
+    n_ops = 0
+    for res, width in ROLLUPS.items():
+        coll = rollup_collection(db, coll_name, res)
+        agg = (base.assign(bucket=base["t"] // width * width)
+               .groupby(keys + ["bucket"])["value"].agg(["count", "sum", "min", "max"]).reset_index())
+        ops = [UpdateOne(
+            {**{k: getattr(r, k) for k in keys},
+             "bucket": pd.to_datetime(r.bucket, unit="ms", utc=True).to_pydatetime()},
+            {"$inc": {"count": int(r.count), "sum": float(r.sum)},
+             "$min": {"min": float(r.min)}, "$max": {"max": float(r.max)}},
+            upsert=True
+        ) for r in agg.itertuples(index=False)]
+        if ops:
+            coll.bulk_write(ops, ordered=False)
+            n_ops += len(ops)
+    return n_ops
+
+
+def sketch_collection(db: Database, coll_name: str) -> Collection:
+    return db[f"{coll_name}_sketch"]
+
+
+def _combined_fsr(df: pd.DataFrame) -> pd.DataFrame:
+    """fsr1-raw/fsr2-raw → [(device,) time, value, variable=FSR_COMBINED]: rata-rata nilai yang ada per payload."""
+    lower = df["variable"].astype(str).str.lower()
+    keep = lower.isin(sleep_analysis.FSR_COLS)
+    src = df[keep].assign(variable=lower[keep])
+    if src.empty:
+        return src.iloc[:0]
+    out = []
+    for dev, grp in (src.groupby("device", sort=False) if "device" in src.columns else [(None, src)]):
+        wide = alignment.align_wide(grp, "UTC").reindex(columns=list(sleep_analysis.FSR_COLS))
+        part = pd.DataFrame({"time": wide.index, "value": wide.mean(axis=1).to_numpy(),
+                             "variable": sleep_analysis.FSR_COMBINED}).dropna(subset=["value"])
+        if dev is not None:
+            part.insert(0, "device", dev)
+        out.append(part)
+    return pd.concat(out, ignore_index=True)
+
+
+def update_sketches(db: Database, coll_name: str, df: pd.DataFrame, tz: str = SKETCH_TZ) -> int:
+    """
+    Tambahkan titik BARU variabel SKETCH_VARS ke sketsa KLL per ([device,] variable, tz, night), plus
+    seri gabungan FSR_COMBINED (rata-rata fsr1/fsr2 per payload, seperti combined_fsr di dashboard).
+    Sketsa tidak bisa di-$inc → baca-gabung-tulis dengan nomor revisi (optimistic concurrency),
+    diulang jika dokumen yang sama diubah proses lain (dashboard + ingest.py). Return jumlah sketsa.
+    """
+    combined = _combined_fsr(df)
+    if not combined.empty:
+        df = pd.concat([df, combined], ignore_index=True)
+    df = df[df["variable"].astype(str).str.lower().isin(SKETCH_VARS)]   # label asli (mis. "FSR") tetap jadi kunci
+    if df.empty:
+        return 0
+    t_local = pd.DatetimeIndex(pd.to_datetime(df["time"], utc=True)).tz_convert(tz)
+    base = pd.DataFrame({"variable": df["variable"].astype(str).to_numpy(),
+                         "night": sleep_analysis.night_keys(t_local),
+                         "value": pd.to_numeric(df["value"], errors="coerce").to_numpy(np.float64)})
+    if "device" in df.columns:
+        base.insert(0, "device", df["device"].astype(str).to_numpy())
+    keys = [c for c in ("device", "variable") if c in base.columns] + ["night"]
+    coll = sketch_collection(db, coll_name)
+    n_docs = 0
+    for key, grp in base.groupby(keys, sort=False):
+        query = {**dict(zip(keys, key)), "tz": tz}
+        for _ in range(SKETCH_RETRIES):
+            doc = coll.find_one(query, {"_id": 0, "sketch": 1, "rev": 1})
+            rev = doc["rev"] if doc else 0
+            sk = (KLLSketch.from_dict(doc["sketch"]) if doc else KLLSketch()).update(grp["value"].to_numpy())
+            try:
+                res = coll.update_one({**query, "rev": rev},
+                                      {"$set": {"sketch": sk.to_dict(), "n": sk.n, "rev": rev + 1}},
+                                      upsert=doc is None)
+            except DuplicateKeyError:
+                continue   # dibuat proses lain di antara find & upsert
+            if doc is None or res.matched_count:
+                n_docs += 1
+                break
+    return n_docs
+
+
+def read_sketch(coll: Collection, variables: Iterable[str], start_ms: int, end_ms: int, tz: str = SKETCH_TZ,
+                device: Optional[str] = None) -> Optional[KLLSketch]:
+    """
+    Gabungan sketsa semua malam yang beririsan dengan [start_ms, end_ms] untuk variabel-variabel ini
+    (mis. FSR_COMBINED) — satu query kecil, bukan titik mentah. variables = label Ubidots asli
+    (sketsa disimpan per label apa adanya). None jika belum ada sketsa.
+    """
+    variables = [v for v in variables if v.lower() in SKETCH_VARS]
+    if not variables:
+        return None
+    nights = sleep_analysis.night_keys(pd.to_datetime([start_ms, end_ms], unit="ms", utc=True).tz_convert(tz))
+    query = {"variable": {"$in": variables}, "tz": tz, "night": {"$gte": nights[0], "$lte": nights[1]}}
+    if device is not None:
+        query["device"] = device
+    docs = list(sketch_collection(coll.database, coll.name).find(query, {"_id": 0, "sketch": 1}))
+    if not docs:
+        return None
+    return KLLSketch().merge(*(KLLSketch.from_dict(doc["sketch"]) for doc in docs))
+
+
+# ================== Indeks sesi tidur ==================
+
+def sessions_collection(db: Database, coll_name: str) -> Collection:
+    return db[f"{coll_name}_sessions"]
+
+
+def write_sessions(coll: Collection, sessions: pd.DataFrame, start_ms: int, end_ms: int,
+                   device: Optional[str] = None) -> int:
+    """
+    Ganti indeks sesi untuk jendela yang baru dianalisis (sleep_analysis.segment_sessions): upsert per
+    ([device,] start), lalu hapus sesi tersimpan yang mulai di [start_ms, end_ms] tetapi tidak terdeteksi
+    lagi (data terlambat menggeser awal sesi). Return jumlah sesi yang ditulis.
+    """
+    dev = {} if device is None else {"device": device}
+    starts = [t.tz_convert("UTC").to_pydatetime() for t in sessions["start"]]
+    updated_at = datetime.utcnow()
+    ops = [UpdateOne(
+        {**dev, "start": start},
+        {"$set": {**dev, "start": start, "end": r["end"].tz_convert("UTC").to_pydatetime(),
+                  "night": r["night"], "duration_h": float(r["duration_h"]), "samples": int(r["samples"]),
+                  "open": bool(r["open"]), "fsr_threshold": float(r["fsr_threshold"]), "score": int(r["score"]),
+                  **{c: (None if pd.isna(r[c]) else float(r[c])) for c in sessions.columns if c.endswith("_mean")},
+                  "updated_at": updated_at}},
+        upsert=True
+    ) for start, (_, r) in zip(starts, sessions.iterrows())]
+    target = sessions_collection(coll.database, coll.name)
+    if ops:
+        target.bulk_write(ops, ordered=False)
+    target.delete_many({**dev, "start": {
+        "$gte": pd.to_datetime(start_ms, unit="ms", utc=True).to_pydatetime(),
+        "$lte": pd.to_datetime(end_ms, unit="ms", utc=True).to_pydatetime(),
+        "$nin": starts,
+    }})
+    return len(ops)
+
+
+def read_sessions(coll: Collection, start_ms: int, end_ms: int, device: Optional[str] = None,
+                  nights: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Sesi yang beririsan dengan [start_ms, end_ms] (atau, bila nights diisi, sesi malam-malam itu) dari
+    indeks sesi → satu baris per sesi (kolom seperti sleep_analysis.SESSION_COLS, start/end UTC).
+    """
+    query = {} if device is None else {"device": device}
+    if nights is not None:
+        query["night"] = {"$in": list(nights)}
+    else:
+        query["start"] = {  # sesi dianggap ≤ 1 hari → range scan index start tetap pendek
+            "$gte": pd.to_datetime(start_ms - ubidots_client.DAY_MS, unit="ms", utc=True).to_pydatetime(),
+            "$lte": pd.to_datetime(end_ms, unit="ms", utc=True).to_pydatetime(),
+        }
+        query["end"] = {"$gte": pd.to_datetime(start_ms, unit="ms", utc=True).to_pydatetime()}
+    docs = list(sessions_collection(coll.database, coll.name).find(
+        query, {"_id": 0, "device": 0, "updated_at": 0}).sort("start", ASCENDING))
+    if not docs:
+        return pd.DataFrame(columns=sleep_analysis.SESSION_COLS)
+    df = pd.DataFrame(docs)
+    df["start"] = pd.to_datetime(df["start"], utc=True)
+    df["end"] = pd.to_datetime(df["end"], utc=True)
+    return df.reindex(columns=sleep_analysis.SESSION_COLS)
+
+
+def build_documents(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Kolom-per-kolom (tanpa iterrows) → [variable, value, time_utc, t_ms] siap tulis
+    (+ kolom device jika ada → koleksi fleet). Baris rollup (ada kolom count) dan nilai non-numerik dibuang.
+    """
+    if "count" in df.columns:
+        df = df[df["count"].isna()]   # rata-rata bucket rollup bukan data mentah
+    t = pd.DatetimeIndex(pd.to_datetime(df["time"], utc=True))
+    out = pd.DataFrame({
+        "variable": df["variable"].astype(str).to_numpy(),
+        "value": pd.to_numeric(df["value"], errors="coerce").to_numpy(np.float64),
+        "time_utc": t.to_pydatetime(),
+        "t_ms": t.asi8 // 1_000_000,
+    })
+    if "device" in df.columns:
+        out.insert(0, "device", df["device"].astype(str).to_numpy())
+    return out[~np.isnan(out["value"].to_numpy())].reset_index(drop=True)
+
+
+def stored_high_water(coll: Collection, variables, device: Optional[str] = None) -> Dict[str, int]:
+    """time_utc (ms) terbaru yang sudah tersimpan per variabel — satu lookup index per variabel."""
+    out = {}
+    for var in variables:
+        query = {"variable": var} if device is None else {"device": device, "variable": var}
+        doc = coll.find_one(query, {"_id": 0, "time_utc": 1}, sort=[("time_utc", DESCENDING)])
+        if doc is not None:
+            out[var] = to_ms(doc["time_utc"])
+    return out
+
+
+def _series(docs: pd.DataFrame) -> pd.Series:
+    """Kunci deret per baris: variable, atau (device, variable) untuk koleksi fleet."""
+    if "device" in docs.columns:
+        return pd.Series(list(zip(docs["device"], docs["variable"])), index=docs.index)
+    return docs["variable"]
+
+
+def _series_query(sid) -> dict:
+    return {"device": sid[0], "variable": sid[1]} if isinstance(sid, tuple) else {"variable": sid}
+
+
+def _unsaved(coll: Collection, sid, t_ms: np.ndarray) -> np.ndarray:
+    """
+    Mask titik lama (≤ high-water mark) satu deret yang belum ada di Mongo. Satu count_documents
+    per deret; hanya jika jumlahnya kurang, timestamp tersimpan di rentang itu dibaca.
+    """
+    query = {**_series_query(sid), "time_utc": {
+        "$gte": pd.to_datetime(int(t_ms.min()), unit="ms", utc=True).to_pydatetime(),
+        "$lte": pd.to_datetime(int(t_ms.max()), unit="ms", utc=True).to_pydatetime(),
+    }}
+    if coll.count_documents(query) >= len(t_ms):
+        return np.zeros(len(t_ms), dtype=bool)
+    stored = [to_ms(d["time_utc"]) for d in coll.find(query, {"_id": 0, "time_utc": 1})]
+    return ~np.isin(t_ms, np.asarray(stored, dtype=np.int64))
+
+
+def _delta(docs: pd.DataFrame, key: Tuple[str, str, str], coll: Collection) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Baris yang belum tersimpan: semua yang lebih baru dari high-water mark (cache proses; diisi dari
+    Mongo sekali per deret) + titik lama yang hilang (celah). Return (baris, mask baris > high-water mark).
+    """
+    series = _series(docs)
+    with _saved_lock:
+        known = {sid: _saved_hw[key + (sid,)] for sid in series.unique() if key + (sid,) in _saved_hw}
+    missing = [sid for sid in series.unique() if sid not in known]
+    if "device" in docs.columns:
+        for dev in {d for d, _ in missing}:
+            hw = stored_high_water(coll, [v for d, v in missing if d == dev], device=dev)
+            known.update({(dev, v): t for v, t in hw.items()})
+    elif missing:
+        known.update(stored_high_water(coll, missing))
+    hw = series.map(known).fillna(-1).to_numpy(np.int64)
+    t_ms = docs["t_ms"].to_numpy()
+    newer = t_ms > hw
+    keep = newer.copy()
+    codes, uniques = pd.factorize(series)
+    for code in np.unique(codes[~newer]):
+        old = ~newer & (codes == code)
+        keep[old] = _unsaved(coll, uniques[code], t_ms[old])
+    return docs[keep].reset_index(drop=True), newer[keep]
+
+
+def latest_collection(db: Database, coll_name: str) -> Collection:
+    return db[f"{coll_name}_latest"]
+
+
+def update_latest(db: Database, coll_name: str, rows: pd.DataFrame) -> int:
+    """Nilai terakhir per (device, variable) untuk tabel ringkasan fleet. rows = delta di atas high-water mark."""
+    last = rows.sort_values("t_ms").groupby(["device", "variable"], sort=False).tail(1)
+    ops = [UpdateOne({"device": d, "variable": v}, {"$set": {"time_utc": ts, "value": float(val)}}, upsert=True)
+           for d, v, ts, val in zip(last["device"], last["variable"], last["time_utc"], last["value"])]
+    if ops:
+        latest_collection(db, coll_name).bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def read_latest(coll: Collection, devices: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Satu query ke koleksi nilai terakhir → [device, variable, time, value]."""
+    query = {} if devices is None else {"device": {"$in": list(devices)}}
+    docs = list(latest_collection(coll.database, coll.name).find(query, {"_id": 0}))
+    if not docs:
+        return pd.DataFrame(columns=["device", "variable", "time", "value"])
+    df = pd.DataFrame(docs)
+    df["time"] = pd.to_datetime(df.pop("time_utc"), utc=True)
+    return df[["device", "variable", "time", "value"]]
+
+
+def save_dataframe(df: pd.DataFrame, uri: str, db_name: str, coll_name: str, tz: str = SKETCH_TZ) -> str:
+    """
+    Simpan hanya titik yang belum tersimpan (lebih baru dari high-water mark + celah lama), upsert
+    (variable + time_utc unik) dalam potongan SAVE_CHUNK, lalu perbarui rollup & sketsa FSR (malam
+    dalam tz) untuk titik yang benar-benar baru. Setelahnya celah yang tercatat diisi dari Ubidots.
+    DF dengan kolom device → mode fleet: semua kunci & index diawali device, plus koleksi nilai terakhir.
+    """
+    with TIMINGS.time("mongo_save"):
+        return _save_dataframe(df, uri, db_name, coll_name, tz)
+
+
+def _save_dataframe(df: pd.DataFrame, uri: str, db_name: str, coll_name: str, tz: str = SKETCH_TZ) -> str:
+    if not uri: return "Mongo URI kosong (lewati simpan)."
+    if df.empty: return "Tidak ada data untuk disimpan."
+    try:
+        db = get_client(uri)[db_name]
+        coll = db[coll_name]
+        by_device = "device" in df.columns
+        try:
+            ensure_indexes(db, coll_name, by_device=by_device)
+        except PyMongoError:
+            pass
+        msg = _write(db, coll_name, (uri, db_name, coll_name), build_documents(df), by_device, tz)
+        return msg + _backfill(db, coll_name, (uri, db_name, coll_name), tz)
+    except Exception as e:
+        return f"Mongo save gagal: {e}"
+
+
+def _write(db: Database, coll_name: str, key: Tuple[str, str, str], docs: pd.DataFrame, by_device: bool,
+           tz: str) -> str:
+    coll = db[coll_name]
+    rows, newer = _delta(docs, key, coll)
+    if rows.empty:
+        return "Mongo: tidak ada titik baru."
+
+    saved_at = datetime.utcnow()
+    matched = modified = 0
+    upserted = []
+    for start in range(0, len(rows), SAVE_CHUNK):
+        chunk = rows.iloc[start:start + SAVE_CHUNK]
+        devices = chunk["device"] if by_device else [None] * len(chunk)
+        ops = [UpdateOne(
+            {"variable": var, "time_utc": ts, **({"device": dev} if by_device else {})},
+            {"$set": {"variable": var, "value": float(val), "time_utc": ts, "saved_at": saved_at,
+                      **({"device": dev} if by_device else {})}},
+            upsert=True
+        ) for dev, var, val, ts in zip(devices, chunk["variable"], chunk["value"], chunk["time_utc"])]
+        result: BulkWriteResult = coll.bulk_write(ops, ordered=False)
+        matched += result.matched_count
+        modified += result.modified_count
+        upserted.extend(start + i for i in result.upserted_ids)
+    # Hanya baris yang benar-benar baru (upserted) yang masuk rollup & sketsa → re-save tidak menghitung ganda
+    fresh = rows.iloc[sorted(upserted)].rename(columns={"time_utc": "time"})
+    n_roll = update_rollups(db, coll_name, fresh)
+    n_sketch = update_sketches(db, coll_name, fresh, tz)
+    if by_device and newer.any():
+        update_latest(db, coll_name, rows[newer])
+    with _saved_lock:
+        for sid, t_max in rows.groupby(_series(rows))["t_ms"].max().items():
+            _saved_hw[key + (sid,)] = max(int(t_max), _saved_hw.get(key + (sid,), -1))
+    return (f"Mongo upsert OK: baru={len(rows)}, celah={int((~newer).sum())}, matched={matched}, "
+            f"upserted={len(upserted)}, modified={modified}, rollup ops={n_roll}, sketsa={n_sketch}")
+
+
+# ================== Celah (ekor Ubidots terpotong limit) ==================
+
+def record_gap(coll: Collection, var: str, start_ms: int, end_ms: int, *, base: str, device: str, token: str,
+               by_device: bool = False) -> None:
+    """Catat [start_ms, end_ms] 1 variabel yang belum diambil dari Ubidots; celah yang sama digabung."""
+    key = (coll.database.name, coll.name, device if by_device else None, var)
+    with _saved_lock:
+        if key in _gaps:
+            start_ms, end_ms = min(start_ms, _gaps[key][0]), max(end_ms, _gaps[key][1])
+        _gaps[key] = (start_ms, end_ms, base, device, token)
+
+
+def _backfill(db: Database, coll_name: str, key: Tuple[str, str, str], tz: str) -> str:
+    """
+    Isi celah yang tercatat untuk koleksi ini: maks. BACKFILL_MAX_POINTS titik terbaru per celah;
+    jika masih terpotong, sisa yang lebih tua tetap tercatat. Ubidots gagal → celah dicoba lagi nanti.
+    """
+    with _saved_lock:
+        todo = {k: _gaps.pop(k) for k in list(_gaps) if k[:2] == (db.name, coll_name)}
+    filled = 0
+    for (_, _, dev_key, var), (start, end, base, device, token) in todo.items():
+        conn = dict(base=base, device=device, token=token, by_device=dev_key is not None)
+        try:
+            df = ubidots_client.fetch_values(var, start_ms=start, end_ms=end, limit=BACKFILL_MAX_POINTS,
+                                             base=base, device=device, token=token)
+        except Exception:
+            record_gap(db[coll_name], var, start, end, **conn)
+            continue
+        if df.empty:
+            continue
+        if len(df) >= BACKFILL_MAX_POINTS and to_ms(df["time"].iloc[0]) > start:
+            record_gap(db[coll_name], var, start, to_ms(df["time"].iloc[0]) - 1, **conn)
+        if dev_key is not None:
+            df = df.assign(device=device)
+        _write(db, coll_name, key, build_documents(df), dev_key is not None, tz)
+        filled += len(df)
+    return f"; celah diisi={filled}" if todo else ""
+
+
+class BackgroundSaver:
+    """
+    Satu worker thread per proses yang menjalankan save_dataframe dari antrian, sehingga
+    script Streamlit tidak menunggu round trip Atlas. Antrian penuh → job dilewati; titik
+    yang terlewat ikut tersimpan di job berikutnya karena penyimpanan berbasis delta.
+    """
+
+    def __init__(self, maxsize: int = SAVE_QUEUE_MAX):
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.last_status = "Belum ada penyimpanan."
+        self.last_at: Optional[datetime] = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mongo-saver", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self.last_status = save_dataframe(*job)
+                self.last_at = datetime.now()
+            finally:
+                self._queue.task_done()
+
+    def submit(self, df: pd.DataFrame, uri: str, db_name: str, coll_name: str, tz: str = SKETCH_TZ) -> str:
+        if not uri: return "Mongo URI kosong (lewati simpan)."
+        if df.empty: return "Tidak ada data untuk disimpan."
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((df, uri, db_name, coll_name, tz))
+        except queue.Full:
+            return f"Antrian simpan penuh, dilewati. Terakhir: {self.last_status}"
+        last = f" ({self.last_at:%H:%M:%S})" if self.last_at else ""
+        return f"Dijadwalkan di latar belakang (antrian {self._queue.qsize()}). Terakhir{last}: {self.last_status}"
+
+    def join(self):
+        """Tunggu antrian kosong (untuk skrip/benchmark)."""
+        self._queue.join()
+
+
+SAVER = BackgroundSaver()
+
+
+def save_in_background(df: pd.DataFrame, uri: str, db_name: str, coll_name: str, tz: str = SKETCH_TZ) -> str:
+    return SAVER.submit(df, uri, db_name, coll_name, tz)
+
+
+# ================== Baca rollup ==================
+
+def pick_resolution(days_back: int, limit_points: int) -> Optional[str]:
+    """
+    None (data mentah) jika titik mentah di jendela muat dalam limit; selain itu
+    resolusi paling halus yang jumlah bucket-nya ≤ ROLLUP_MAX_ROWS (1 hari dengan limit < 1440 → 1min).
+    """
+    window_ms = days_back * ubidots_client.DAY_MS
+    if window_ms // SAMPLE_MS <= limit_points:
+        return None
+    for res, width in ROLLUPS.items():
+        if window_ms // width <= ROLLUP_MAX_ROWS:
+            return res
+    return list(ROLLUPS)[-1]
+
+
+def read_rollup(coll: Collection, var: str, resolution: str, start_ms: int, end_ms: int,
+                device: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bucket rollup dalam jendela → [time, value(mean), variable, min, max, count] urut naik.
+    device → hanya bucket device itu (koleksi fleet).
+    """
+    width = ROLLUPS[resolution]
+    query = {"variable": var, "bucket": {
+        "$gte": pd.to_datetime(start_ms // width * width, unit="ms", utc=True).to_pydatetime(),
+        "$lte": pd.to_datetime(end_ms, unit="ms", utc=True).to_pydatetime(),
+    }}
+    if device is not None:
+        query["device"] = device
+    docs = list(rollup_collection(coll.database, coll.name, resolution).find(
+        query,
+        ROLLUP_PROJECTION,
+    ).sort("bucket", ASCENDING))
+    if not docs:
+        return ubidots_client.empty_frame()
+    df = pd.DataFrame(docs)
+    return pd.DataFrame({
+        "time": pd.to_datetime(df["bucket"], utc=True),
+        "value": df["sum"] / df["count"],
+        "variable": var,
+        "min": df["min"],
+        "max": df["max"],
+        "count": df["count"],
+    })
+
+
+def fetch_var_rollup_first(var: str, *, coll: Optional[Collection], resolution: Optional[str], base: str,
+                           device: str, token: str, days_back: int, limit_points: int,
+                           end_ms: Optional[int] = None, store: HistoryStore = STORE) -> pd.DataFrame:
+    """
+    Rentang panjang: bucket rollup (resolution) untuk riwayat, lalu titik mentah mulai bucket
+    terakhir (yang mungkin belum lengkap) lewat fetch_var_mongo_first. resolution=None → mentah saja.
+    """
+    conn = dict(base=base, device=device, token=token, store=store)
+    end = end_ms if end_ms is not None else ubidots_client.now_ms()
+    start = end - days_back * ubidots_client.DAY_MS
+    roll = ubidots_client.empty_frame()
+    if coll is not None and resolution is not None:
+        try:
+            roll = read_rollup(coll, var, resolution, start, end)
+        except PyMongoError:
+            pass
+    if roll.empty:
+        return fetch_var_mongo_first(var, coll=coll, days_back=days_back, limit_points=limit_points,
+                                     end_ms=end, **conn)
+
+    last_bucket = to_ms(roll["time"].iloc[-1])
+    raw_limit = max(limit_points, ROLLUPS[resolution] // SAMPLE_MS + 1)
+    tail = fetch_var_mongo_first(var, coll=coll, days_back=days_back, limit_points=raw_limit,
+                                 end_ms=end, start_ms=last_bucket, **conn)
+    return pd.concat([roll.iloc[:-1], tail], ignore_index=True)
+
+
+def fetch_var_stored(var: str, *, coll: Optional[Collection], resolution: Optional[str], base: str,
+                     device: str, token: str, days_back: int, limit_points: int,
+                     end_ms: Optional[int] = None) -> pd.DataFrame:
+    """
+    Baca-saja dari MongoDB (diisi ingest.py) — rollup untuk riwayat + titik mentah mulai bucket
+    terakhir, tanpa memanggil Ubidots. base/device/token diabaikan (signature fetch_var).
+    """
+    if coll is None:
+        raise PyMongoError("MongoDB tidak bisa dihubungi")
+    end = end_ms if end_ms is not None else ubidots_client.now_ms()
+    start = end - days_back * ubidots_client.DAY_MS
+    roll = read_rollup(coll, var, resolution, start, end) if resolution is not None else ubidots_client.empty_frame()
+    if roll.empty:
+        return read_recent(coll, var, start, end, limit_points)
+    last_bucket = to_ms(roll["time"].iloc[-1])
+    raw = read_recent(coll, var, last_bucket, end, max(limit_points, ROLLUPS[resolution] // SAMPLE_MS + 1))
+    return pd.concat([roll.iloc[:-1], raw], ignore_index=True)
@@ -0,0 +1,188 @@
+# mqtt_feed.py — Smallow • Subscriber MQTT → ring buffer di memori (nilai terbaru tanpa polling)
+# ==========================================================
+# ESP32 mem-publish ke /v1.6/devices/<device> (lihat "import network, time, ujson.py").
+# Feed ini berlangganan topik device tersebut (broker lokal seperti mosquitto meneruskannya)
+# dan topik per variabel /v1.6/devices/<device>/<var> (format subscribe broker Ubidots),
+# lalu menyimpan tiap nilai ke ring buffer per variabel yang dibaca dashboard untuk KPI.
+# paho-mqtt opsional: tanpa paket itu AVAILABLE=False dan dashboard tetap memakai REST.
+#
+#   mosquitto -p 1883 &            # broker lokal untuk uji coba
+#   mosquitto_pub -t /v1.6/devices/smallow -m '{"temp-c": 24.5}'
+
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import paho.mqtt.client as mqtt
+    AVAILABLE = True
+except ModuleNotFoundError:
+    mqtt = None
+    AVAILABLE = False
+
+RING_CAPACITY = 4096   # titik per variabel (≈ 2,8 hari pada 1 titik/menit)
+KEEPALIVE_S = 60
+
+
+class RingBuffer:
+    """Buffer melingkar per variabel (t ms int64, value float64); titik yang tidak lebih baru diabaikan."""
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self._t: Dict[str, np.ndarray] = {}
+        self._v: Dict[str, np.ndarray] = {}
+        self._n: Dict[str, int] = {}    # total titik yang pernah masuk (posisi tulis = n % capacity)
+        self._lock = threading.Lock()
+        self.version = 0                # naik setiap ada titik baru
+
+    def append(self, var: str, t_ms: int, value: float) -> bool:
+        with self._lock:
+            if var not in self._t:
+                self._t[var] = np.zeros(self.capacity, dtype=np.int64)
+                self._v[var] = np.full(self.capacity, np.nan)
+                self._n[var] = 0
+            n = self._n[var]
+            if n and t_ms <= self._t[var][(n - 1) % self.capacity]:
+                return False
+            self._t[var][n % self.capacity] = t_ms
+            self._v[var][n % self.capacity] = value
+            self._n[var] = n + 1
+            self.version += 1
+            return True
+
+    def latest(self) -> Dict[str, Tuple[int, float]]:
+        with self._lock:
+            return {var: (int(self._t[var][(n - 1) % self.capacity]), float(self._v[var][(n - 1) % self.capacity]))
+                    for var, n in self._n.items() if n}
+
+    def frame(self, since_ms: Optional[int] = None) -> pd.DataFrame:
+        """Isi buffer → long [time, value, variable] urut naik per variabel."""
+        parts = []
+        with self._lock:
+            for var, n in self._n.items():
+                k = min(n, self.capacity)
+                idx = (np.arange(n - k, n)) % self.capacity
+                t, v = self._t[var][idx], self._v[var][idx]
+                if since_ms is not None:
+                    keep = t >= since_ms
+                    t, v = t[keep], v[keep]
+                parts.append(pd.DataFrame({"time": pd.to_datetime(t, unit="ms", utc=True), "value": v, "variable": var}))
+        if not parts:
+            return pd.DataFrame(columns=["time", "value", "variable"])
+        return pd.concat(parts, ignore_index=True)
+
+
+def parse_message(topic: str, payload: bytes, device: str, now_ms: int) -> List[Tuple[str, int, float]]:
+    """
+    Payload Ubidots → [(var, t_ms, value)]:
+    - /v1.6/devices/<device>         {"var": 1.2} atau {"var": {"value": 1.2, "timestamp": ms}}
+    - /v1.6/devices/<device>/<var>   {"value": 1.2, "timestamp": ms, ...}
+    - /v1.6/devices/<device>/<var>/lv  1.2
+    Titik tanpa timestamp memakai waktu terima (now_ms). Payload rusak → [].
+    """
+    prefix = f"/v1.6/devices/{device}"
+    if not topic.startswith(prefix):
+        return []
+    parts = [p for p in topic[len(prefix):].split("/") if p]
+    try:
+        text = payload.decode("utf-8").strip()
+        if parts[-1:] == ["lv"]:
+            return [(parts[0], now_ms, float(text))]
+        body = json.loads(text)
+        items = {parts[0]: body} if parts else body
+        out = []
+        for var, x in items.items():
+            if isinstance(x, dict):
+                if "value" not in x:
+                    continue
+                out.append((var, int(x.get("timestamp", now_ms)), float(x["value"])))
+            else:
+                out.append((var, now_ms, float(x)))
+        return out
+    except (ValueError, TypeError, AttributeError, IndexError):
+        return []
+
+
+class MqttFeed:
+    """Subscriber MQTT (paho, thread loop sendiri) yang mengisi RingBuffer."""
+
+    def __init__(self, host: str, port: int = 1883, *, device: str, vars_: Iterable[str], token: str = "",
+                 capacity: int = RING_CAPACITY, tls: bool = False):
+        self.host, self.port, self.device, self.tls = host, port, device, tls
+        self.vars = list(vars_)
+        self.token = token
+        self.buffer = RingBuffer(capacity)
+        self.connected = False
+        self.messages = 0
+        self.last_error: Optional[str] = None
+        self._client = None
+
+    def topics(self) -> List[str]:
+        base = f"/v1.6/devices/{self.device}"
+        return [base] + [f"{base}/{v}" for v in self.vars]
+
+    def on_message(self, topic: str, payload: bytes) -> int:
+        """Masukkan satu pesan ke buffer → jumlah titik baru (dipanggil paho, juga bisa langsung)."""
+        self.messages += 1
+        now = int(time.time() * 1000)
+        return sum(self.buffer.append(var, t, v) for var, t, v in parse_message(topic, payload, self.device, now))
+
+    def start(self) -> "MqttFeed":
+        if not AVAILABLE:
+            raise ModuleNotFoundError("paho-mqtt belum ter-install")
+        if hasattr(mqtt, "CallbackAPIVersion"):   # paho-mqtt ≥ 2.0
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"smallow-dash-{id(self):x}")
+        else:
+            client = mqtt.Client(client_id=f"smallow-dash-{id(self):x}")
+        if self.token:
+            client.username_pw_set(self.token, "")   # Ubidots: token = username
+        if self.tls:
+            client.tls_set()
+
+        def on_connect(c, userdata, flags, rc, *args):
+            self.connected = (rc == 0)
+            if self.connected:
+                c.subscribe([(t, 0) for t in self.topics()])
+            else:
+                self.last_error = f"connect rc={rc}"
+
+        def on_disconnect(c, userdata, *args):
+            self.connected = False
+
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = lambda c, userdata, msg: self.on_message(msg.topic, msg.payload)
+        client.reconnect_delay_set(min_delay=1, max_delay=60)
+        try:
+            client.connect_async(self.host, self.port, keepalive=KEEPALIVE_S)
+        except Exception as e:
+            self.last_error = str(e)
+        client.loop_start()   # thread paho: reconnect otomatis
+        self._client = client
+        return self
+
+    def stop(self):
+        if self._client is not None:
+            self._client.loop_stop()
+            self._client.disconnect()
+            self._client = None
+
+
+def merge_latest(latest: pd.DataFrame, feed: Optional[MqttFeed], tz: str) -> pd.DataFrame:
+    """KPI [variable, time_local, value] dari REST/Mongo, diganti nilai MQTT yang lebih baru."""
+    if feed is None:
+        return latest
+    pushed = feed.buffer.latest()
+    if not pushed:
+        return latest
+    rows = {r["variable"]: dict(r) for _, r in latest.iterrows()}
+    for var, (t_ms, value) in pushed.items():
+        t = pd.Timestamp(t_ms, unit="ms", tz="UTC").tz_convert(tz)
+        if var not in rows or rows[var]["time_local"] < t:
+            rows[var] = {"variable": var, "time_local": t, "value": value}
+    order = list(latest["variable"]) + [v for v in pushed if v not in set(latest["variable"])]
+    return pd.DataFrame([rows[v] for v in order], columns=["variable", "time_local", "value"])
@@ -6,44 +6,26 @@
 import sys
 import time
 from datetime import datetime, timezone
-import requests
-import pandas as pd
-import numpy as np
-import altair as alt
+
 import streamlit as st
 
-# ---- Guard untuk pymongo agar errornya jelas jika belum ter-install
-try:
-    from pymongo import MongoClient, UpdateOne
-except ModuleNotFoundError:
-    st.error(
-        "✖ Modul 'pymongo' belum ter-install.\n"
-        "Tambahkan baris berikut ke requirements.txt, lalu Clear cache & Reboot app:\n\n"
-        "pymongo[srv]==4.9.2"
-    )
-    st.stop()
+# pandas/numpy/altair/pymongo & modul repo dimuat saat pertama dipakai (lihat smallow/__init__.py)
+from smallow import (PYMONGO_HINT, Settings, alignment, alt, available, downsample, mongo_store, mqtt_feed,
+                     np, pd, sleep_analysis)
+from smallow.loaders import get_feed, load_fsr_threshold, load_wide
 
 # ================== KONFIGURASI via Secrets ==================
-TOKEN    = st.secrets.get("UBIDOTS_TOKEN", "")
-DEVICE   = st.secrets.get("UBIDOTS_DEVICE", "smallow")
-BASE     = st.secrets.get("UBIDOTS_BASE", "https://industrial.api.ubidots.com")
-
-# 📌 DAFTAR VARIABEL SENSOR
-VARS = [
-    "temp-c", "hum-rh", "co2-ppm", "tvoc-ppb",
-    "max-red", "max-ir", "fsr1-raw", "fsr2-raw",
-    "eog-mag", "vibration", "lead-off"
-]
-VARS_STR = ",".join(VARS)
-VARS     = [v.strip() for v in st.secrets.get("UBIDOTS_VARS", VARS_STR).split(",") if v.strip()]
-LOCAL_TZ = st.secrets.get("LOCAL_TZ", "Asia/Jakarta")
-
-# MongoDB Atlas
-MONGO_URI = st.secrets.get("MONGO_URI", "")
-DB_NAME   = st.secrets.get("MONGO_DB", "smallow")
-COLL_NAME = st.secrets.get("MONGO_COLL", "sensor_data")
-
-HEADERS = {"X-Auth-Token": TOKEN, "Content-Type": "application/json"}
+CFG = Settings(st.secrets)
+TOKEN, DEVICE, BASE, VARS, LOCAL_TZ = CFG.token, CFG.device, CFG.base, CFG.vars, CFG.local_tz
+
+# MongoDB Atlas; READ_ONLY → ingest.py yang menarik & menyimpan data, dashboard hanya membaca MongoDB
+MONGO_URI, DB_NAME, COLL_NAME, READ_ONLY = CFG.mongo_uri, CFG.db_name, CFG.coll_name, CFG.read_only
+
+# MQTT (opsional): broker Ubidots atau broker lokal (mosquitto) → KPI terbaru tanpa polling
+MQTT_HOST, MQTT_PORT = CFG.mqtt_host, CFG.mqtt_port
+
+# Refresh per bagian (st.fragment): KPI cepat, grafik tiap `refresh` detik, AI coach hanya saat malam baru
+KPI_EVERY_S = 2
 
 # Target/heuristik AI
 TARGET_SLEEP_H = 8.0
@@ -56,161 +38,103 @@ TARGET_TVOC = 250
 st.set_page_config(page_title="Smallow • AI Sleep Dashboard", layout="wide")
 st.title("😴 Smallow • Realtime Sleep & Environment Dashboard")
 
-refresh = st.sidebar.slider("Refresh (detik)", 5, 60, 10)
+refresh = st.sidebar.slider("Refresh grafik (detik)", 5, 60, 10)
 days    = st.sidebar.slider("Rentang data (hari)", 1, 30, 7)
 limit   = st.sidebar.slider("Jumlah titik/variabel", 50, 1000, 400, step=50)
+chart_ds = st.sidebar.selectbox("Downsampling grafik", ["lttb", "minmax", None],
+                                format_func=lambda m: {"lttb": "LTTB", "minmax": "Min/Max envelope", None: "Semua titik"}[m])
 st.sidebar.caption(f"Device: `{DEVICE}` • Vars: {', '.join(VARS)}")
-st.sidebar.caption("Sumber data: Ubidots → (backup) MongoDB")
-
-# ================== AUTO-REFRESH FIX ==================
-try:
-    # gunakan paket streamlit-autorefresh
-    from streamlit_autorefresh import st_autorefresh
-    st_autorefresh(interval=refresh * 1000, key="auto_refresh")
-except Exception:
-    # fallback: meta-refresh HTML jika paket tidak tersedia
-    st.markdown(
-        f"<meta http-equiv='refresh' content='{int(refresh)}'>",
-        unsafe_allow_html=True,
-    )
+st.sidebar.caption(CFG.source_label)
 
 st.caption(f"Streamlit v{getattr(st, '__version__', 'unknown')}")
 
-# ================== Helper & Koneksi Ubidots/Mongo ==================
-def now_ms() -> int:
-    return int(time.time() * 1000)
-
-@st.cache_data(ttl=15, show_spinner=False)
-def fetch_var_from_ubidots(var: str, days_back: int, limit_points: int) -> pd.DataFrame:
-    end = now_ms()
-    start = end - days_back * 24 * 60 * 60 * 1000
-    url_values = f"{BASE}/api/v1.6/devices/{DEVICE}/{var}/values"
-    try:
-        r = requests.get(
-            url_values, headers=HEADERS,
-            params={"start": start, "end": end, "page_size": min(limit_points, 200)},
-            timeout=12
-        )
-
-        def fetch_lv() -> pd.DataFrame:
-            url_lv = f"{BASE}/api/v1.6/devices/{DEVICE}/{var}/lv"
-            r2 = requests.get(url_lv, headers=HEADERS, timeout=10)
-            r2.raise_for_status()
-            last = r2.json()
-            return pd.DataFrame([{
-                "time": pd.to_datetime(last.get("timestamp", end), unit="ms", utc=True),
-                "value": last.get("value", np.nan),
-                "variable": var
-            }])
-
-        if r.status_code in (401, 403, 404):
-            return fetch_lv()
-
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results", [])
-        if not results:
-            return fetch_lv()
-
-        rows = [{
-            "time": pd.to_datetime(x["timestamp"], unit="ms", utc=True),
-            "value": x["value"],
-            "variable": var
-        } for x in results[::-1]]
-        return pd.DataFrame(rows)
-
-    except Exception as e:
-        st.warning(f"{var}: gagal ambil dari Ubidots → {e}")
-        return pd.DataFrame(columns=["time", "value", "variable"])
-
-def save_dataframe_to_mongo(df: pd.DataFrame, uri: str, db_name: str, coll_name: str) -> str:
-    if not uri: return "Mongo URI kosong (lewati simpan)."
-    if df.empty: return "Tidak ada data untuk disimpan."
-    try:
-        client = MongoClient(uri, serverSelectionTimeoutMS=6000)
-        db = client[db_name]
-        coll = db[coll_name]
-        try:
-            coll.create_index([("variable", 1), ("time_utc", 1)], unique=True, background=True)
-        except Exception:
-            pass
-
-        ops = []
-        for _, row in df.iterrows():
-            doc = {
-                "variable": str(row["variable"]),
-                "value": float(row["value"]),
-                "time_utc": pd.to_datetime(row["time"]).tz_convert("UTC").to_pydatetime()
-                    if hasattr(row["time"], "tz_convert") else pd.to_datetime(row["time"], utc=True).to_pydatetime(),
-                "saved_at": datetime.utcnow()
-            }
-            ops.append(UpdateOne(
-                {"variable": doc["variable"], "time_utc": doc["time_utc"]},
-                {"$set": doc},
-                upsert=True
-            ))
-        result = coll.bulk_write(ops, ordered=False)
-        client.close()
-        return f"Mongo upsert OK: matched={result.matched_count}, upserted={len(result.upserted_ids)}, modified={result.modified_count}"
-    except Exception as e:
-        return f"Mongo save gagal: {e}"
+# ---- pymongo hanya dibutuhkan jika MONGO_URI diisi; dicek tanpa import, setelah judul & sidebar tampil
+if MONGO_URI and not available("pymongo"):
+    st.error(PYMONGO_HINT)
+    st.stop()
+
+# ================== MQTT (loader data ada di smallow/loaders.py) ==================
+feed = None
+if MQTT_HOST:
+    if mqtt_feed.AVAILABLE:
+        feed = get_feed(CFG, tuple(VARS))
+        st.sidebar.caption(f"MQTT: {'terhubung' if feed.connected else 'menghubungkan…'} • {feed.messages} pesan")
+    else:
+        st.sidebar.info("MQTT_HOST diisi tetapi 'paho-mqtt' belum ter-install (tambahkan ke requirements.txt).")
 
 # ================== Ambil data semua variabel ==================
-frames = []
-for v in VARS:
-    df = fetch_var_from_ubidots(v, days, limit)
-    if not df.empty:
-        frames.append(df)
+df_all, wide, fetch_errors = load_wide(CFG, tuple(VARS), days, limit)
+for v, err in fetch_errors.items():
+    st.warning(f"{v}: gagal ambil dari {'MongoDB' if READ_ONLY else 'Ubidots'} → {err}")
 
-if not frames:
+if wide.empty:
     st.warning("Tidak ada data yang bisa ditampilkan. Cek token/device/variable di Secrets, atau naikkan rentang hari.")
     st.stop()
 
-df_all = pd.concat(frames, ignore_index=True).sort_values("time")
-df_all["time_local"] = df_all["time"].dt.tz_convert(LOCAL_TZ)
-
-# ================== Simpan ke MongoDB ==================
-with st.expander("📦 Penyimpanan ke MongoDB (log)"):
-    msg = save_dataframe_to_mongo(df_all, MONGO_URI, DB_NAME, COLL_NAME)
-    st.caption(msg)
-
-# ================== KPI ==================
-latest = df_all.groupby("variable", as_index=False).tail(1).reset_index(drop=True)
-kpi_vars = ["temp-c", "hum-rh", "co2-ppm", "eog-mag", "vibration"]
-latest_kpi = latest[latest['variable'].isin(kpi_vars)]
-
-cols = st.columns(max(1, min(5, len(latest_kpi))))
-for i, (_, row) in enumerate(latest_kpi.iterrows()):
-    c = cols[i % len(cols)]
-    val = row["value"]
-    label = str(row["variable"])
-    ts = row["time_local"]
-    try:
-        c.metric(label, f"{float(val):.2f}")
-    except Exception:
-        c.metric(label, str(val))
-    c.caption(f"⏱️ {ts.strftime('%H:%M:%S')}")
-
-# ================== Grafik ==================
-st.subheader("📈 Tren Variabel")
-sel = st.multiselect("Pilih variabel untuk grafik", options=sorted(df_all["variable"].unique()),
-                     default=[v for v in ["temp-c", "hum-rh", "fsr1-raw"] if v in df_all["variable"].unique()][:3])
-plot_df = df_all[df_all["variable"].isin(sel)].dropna(subset=["value"])
-if not plot_df.empty:
-    chart = alt.Chart(plot_df).mark_line().encode(
-        x=alt.X("time_local:T", title=f"Waktu ({LOCAL_TZ})"),
-        y=alt.Y("value:Q", title="Nilai"),
-        color="variable:N",
-        tooltip=["time_local:T", "variable:N", "value:Q"]
-    ).properties(height=320).interactive()
-    st.altair_chart(chart, use_container_width=True)
-else:
-    st.info("Tidak ada data untuk variabel terpilih.")
+# Malam dari titik terakhir; AI coach (di bawah) hanya dihitung pada rerun penuh
+NIGHT = sleep_analysis.night_key(wide.index)
+
+# ================== KPI terakhir (fragment cepat) ==================
+@st.fragment(run_every=KPI_EVERY_S if feed is not None else refresh)
+def kpi_section():
+    _, wide, _ = load_wide(CFG, tuple(VARS), days, limit)   # cache 15 s; nilai terbaru lewat MQTT
+    latest = mqtt_feed.merge_latest(alignment.latest_values(wide), feed, LOCAL_TZ)
+    kpi_vars = ["temp-c", "hum-rh", "co2-ppm", "eog-mag", "vibration"]
+    latest_kpi = latest[latest['variable'].isin(kpi_vars)]
+
+    cols = st.columns(max(1, min(5, len(latest_kpi))))
+    for i, (_, row) in enumerate(latest_kpi.iterrows()):
+        c = cols[i % len(cols)]
+        val = row["value"]
+        label = str(row["variable"])
+        ts = row["time_local"]
+        try:
+            c.metric(label, f"{float(val):.2f}")
+        except Exception:
+            c.metric(label, str(val))
+        c.caption(f"⏱️ {ts.strftime('%H:%M:%S')}")
+
+kpi_section()
+
+# ================== Grafik & simpan (fragment tiap `refresh` detik) ==================
+@st.fragment(run_every=refresh)
+def chart_section():
+    df_all, wide, _ = load_wide(CFG, tuple(VARS), days, limit)
+    if sleep_analysis.night_key(wide.index) != NIGHT:
+        st.rerun()   # data malam baru → rerun penuh agar AI coach dihitung ulang
+
+    st.subheader("📈 Tren Variabel")
+    sel = st.multiselect("Pilih variabel untuk grafik", options=sorted(wide.columns),
+                         default=[v for v in ["temp-c", "hum-rh", "fsr1-raw"] if v in wide.columns][:3])
+    plot_df = alignment.to_long(wide, sel)
+    plot_df = downsample.downsample_frame(plot_df, n_out=downsample.CHART_POINTS, method=chart_ds)
+    if not plot_df.empty:
+        chart = alt.Chart(plot_df).mark_line().encode(
+            x=alt.X("time_local:T", title=f"Waktu ({LOCAL_TZ})"),
+            y=alt.Y("value:Q", title="Nilai"),
+            color="variable:N",
+            tooltip=["time_local:T", "variable:N", "value:Q"]
+        ).properties(height=320).interactive()
+        st.altair_chart(chart, use_container_width=True)
+    else:
+        st.info("Tidak ada data untuk variabel terpilih.")
+
+    with st.expander("📦 Penyimpanan ke MongoDB (log)"):
+        msg = ("Disimpan oleh ingest.py (dashboard hanya membaca)." if READ_ONLY
+               else mongo_store.save_in_background(df_all, MONGO_URI, DB_NAME, COLL_NAME, LOCAL_TZ) if MONGO_URI
+               else "Mongo URI kosong (lewati simpan).")
+        st.caption(msg)
+        if MONGO_URI:
+            h = mongo_store.health(MONGO_URI)
+            st.caption(f"Koneksi Mongo: OK ({h['latency_ms']} ms)" if h["ok"] else f"Koneksi Mongo: gagal → {h['error']}")
+    st.caption(f"Grafik diperbarui: {datetime.now().astimezone().strftime('%H:%M:%S %Z')} — tiap {refresh}s")
+
+chart_section()
 
 # ================== AI ANALISIS & SARAN ==================
 st.subheader("🧠 AI Coach — Analisis Tidur & Rekomendasi")
 
-pivot = df_all.pivot_table(index="time_local", columns="variable", values="value", aggfunc="last").sort_index()
+pivot = wide
 cols_lower = {c: c.lower() for c in pivot.columns}
 pivot = pivot.rename(columns=cols_lower)
 
@@ -226,7 +150,9 @@ sleep_hours = 0.0
 if fsr1_series is not None and fsr2_series is not None:
     combined_fsr = pd.concat([fsr1_series.dropna(), fsr2_series.dropna()]).groupby(level=0).mean()
     if not combined_fsr.empty:
-        thr = float(np.nanpercentile(combined_fsr.values, 30))
+        # ambang dari sketsa seri gabungan yang sama (seluruh malam di rentang); fallback: frame yang dimuat
+        thr = load_fsr_threshold(CFG, (sleep_analysis.FSR_COMBINED,), days)
+        thr = float(np.nanpercentile(combined_fsr.values, 30)) if thr is None else thr
         asleep_ratio = float(np.mean(combined_fsr.values > thr))
         sleep_hours = asleep_ratio * TARGET_SLEEP_H
 
@@ -281,4 +207,5 @@ with colB:
         st.write("**Catatan:**")
         for n in notes: st.write("- " + n)
 
-st.caption(f"Terakhir diperbarui: {datetime.now().astimezone().strftime('%Y-%m-%d %H:%M:%S %Z')} — auto refresh {refresh}s")
+st.caption(f"AI Coach dihitung: {datetime.now().astimezone().strftime('%Y-%m-%d %H:%M:%S %Z')} "
+           f"(malam {NIGHT}; dihitung ulang saat data malam baru masuk)")
@@ -0,0 +1,117 @@
+# quantile_sketch.py — Smallow • Sketsa kuantil KLL (ambang FSR tanpa membaca titik mentah)
+# ==========================================================
+# KLL (Karnin–Lang–Liberty): hierarki compactor; level h berisi sampel berbobot 2^h.
+# Level yang melebihi kapasitas diurutkan lalu separuh isinya (ganjil/genap, acak) naik satu
+# level → memori ≈ 3·k nilai berapa pun jumlah titiknya, galat rank ≈ 1% untuk k=200.
+# Dua sketsa bisa digabung (merge) → sketsa per malam disimpan di MongoDB (mongo_store) dan
+# digabung untuk rentang hari berapa pun. Selama belum ada kompaksi (n kecil) hasil persentil
+# identik dengan np.nanpercentile (metode linear).
+
+from typing import Iterable, Optional
+
+import numpy as np
+
+KLL_K = 200          # kapasitas level teratas; galat rank ~ 1.7/k
+KLL_C = 2 / 3        # kapasitas level di bawahnya menyusut dengan faktor ini
+MIN_CAPACITY = 2
+UPDATE_CHUNK = 4096  # titik yang dimasukkan ke level 0 sebelum kompaksi
+
+
+class KLLSketch:
+    """Sketsa kuantil yang bisa digabung; NaN/inf diabaikan."""
+
+    __slots__ = ("k", "n", "min", "max", "levels", "_rng")
+
+    def __init__(self, k: int = KLL_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.min = self.max = None
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h: int) -> int:
+        return max(MIN_CAPACITY, int(np.ceil(self.k * KLL_C ** (len(self.levels) - h - 1))))
+
+    @property
+    def size(self) -> int:
+        """Jumlah nilai yang benar-benar disimpan."""
+        return sum(len(lvl) for lvl in self.levels)
+
+    def _compress(self):
+        while self.size > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h, lvl in enumerate(self.levels) if len(lvl) > self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            buf = np.sort(self.levels[h])
+            odd = len(buf) % 2   # satu nilai sisa tetap di level ini
+            up = buf[odd:][int(self._rng.integers(2))::2]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], up])
+            self.levels[h] = buf[:odd]
+
+    def update(self, values: Iterable[float]) -> "KLLSketch":
+        x = np.asarray(values, dtype=np.float64).ravel()
+        x = x[np.isfinite(x)]
+        if not len(x):
+            return self
+        self.n += len(x)
+        lo, hi = float(x.min()), float(x.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        for start in range(0, len(x), UPDATE_CHUNK):
+            self.levels[0] = np.concatenate([self.levels[0], x[start:start + UPDATE_CHUNK]])
+            self._compress()
+        return self
+
+    def merge(self, *others: "KLLSketch") -> "KLLSketch":
+        """Gabungkan satu atau banyak sketsa (level sejajar disambung, lalu satu kali kompaksi)."""
+        others = [o for o in others if o.n]
+        if not others:
+            return self
+        height = max(len(self.levels), *(len(o.levels) for o in others))
+        self.levels += [np.empty(0)] * (height - len(self.levels))
+        for h in range(height):
+            self.levels[h] = np.concatenate([self.levels[h]] + [o.levels[h] for o in others if h < len(o.levels)])
+        self.n += sum(o.n for o in others)
+        self.min = min([o.min for o in others] + ([self.min] if self.min is not None else []))
+        self.max = max([o.max for o in others] + ([self.max] if self.max is not None else []))
+        self._compress()
+        return self
+
+    def rank(self, x: float) -> int:
+        """Perkiraan jumlah nilai ≤ x."""
+        return int(sum(int(np.count_nonzero(lvl <= x)) << h for h, lvl in enumerate(self.levels)))
+
+    def count_above(self, thr: float) -> int:
+        return self.n - self.rank(thr)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Persentil q (0–100), interpolasi linear antar rank seperti np.nanpercentile."""
+        if not self.n:
+            return None
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 1 << h, dtype=np.int64) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cum = values[order], np.cumsum(weights[order])   # cum[-1] == n (kompaksi menjaga bobot)
+        v = (self.n - 1) * (q / 100)
+        if v >= self.n - 1:
+            return self.max
+        lo = int(np.floor(v))
+        a, b = values[np.searchsorted(cum, [lo, lo + 1], side="right")]
+        g = v - lo
+        return float(b - (b - a) * (1 - g) if g >= 0.5 else a + (b - a) * g)
+
+    def to_dict(self) -> dict:
+        """Bentuk BSON/JSON (dokumen MongoDB)."""
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max,
+                "levels": [lvl.tolist() for lvl in self.levels]}
+
+    @classmethod
+    def from_dict(cls, doc: dict, seed: Optional[int] = None) -> "KLLSketch":
+        sk = cls(int(doc.get("k", KLL_K)), seed=seed)
+        sk.n, sk.min, sk.max = int(doc["n"]), doc.get("min"), doc.get("max")
+        sk.levels = [np.asarray(lvl, dtype=np.float64) for lvl in doc["levels"]] or [np.empty(0)]
+        return sk
+
+
+def merge_all(sketches: Iterable[KLLSketch], k: int = KLL_K) -> KLLSketch:
+    return KLLSketch(k).merge(*sketches)
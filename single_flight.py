@@ -0,0 +1,67 @@
+# single_flight.py — Smallow • Gabungkan permintaan upstream yang sedang berjalan
+# ==========================================================
+# Beberapa sesi Streamlit (atau thread fetch_many) yang meminta (device, variabel) yang sama
+# pada saat bersamaan cukup memicu SATU request ke Ubidots: pemanggil pertama menjadi "leader",
+# pemanggil lain yang jendelanya tercakup menunggu hasil leader lalu memotongnya sendiri.
+# Tercakup = leader mulai tidak lebih baru, berakhir tidak lebih awal (paling jauh slack_ms
+# sesudahnya) dan limit-nya tidak lebih kecil.
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, List, Tuple
+
+COALESCE_SLACK_MS = 5000   # akhir jendela leader boleh lebih baru sejauh ini (now_ms() tiap sesi selisih beberapa ms)
+
+
+class SingleFlight:
+    def __init__(self, slack_ms: int = COALESCE_SLACK_MS):
+        self.slack_ms = slack_ms
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, List[Tuple[int, int, int, Future]]] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def _covering(self, key: Hashable, start_ms: int, end_ms: int, limit: int):
+        for s, e, lim, fut in self._calls.get(key, []):
+            if s <= start_ms and end_ms <= e <= end_ms + self.slack_ms and lim >= limit:
+                return fut
+        return None
+
+    def do(self, key: Hashable, start_ms: int, end_ms: int, limit: int, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """
+        Jalankan fn() atau ikut hasil panggilan yang sedang berjalan untuk key yang sama dengan
+        jendela [start, end] dan limit yang mencakup permintaan ini → (hasil, dibagi?).
+        Exception leader diteruskan ke semua pemanggil yang menunggu.
+        """
+        with self._lock:
+            fut = self._covering(key, start_ms, end_ms, limit)
+            if fut is not None:
+                self.shared += 1
+            else:
+                entry = (start_ms, end_ms, limit, Future())
+                self._calls.setdefault(key, []).append(entry)
+                self.leaders += 1
+        if fut is not None:
+            return fut.result(), True
+
+        fut = entry[3]
+        try:
+            result = fn()
+            fut.set_result(result)
+            return result, False
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls[key].remove(entry)
+                if not self._calls[key]:
+                    del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "shared": self.shared,
+                    "in_flight": sum(len(v) for v in self._calls.values())}
+
+
+FLIGHTS = SingleFlight()
@@ -0,0 +1,438 @@
+# sleep_analysis.py — Smallow • Analisis tidur (tanpa streamlit, bisa di-import & di-benchmark)
+# ==========================================================
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+RMS_MOV_LOW_G = 0.06   # perubahan |a| di bawah ini dianggap tidak bergerak
+FSR_PERCENTILE = 30    # ambang tekanan FSR = persentil ke-30
+NIGHT_SPLIT_HOUR = 12  # satu "malam" = jam 12 siang s/d jam 12 siang berikutnya (waktu lokal)
+
+# Heuristik skor kualitas tidur (sama dengan AI coach app.py / newapp.py, variabel main.py)
+TARGET_SLEEP_H = 8.0
+TARGET_TEMP = (18, 22)   # °C
+TARGET_HUM = (40, 60)    # %
+TARGET_CO2 = 800         # ppm
+TARGET_TVOC = 250        # ppb
+EOG_ACTIVE = 150         # mag
+
+
+def estimate_sleep_hours(pv: pd.DataFrame, fsr_col: str = "fsr", motion_thr_g: float = RMS_MOV_LOW_G,
+                         fsr_threshold: Optional[float] = None) -> float:
+    """
+    Jam tidur dari frame lebar sejajar waktu (alignment.align_wide): jumlah selang waktu
+    (dt di-clip 0.5–60 s) di mana FSR di atas persentil ke-30 dan, bila accel_x/y/z ada,
+    |a| tidak berubah ≥ motion_thr_g terhadap baris sebelumnya. Versi vektor NumPy
+    dari loop per-baris sebelumnya (hasil sama). fsr_threshold (mis. dari sketsa kuantil
+    per malam, mongo_store.read_sketch) menggantikan persentil dari frame ini.
+    """
+    if pv.empty or fsr_col not in pv.columns: return 0.0
+    fsr = pv[fsr_col].to_numpy(np.float64)
+    if np.isnan(fsr).all(): return 0.0
+    fsr_th = float(np.nanpercentile(fsr, FSR_PERCENTILE)) if fsr_threshold is None else fsr_threshold
+
+    t_ns = pv.index.asi8
+    dt = np.clip(np.diff(t_ns) / 1e9, 0.5, 60.0)
+    asleep = fsr[1:] > fsr_th   # NaN > th → False
+
+    if all(v in pv.columns for v in ("accel_x", "accel_y", "accel_z")):
+        a_mag = np.sqrt(pv["accel_x"].to_numpy(np.float64)**2 + pv["accel_y"].to_numpy(np.float64)**2
+                        + pv["accel_z"].to_numpy(np.float64)**2)
+        valid = ~np.isnan(a_mag)
+        both = valid[1:] & valid[:-1]
+        # gerakan hanya dinilai jika |a| ada di kedua baris; selain itu dianggap diam
+        asleep &= ~both | (np.abs(np.diff(a_mag)) < motion_thr_g)
+
+    return float(dt[asleep].sum()) / 3600.0
+
+
+def night_key(index: pd.DatetimeIndex) -> str:
+    """Tanggal malam dari titik terakhir (mis. tidur 23:00 & bangun 06:00 → tanggal yang sama); '' jika kosong."""
+    if len(index) == 0:
+        return ""
+    return (index.max() - pd.Timedelta(hours=NIGHT_SPLIT_HOUR)).strftime("%Y-%m-%d")
+
+
+def night_keys(index: pd.DatetimeIndex) -> np.ndarray:
+    """night_key per titik (index tz lokal) → array 'YYYY-MM-DD'."""
+    return np.asarray((index - pd.Timedelta(hours=NIGHT_SPLIT_HOUR)).strftime("%Y-%m-%d"), dtype=object)
+
+
+def night_window(last: pd.Timestamp) -> tuple:
+    """(awal, akhir) malam dari titik `last` (tz lokal): jam NIGHT_SPLIT_HOUR s/d 24 jam kemudian."""
+    start = (last - pd.Timedelta(hours=NIGHT_SPLIT_HOUR)).normalize() + pd.Timedelta(hours=NIGHT_SPLIT_HOUR)
+    return start, start + pd.Timedelta(days=1)
+
+
+def _mean(wide: pd.DataFrame, col: str):
+    if col not in wide.columns or wide[col].isna().all():
+        return None
+    return float(np.nanmean(wide[col].to_numpy(np.float64)))
+
+
+def sleep_score(wide: pd.DataFrame, fsr_threshold: Optional[float] = None) -> dict:
+    """
+    Skor kualitas tidur 0–100 dari frame lebar variabel main.py: mulai 100, dikurangi untuk durasi
+    kurang (FSR1/FSR2 → estimate_sleep_hours), suhu, RH, CO2, TVOC dan EOG di luar target.
+    """
+    fsr_cols = [c for c in ("fsr1-raw", "fsr2-raw") if c in wide.columns]
+    fsr = wide[fsr_cols].mean(axis=1) if fsr_cols else pd.Series(np.nan, index=wide.index)
+    hours = estimate_sleep_hours(pd.DataFrame({"fsr": fsr}, index=wide.index), fsr_threshold=fsr_threshold)
+    temp, hum = _mean(wide, "temp-c"), _mean(wide, "hum-rh")
+    co2, tvoc, eog = _mean(wide, "co2-ppm"), _mean(wide, "tvoc-ppb"), _mean(wide, "eog-mag")
+
+    return {"score": _score(hours, temp, hum, co2, tvoc, eog), "sleep_hours": hours, "temp_mean": temp,
+            "hum_mean": hum, "co2_mean": co2, "tvoc_mean": tvoc, "eog_mean": eog}
+
+
+def _score(hours: float, temp, hum, co2, tvoc, eog) -> int:
+    score = 100
+    if hours < TARGET_SLEEP_H: score -= 10
+    if temp is not None and not TARGET_TEMP[0] <= temp <= TARGET_TEMP[1]: score -= 5
+    if hum is not None and not TARGET_HUM[0] <= hum <= TARGET_HUM[1]: score -= 3
+    if co2 is not None and co2 > TARGET_CO2: score -= 7
+    if tvoc is not None and tvoc > TARGET_TVOC: score -= 7
+    if eog is not None and eog > EOG_ACTIVE: score -= 8
+    return max(0, min(100, score))
+
+
+# ================== Skor inkremental (AI coach app.py) ==================
+# Statistik blok "SKOR KUALITAS TIDUR" app.py — mean suhu/RH/CO2/TVOC/EOG dan rasio FSR di atas
+# persentil ke-30 — dipelihara sebagai agregat berjalan per malam dan untuk seluruh jendela.
+# Tiap refresh hanya baris baru/terbuang dari frame lebar yang diproses (O(1) per baris), jadi
+# biaya tidak tumbuh dengan panjang jendela.
+
+COACH_COLS = {"temp": "temp-c", "hum": "hum-rh", "co2": "co2-ppm", "tvoc": "tvoc-ppb", "eog": "eog-mag"}
+FSR_COLS = ("fsr1-raw", "fsr2-raw")
+FSR_COMBINED = "fsr-combined"   # rata-rata fsr1/fsr2 per payload: seri yang dibandingkan dengan ambang (sketsa)
+
+
+class RunningStat:
+    """count, jumlah terkompensasi (Neumaier) untuk mean, dan varians Welford; sampel bisa ditambah & dibuang."""
+
+    __slots__ = ("n", "_sum", "_comp", "_mean", "_m2")
+
+    def __init__(self):
+        self.n = 0
+        self._sum = self._comp = self._mean = self._m2 = 0.0
+
+    def _acc(self, x: float):
+        s = self._sum + x
+        self._comp += (self._sum - s) + x if abs(self._sum) >= abs(x) else (x - s) + self._sum
+        self._sum = s
+
+    def add(self, x: float):
+        self.n += 1
+        self._acc(x)
+        d = x - self._mean
+        self._mean += d / self.n
+        self._m2 += d * (x - self._mean)
+
+    def remove(self, x: float):
+        self.n -= 1
+        if self.n == 0:
+            self.__init__()
+            return
+        self._acc(-x)
+        d = x - self._mean
+        self._mean -= d / self.n
+        self._m2 = max(0.0, self._m2 - d * (x - self._mean))
+
+    @property
+    def mean(self) -> Optional[float]:
+        return (self._sum + self._comp) / self.n if self.n else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """Simpangan baku populasi (ddof=0, seperti np.nanstd)."""
+        return float(np.sqrt(self._m2 / self.n)) if self.n else None
+
+
+class ValueCounts:
+    """
+    Frekuensi per nilai (kunci terurut) → persentil persis seperti np.nanpercentile (metode linear)
+    dan jumlah nilai di atas ambang. Biaya query O(jumlah nilai berbeda) — dibatasi resolusi ADC
+    FSR, bukan panjang jendela.
+    """
+
+    __slots__ = ("n", "keys", "counts")
+
+    def __init__(self):
+        self.n = 0
+        self.keys: List[float] = []
+        self.counts: List[int] = []
+
+    def add(self, x: float):
+        i = bisect_left(self.keys, x)
+        if i < len(self.keys) and self.keys[i] == x:
+            self.counts[i] += 1
+        else:
+            self.keys.insert(i, x)
+            self.counts.insert(i, 1)
+        self.n += 1
+
+    def remove(self, x: float):
+        i = bisect_left(self.keys, x)
+        self.counts[i] -= 1
+        if self.counts[i] == 0:
+            del self.keys[i], self.counts[i]
+        self.n -= 1
+
+    def _at(self, cum: np.ndarray, rank: int) -> float:
+        return self.keys[int(np.searchsorted(cum, rank, side="right"))]
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.n:
+            return None
+        cum = np.cumsum(self.counts)
+        v = (self.n - 1) * (q / 100)
+        if v >= self.n - 1:
+            return self.keys[-1]
+        lo = int(np.floor(v))
+        a, b, g = self._at(cum, lo), self._at(cum, lo + 1), v - lo
+        # urutan operasi sama dengan numpy _lerp agar hasilnya identik bit-per-bit
+        return b - (b - a) * (1 - g) if g >= 0.5 else a + (b - a) * g
+
+    def count_above(self, thr: float) -> int:
+        return sum(self.counts[bisect_right(self.keys, thr):])
+
+
+class CoachStats:
+    """Agregat satu malam / satu jendela: RunningStat per variabel coach + ValueCounts FSR gabungan."""
+
+    __slots__ = ("stats", "fsr")
+
+    def __init__(self):
+        self.stats = {k: RunningStat() for k in COACH_COLS}
+        self.fsr = ValueCounts()
+
+    @property
+    def rows(self) -> int:
+        return max([self.fsr.n, *(s.n for s in self.stats.values())])
+
+    def apply(self, row: tuple, sign: int):
+        """row = (t_ns, malam, fsr, temp, hum, co2, tvoc, eog, …); NaN dilewati. sign -1 → buang."""
+        if row[2] == row[2]:
+            (self.fsr.add if sign > 0 else self.fsr.remove)(row[2])
+        for s, x in zip(self.stats.values(), row[3:]):
+            if x == x:
+                (s.add if sign > 0 else s.remove)(x)
+
+    def summary(self, target_sleep_h: float = TARGET_SLEEP_H) -> dict:
+        """Nilai yang sama dengan blok AI coach app.py (rasio FSR > persentil-30 × target jam) + skor."""
+        hours = 0.0
+        thr = self.fsr.percentile(FSR_PERCENTILE)
+        if thr is not None:
+            hours = self.fsr.count_above(thr) / self.fsr.n * target_sleep_h
+        out = {"sleep_hours": hours, "rows": self.rows}
+        for k, s in self.stats.items():
+            out[f"{k}_mean"] = s.mean
+            out[f"{k}_std"] = s.std
+        out["score"] = _score(hours, out["temp_mean"], out["hum_mean"], out["co2_mean"],
+                              out["tvoc_mean"], out["eog_mean"])
+        return out
+
+
+class IncrementalCoach:
+    """
+    Statistik AI coach untuk frame lebar yang bergeser (load_wide tiap refresh). update(wide):
+    - baris lebih tua dari baris pertama frame dibuang, baris setelah baris terakhir yang sudah
+      diserap ditambahkan; baris terakhir dicek ulang (payload yang baru lengkap sebagian)
+    - jumlah baris/kolom tidak cocok (jendela/resolusi berubah) → dibangun ulang dari frame penuh
+    - jendela tail(limit) per variabel bisa membuang nilai tertua satu variabel dari baris di tengah
+      tanpa mengubah panjang/ujung frame (dan menggeser timestamp baris itu, lihat align_wide) →
+      kepala frame sampai baris tempat kolom terakhir mulai bernilai selalu diekstrak ulang
+    - per kolom (fsr1, fsr2, variabel coach) jumlah nilai valid & timestamp valid pertama harus sama
+      dengan frame baru, selain itu dibangun ulang
+    Hasil = seluruh jendela; night(key) → malam tertentu (key seperti night_key()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(None)
+        self.rebuilds = 0
+
+    def _reset(self, cols):
+        self._cols = cols
+        self._rows: Deque[tuple] = deque()
+        self._valid: List[Deque[int]] = [deque() for _ in range(2 + len(COACH_COLS))]   # t_ns bernilai per kolom
+        self._window = CoachStats()
+        self._nights: Dict[str, CoachStats] = {}
+
+    def _apply(self, row: tuple, sign: int):
+        self._window.apply(row, sign)
+        night = self._nights.get(row[1])
+        if night is None:
+            night = self._nights[row[1]] = CoachStats()
+        night.apply(row, sign)
+        if sign < 0 and night.rows == 0:
+            del self._nights[row[1]]
+
+    def _push(self, row: tuple, left: bool = False):
+        (self._rows.appendleft if left else self._rows.append)(row)
+        self._apply(row, +1)
+        for j, valid in enumerate(self._valid):
+            if row[-1] >> j & 1:
+                (valid.appendleft if left else valid.append)(row[0])
+
+    def _replace_last(self, row: tuple):
+        """Baris terbaru yang isinya bertambah/berubah (payload yang baru lengkap sebagian)."""
+        old = self._rows[-1]
+        self._apply(old, -1)
+        self._apply(row, +1)
+        self._rows[-1] = row
+        for j, valid in enumerate(self._valid):
+            if (row[-1] ^ old[-1]) >> j & 1:
+                if row[-1] >> j & 1:
+                    valid.append(row[0])
+                elif valid and valid[-1] == row[0]:
+                    valid.pop()
+
+    def _pop(self) -> None:
+        row = self._rows.popleft()
+        self._apply(row, -1)
+        for valid in self._valid:
+            if valid and valid[0] == row[0]:
+                valid.popleft()
+
+    @staticmethod
+    def _columns(wide: pd.DataFrame) -> tuple:
+        lower = {c.lower(): c for c in wide.columns}
+        fsr = tuple(lower[c] for c in FSR_COLS) if all(c in lower for c in FSR_COLS) else None
+        return fsr, tuple(lower.get(c) for c in COACH_COLS.values())
+
+    def _arrays(self, wide: pd.DataFrame) -> List[Optional[np.ndarray]]:
+        """Kolom yang dilacak: fsr1, fsr2 (None jika salah satunya tidak ada), lalu COACH_COLS."""
+        fsr_cols, cols = self._cols
+        return [wide[c].to_numpy(np.float64) if c is not None else None for c in (fsr_cols or (None, None)) + cols]
+
+    @staticmethod
+    def _signature(t: np.ndarray, arrays: List[Optional[np.ndarray]]) -> List[tuple]:
+        """Per kolom: (jumlah nilai valid, t_ns valid pertama)."""
+        out = []
+        for x in arrays:
+            valid = ~np.isnan(x) if x is not None else np.zeros(len(t), dtype=bool)
+            n = int(valid.sum())
+            out.append((n, int(t[valid.argmax()]) if n else None))
+        return out
+
+    def _extract(self, wide: pd.DataFrame, arrays: List[Optional[np.ndarray]], pos: np.ndarray) -> List[tuple]:
+        """Baris pada posisi `pos` → tuple (t_ns, malam, fsr, temp, hum, co2, tvoc, eog, bitmask kolom valid)."""
+        nan = np.full(len(pos), np.nan)
+        vals = [x[pos] if x is not None else nan for x in arrays]
+        a, b = vals[0], vals[1]
+        # rata-rata nilai yang ada (seperti concat + groupby(level=0).mean() di app.py);
+        # app.py hanya menghitung durasi jika fsr1 & fsr2 ada (selain itu a/b = NaN semua)
+        fsr = np.where(np.isnan(a), b, np.where(np.isnan(b), a, (a + b) / 2))
+        mask = sum((~np.isnan(v)).astype(np.int64) << j for j, v in enumerate(vals))
+        idx = wide.index[pos]
+        nights = (idx - pd.Timedelta(hours=NIGHT_SPLIT_HOUR)).strftime("%Y-%m-%d")
+        return list(zip(idx.asi8.tolist(), nights, fsr.tolist(), *(v.tolist() for v in vals[2:]), mask.tolist()))
+
+    @staticmethod
+    def _same(a: tuple, b: tuple) -> bool:
+        return all(x == y or (x != x and y != y) for x, y in zip(a, b))
+
+    def _rebuild(self, wide: pd.DataFrame, cols):
+        self._reset(cols)
+        self.rebuilds += 1
+        for row in self._extract(wide, self._arrays(wide), np.arange(len(wide))):
+            self._push(row)
+
+    def update(self, wide: pd.DataFrame) -> dict:
+        with self._lock:
+            cols = self._columns(wide)
+            t = wide.index.asi8
+            if cols != self._cols or not self._rows or len(t) == 0:
+                self._rebuild(wide, cols)
+                return self._window.summary()
+
+            rows = self._rows
+            arrays = self._arrays(wide)
+            signature = self._signature(t, arrays)
+            last = min(int(np.searchsorted(t, rows[-1][0])), len(t) - 1)   # baris terakhir yang sudah diserap
+            # kepala: baris 0 .. baris tempat kolom yang paling akhir mulai bernilai (biasanya beberapa baris)
+            starts = [first for _, first in signature if first is not None]
+            head = min(int(np.searchsorted(t, max(starts))) if starts else 0, last) + 1
+            while rows and rows[0][0] <= t[head - 1]:
+                self._pop()
+            # satu ekstraksi: kepala + baris terakhir yang sudah diserap (bisa berubah isinya) + baris baru
+            fresh = self._extract(wide, arrays, np.r_[0:head, last, last + 1:len(t)])
+            row = fresh[head]
+            if rows and row[0] == rows[-1][0] and not self._same(row, rows[-1]):
+                self._replace_last(row)
+            for row in reversed(fresh[:head]):
+                self._push(row, left=True)
+            for row in fresh[head + 1:]:
+                self._push(row)
+
+            if (len(rows) != len(t) or rows[0][0] != t[0] or rows[-1][0] != t[-1]
+                    or signature != [(len(v), v[0] if v else None) for v in self._valid]):
+                self._rebuild(wide, cols)
+            return self._window.summary()
+
+    def night(self, key: str) -> Optional[dict]:
+        with self._lock:
+            stats = self._nights.get(key)
+            return stats.summary() if stats is not None else None
+
+
+# ================== Segmentasi sesi tidur ==================
+# Sesi = tekanan FSR yang berkelanjutan, seperti start_sleep_time di main.py (mulai saat FSR tertekan,
+# reset saat tekanan hilang atau elektroda lepas). Data yang sampai ke dashboard hanya 1 titik/menit,
+# jadi jeda singkat (balik badan, paket hilang) ditoleransi sampai SESSION_GAP_S. Ambangnya absolut
+# (FSR_TEKANAN_MIN main.py), bukan persentil: kasur kosong ±2/3 hari → persentil ke-30 jatuh di derau.
+
+SESSION_FSR_MIN = 1000     # FSR_TEKANAN_MIN main.py; rata-rata fsr1/fsr2 di atas ini = tertekan
+SESSION_GAP_S = 10 * 60    # jeda tanpa tekanan / tanpa data yang tidak memutus sesi
+SESSION_MIN_S = 20 * 60    # sesi lebih pendek dari ini dibuang (duduk / berbaring sebentar)
+SESSION_COLS = ["start", "end", "night", "duration_h", "samples", "open", "fsr_threshold", "score"] + \
+               [f"{k}_mean" for k in COACH_COLS]
+
+
+def segment_sessions(wide: pd.DataFrame, fsr_threshold: float = SESSION_FSR_MIN, gap_s: float = SESSION_GAP_S,
+                     min_s: float = SESSION_MIN_S) -> pd.DataFrame:
+    """
+    Sesi tidur dari frame lebar sejajar waktu: titik tertekan = rata-rata fsr1/fsr2 di atas
+    fsr_threshold dan lead-off tidak aktif. Sesi berakhir di titik
+    tertekan terakhir sebelum jeda > gap_s. Satu baris per sesi (SESSION_COLS): start/end (tz index),
+    malam dari start, durasi, jumlah titik tertekan, open (frame berakhir masih di dalam sesi),
+    skor (_score dengan durasi sesi) dan mean variabel coach di dalam sesi.
+    """
+    fsr_cols = [c for c in FSR_COLS if c in wide.columns]
+    if wide.empty or not fsr_cols:
+        return pd.DataFrame(columns=SESSION_COLS)
+    fsr = wide[fsr_cols].mean(axis=1).to_numpy(np.float64)
+    if np.isnan(fsr).all():
+        return pd.DataFrame(columns=SESSION_COLS)
+    thr = float(fsr_threshold)
+    pressed = fsr > thr   # NaN > thr → False
+    if "lead-off" in wide.columns:
+        pressed &= ~(wide["lead-off"].to_numpy(np.float64) >= 0.5)
+
+    t_ns = wide.index.asi8
+    idx = np.flatnonzero(pressed)
+    if not len(idx):
+        return pd.DataFrame(columns=SESSION_COLS)
+    breaks = np.flatnonzero(np.diff(t_ns[idx]) > gap_s * 1e9)
+    firsts, lasts = idx[np.r_[0, breaks + 1]], idx[np.r_[breaks, len(idx) - 1]]
+    keep = t_ns[lasts] - t_ns[firsts] >= min_s * 1e9
+    firsts, lasts = firsts[keep], lasts[keep]
+    cols = {k: wide[c].to_numpy(np.float64) if c in wide.columns else None for k, c in COACH_COLS.items()}
+    nights = night_keys(wide.index[firsts])
+    rows = []
+    for a, b, night in zip(firsts, lasts, nights):
+        parts = {k: x[a:b + 1] for k, x in cols.items() if x is not None}
+        means = {k: float(np.nanmean(parts[k])) if k in parts and not np.isnan(parts[k]).all() else None
+                 for k in cols}
+        hours = (t_ns[b] - t_ns[a]) / 3.6e12
+        rows.append({"start": wide.index[a], "end": wide.index[b], "night": night,
+                     "duration_h": hours, "samples": int(pressed[a:b + 1].sum()),
+                     "open": bool(t_ns[-1] - t_ns[b] <= gap_s * 1e9), "fsr_threshold": thr,
+                     "score": _score(hours, *means.values()), **{f"{k}_mean": v for k, v in means.items()}})
+    return pd.DataFrame(rows, columns=SESSION_COLS)
@@ -0,0 +1,66 @@
+# sleep_sessions.py — Smallow • Segmentasi sesi tidur → indeks sesi per malam di MongoDB
+# ==========================================================
+# Tahap setelah ingest: jendela terakhir (SESSION_LOOKBACK_H) dibaca dari MongoDB, disegmentasi
+# dengan sleep_analysis.segment_sessions (tekanan FSR berkelanjutan, seperti start_sleep_time di
+# main.py), lalu ditulis ke koleksi <coll>_sessions: satu dokumen kecil per sesi (start, end,
+# durasi, skor, mean variabel coach). Dashboard membaca dokumen ini untuk laporan per malam
+# alih-alih memindai titik mentah "N hari terakhir" sebagai satu gumpalan.
+#
+#   python ingest.py                        # refresh tiap SESSION_EVERY siklus (lihat ingest.py)
+#   sleep_sessions.refresh(coll, "Asia/Jakarta", device="smallow-001")
+
+from typing import Optional, Tuple
+
+import pandas as pd
+from pymongo.collection import Collection
+
+import alignment
+import mongo_store
+import sleep_analysis
+import ubidots_client
+from stage_timing import TIMINGS
+
+SESSION_LOOKBACK_H = 36   # jendela yang dianalisis ulang (≥ satu sesi terpanjang + jeda siang)
+SESSION_VARS = (list(sleep_analysis.FSR_COLS) + ["lead-off"] + list(sleep_analysis.COACH_COLS.values()))
+
+
+def load_window(coll: Collection, tz: str, start_ms: int, end_ms: int, device: Optional[str] = None) -> pd.DataFrame:
+    """Frame lebar titik mentah SESSION_VARS dalam jendela (satu range scan per variabel)."""
+    limit = (end_ms - start_ms) // mongo_store.SAMPLE_MS + 60
+    frames = [mongo_store.read_recent(coll, v, start_ms, end_ms, limit, device=device) for v in SESSION_VARS]
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return alignment.align_wide(ubidots_client.empty_frame(), tz)
+    return alignment.align_wide(pd.concat(frames, ignore_index=True), tz)
+
+
+def refresh(coll: Collection, tz: str, device: Optional[str] = None, end_ms: Optional[int] = None,
+            lookback_h: float = SESSION_LOOKBACK_H) -> int:
+    """
+    Segmentasi ulang jendela [end - lookback_h, end] dan tulis indeks sesinya. Sesi yang mulai di
+    dekat tepi awal jendela bisa terpotong → tidak ditulis (versi tersimpan dari refresh sebelumnya
+    dipertahankan). Return jumlah sesi yang ditulis.
+    """
+    with TIMINGS.time("sessions"):
+        end = end_ms if end_ms is not None else ubidots_client.now_ms()
+        wide = load_window(coll, tz, end - int(lookback_h * 3_600_000), end, device=device)
+        if wide.empty:
+            return 0
+        sessions = sleep_analysis.segment_sessions(wide)
+        complete_from = wide.index[0] + pd.Timedelta(seconds=sleep_analysis.SESSION_GAP_S)
+        sessions = sessions[sessions["start"] > complete_from]
+        return mongo_store.write_sessions(coll, sessions, int(complete_from.value // 1_000_000), end, device=device)
+
+
+def read_or_segment(coll: Collection, tz: str, start_ms: int, end_ms: int,
+                    device: Optional[str] = None) -> Tuple[pd.DataFrame, bool]:
+    """
+    Sesi dalam [start_ms, end_ms] dari indeks sesi → (sesi, True). Indeks kosong (ingest.py belum
+    berjalan) → segmentasi titik mentah tersimpan di jendela itu → (sesi, False); bukan frame
+    dashboard, yang untuk rentang panjang berisi bucket rollup berjarak > SESSION_GAP_S.
+    """
+    sessions = mongo_store.read_sessions(coll, start_ms, end_ms, device=device)
+    if not sessions.empty:
+        return sessions, True
+    with TIMINGS.time("sessions"):
+        return sleep_analysis.segment_sessions(load_window(coll, tz, start_ms, end_ms, device=device)), False
@@ -0,0 +1,35 @@
+# smallow — Paket bersama dashboard Smallow (app.py, app2.py, newapp.py, fleet_app.py, app yang pertama.py)
+# ==========================================================
+# Import paket ini hanya memuat stdlib (+ stage_timing), sehingga judul & sidebar sudah terkirim
+# ke browser sebelum dependensi berat dimuat. pandas/numpy/altair/requests dan modul repo
+# (alignment, ubidots_client, mongo_store/pymongo, mqtt_feed, …) berupa LazyModule: di-import
+# saat atribut pertama kali dipakai, mis. altair baru dimuat ketika grafik digambar dan pymongo
+# hanya jika MONGO_URI diisi.
+#   from smallow import Settings, alt, pd, ubidots_client
+# Modul repo tetap file datar di root (ingest.py & benchmarks meng-import-nya langsung).
+# Loader data ber-cache Streamlit yang dipakai semua dashboard ada di smallow.loaders (meng-import
+# streamlit, jadi tidak di-re-export di sini).
+
+from smallow.lazy import LazyModule, available
+from smallow.settings import DEFAULT_VARS, FLEET_COLL, INDUSTRIAL_BASE, THINGS_BASE, Settings
+
+# Dependensi pihak ketiga
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+alt = LazyModule("altair")
+requests = LazyModule("requests")
+
+# Modul repo
+alignment = LazyModule("alignment")
+downsample = LazyModule("downsample")
+endpoint_health = LazyModule("endpoint_health")
+fleet = LazyModule("fleet")
+mongo_store = LazyModule("mongo_store")
+mqtt_feed = LazyModule("mqtt_feed")
+sleep_analysis = LazyModule("sleep_analysis")
+sleep_sessions = LazyModule("sleep_sessions")
+ubidots_client = LazyModule("ubidots_client")
+
+PYMONGO_HINT = ("✖ Modul 'pymongo' belum ter-install.\n"
+                "Tambahkan baris berikut ke requirements.txt, lalu Clear cache & Reboot app:\n\n"
+                "pymongo[srv]==4.9.2")
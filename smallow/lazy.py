@@ -0,0 +1,55 @@
+# lazy.py — Smallow • Import modul berat saat pertama kali dipakai
+# ==========================================================
+# LazyModule("altair") bisa dipakai seperti modulnya (alt.Chart(...)); import sungguhan baru terjadi
+# pada akses atribut pertama dan durasinya dicatat di histogram tahap "import" (stage_timing).
+# available("pymongo") mengecek paket ter-install tanpa meng-import-nya.
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Optional
+
+from stage_timing import TIMINGS
+
+
+class LazyModule:
+    """Proxy modul; import (sekali per proses) pada akses atribut pertama."""
+
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            module = sys.modules.get(self._name)
+            if module is None:
+                with TIMINGS.time("import", module=self._name):
+                    module = importlib.import_module(self._name)
+            self._module = module
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self) -> str:
+        return f"<LazyModule {self._name!r} ({'dimuat' if self.loaded else 'belum dimuat'})>"
+
+
+def available(name: str) -> bool:
+    """True jika modul sudah di-import atau bisa ditemukan (find_spec, tanpa menjalankan modulnya)."""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,65 @@
+# loaders.py — Smallow • Loader data ber-cache Streamlit yang dipakai bersama semua dashboard
+# ==========================================================
+# cfg (Settings) ikut menjadi kunci cache, jadi satu proses bisa melayani konfigurasi berbeda.
+# Modul berat tetap dimuat lazy lewat smallow (pymongo hanya jika MONGO_URI diisi).
+
+from functools import partial
+
+import streamlit as st
+
+from smallow import alignment, mongo_store, mqtt_feed, pd, sleep_analysis, ubidots_client
+from smallow.settings import Settings
+from stage_timing import TIMINGS
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def load_vars(cfg: Settings, vars_: tuple, days_back: int, limit_points: int):
+    """
+    Riwayat dari MongoDB (rollup otomatis untuk rentang panjang) + ekor terbaru dari Ubidots,
+    paralel → ({var: df}, {var: error}). read_only → hanya MongoDB; tanpa mongo_uri → Ubidots
+    inkremental (pymongo tidak di-import).
+    """
+    conn = dict(base=cfg.base, device=cfg.device, token=cfg.token)
+    if not cfg.mongo_uri:
+        return ubidots_client.fetch_many(vars_, days_back=days_back, limit_points=limit_points,
+                                         incremental=True, **conn)
+    coll = mongo_store.open_collection(cfg.mongo_uri, cfg.db_name, cfg.coll_name)
+    resolution = mongo_store.pick_resolution(days_back, limit_points)
+    return ubidots_client.fetch_many(
+        vars_, days_back=days_back, limit_points=limit_points,
+        fetch=partial(mongo_store.fetch_var_stored if cfg.read_only else mongo_store.fetch_var_rollup_first,
+                      coll=coll, resolution=resolution),
+        **conn
+    )
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def load_wide(cfg: Settings, vars_: tuple, days_back: int, limit_points: int):
+    """load_vars + satu frame lebar sejajar waktu → (df_all, wide, errors); dipakai bersama semua fragment."""
+    frames_by_var, errors = load_vars(cfg, vars_, days_back, limit_points)
+    with TIMINGS.time("concat"):
+        frames = [df for df in frames_by_var.values() if not df.empty]
+        df_all = pd.concat(frames, ignore_index=True) if frames else ubidots_client.empty_frame()
+    with TIMINGS.time("pivot"):
+        return df_all, alignment.align_wide(df_all, cfg.local_tz), errors
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_fsr_threshold(cfg: Settings, vars_: tuple, days_back: int):
+    """
+    Persentil ke-30 FSR dari sketsa kuantil per malam di MongoDB (nilai mentah, tanpa membaca titiknya);
+    vars_ = label variabel Ubidots persis seperti tersimpan. None jika Mongo tidak dipakai atau sketsa
+    belum ada → persentil dihitung dari frame yang dimuat.
+    """
+    coll = mongo_store.open_collection(cfg.mongo_uri, cfg.db_name, cfg.coll_name) if cfg.mongo_uri else None
+    if coll is None:
+        return None
+    end = ubidots_client.now_ms()
+    sk = mongo_store.read_sketch(coll, vars_, end - days_back * ubidots_client.DAY_MS, end, tz=cfg.local_tz)
+    return sk.percentile(sleep_analysis.FSR_PERCENTILE) if sk is not None else None
+
+
+@st.cache_resource(show_spinner=False)
+def get_feed(cfg: Settings, vars_: tuple):
+    """Satu subscriber MQTT per proses (thread paho), dipakai semua sesi."""
+    return mqtt_feed.MqttFeed(cfg.mqtt_host, cfg.mqtt_port, device=cfg.device, vars_=vars_, token=cfg.token).start()
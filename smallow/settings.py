@@ -0,0 +1,69 @@
+# settings.py — Smallow • Konfigurasi dashboard dari Secrets (satu tempat untuk semua dashboard)
+# ==========================================================
+# Settings(st.secrets, vars_default=..., base_default=...) → atribut; default yang berbeda per
+# dashboard (variabel, BASE) diberikan sebagai argumen. Tidak meng-import streamlit/pandas.
+# Dataclass → bisa menjadi argumen fungsi st.cache_data (smallow.loaders) tanpa hash manual.
+
+from dataclasses import dataclass
+from typing import List, Mapping
+
+INDUSTRIAL_BASE = "https://industrial.api.ubidots.com"
+THINGS_BASE = "https://things.ubidots.com"
+
+# Sama dengan variabel yang dikirim firmware (main.py)
+DEFAULT_VARS = ("temp-c,hum-rh,co2-ppm,tvoc-ppb,max-red,max-ir,"
+                "fsr1-raw,fsr2-raw,eog-mag,vibration,lead-off")
+FLEET_COLL = "fleet_data"   # koleksi fleet (ingest.py --fleet, fleet_app.py)
+TRUE_STRINGS = ("1", "true", "yes", "on", "ya")
+
+
+def flag(value) -> bool:
+    """Secret/env boolean: TOML true/false, angka, atau string ("true"/"1"/"yes"…; "false"/"0"/"" → False)."""
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_STRINGS
+    return bool(value)
+
+
+@dataclass(init=False)
+class Settings:
+    token: str
+    device: str
+    base: str
+    vars: List[str]
+    local_tz: str
+    mongo_uri: str
+    db_name: str
+    coll_name: str
+    fleet_coll: str
+    read_only: bool
+    mqtt_host: str
+    mqtt_port: int
+    metrics_port: int
+
+    def __init__(self, secrets: Mapping, *, vars_default: str = DEFAULT_VARS,
+                 base_default: str = INDUSTRIAL_BASE, device_default: str = "smallow"):
+        get = secrets.get
+        self.token = get("UBIDOTS_TOKEN", "")
+        self.device = get("UBIDOTS_DEVICE", device_default)
+        self.base = (get("UBIDOTS_BASE", base_default) or "").strip()
+        self.vars = [v.strip() for v in get("UBIDOTS_VARS", vars_default).split(",") if v.strip()]
+        self.local_tz = get("LOCAL_TZ", "Asia/Jakarta")
+
+        # MongoDB Atlas; INGEST_DAEMON → ingest.py yang menarik & menyimpan, dashboard hanya membaca
+        self.mongo_uri = get("MONGO_URI", "")
+        self.db_name = get("MONGO_DB", "smallow")
+        self.coll_name = get("MONGO_COLL", "sensor_data")
+        self.fleet_coll = get("FLEET_COLL", FLEET_COLL)
+        self.read_only = flag(get("INGEST_DAEMON", False)) and bool(self.mongo_uri)
+
+        # MQTT (opsional) dan endpoint /metrics (0 = mati)
+        self.mqtt_host = get("MQTT_HOST", "")
+        self.mqtt_port = int(get("MQTT_PORT", 1883))
+        self.metrics_port = int(get("METRICS_PORT", 0))
+
+    @property
+    def source_label(self) -> str:
+        """Keterangan sumber data untuk sidebar."""
+        if self.read_only:
+            return "Sumber data: MongoDB (diisi ingest.py)"
+        return "Sumber data: MongoDB (riwayat) → Ubidots (data terbaru)" if self.mongo_uri else "Sumber data: Ubidots"
@@ -0,0 +1,175 @@
+# stage_timing.py — Smallow • Histogram waktu per tahap (fetch, decode, pivot, Mongo, coach, grafik)
+# ==========================================================
+# Dipakai bersama oleh dashboard, ubidots_client, mongo_store dan ingest.py (satu registry per proses):
+#   with TIMINGS.time("decode", variable=var): ...
+# - Ringkasan (count, mean, p50/p95 dari bucket, maks) untuk panel debug di sidebar
+# - Format teks Prometheus (histogram `smallow_stage_seconds`) lewat endpoint lokal /metrics
+#   (secret / argumen METRICS_PORT; kosong/0 = mati)
+# Modul ini sengaja tidak meng-import streamlit; pandas & http.server baru di-import saat dipakai
+# (snapshot/serve) agar start dashboard tetap cepat.
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+    import pandas as pd
+
+BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC = "smallow_stage_seconds"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucket kumulatif ala Prometheus + jumlah, total dan maksimum."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_S):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # + bucket +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Perkiraan kuantil dari bucket (interpolasi linear, seperti histogram_quantile)."""
+        if self.count == 0:
+            return float("nan")
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lo + (hi - lo) * (rank - seen) / c)
+            seen += c
+        return self.max
+
+
+class StageTimings:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_S):
+        self.buckets = buckets
+        self._hist: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+        self._server: Optional["ThreadingHTTPServer"] = None
+
+    def observe(self, stage: str, seconds: float, **labels: str):
+        key = (stage, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = Histogram(self.buckets)
+            h.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str, **labels: str) -> Iterator[None]:
+        """Catat durasi blok (juga saat blok melempar exception)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
+
+    def snapshot(self, by_label: bool = False) -> "pd.DataFrame":
+        """Ringkasan per tahap (ms) untuk panel debug; by_label=True → satu baris per kombinasi label."""
+        import pandas as pd
+
+        with self._lock:
+            items = [(stage, labels, h) for (stage, labels), h in self._hist.items()]
+        groups: Dict[Tuple[str, Labels], List[Histogram]] = {}
+        for stage, labels, h in items:
+            groups.setdefault((stage, labels if by_label else ()), []).append(h)
+        rows = []
+        for (stage, labels), hs in sorted(groups.items()):
+            h = _merge(hs, self.buckets)
+            rows.append({"stage": stage, "labels": ",".join(f"{k}={v}" for k, v in labels),
+                         "count": h.count, "total_ms": h.sum * 1e3, "mean_ms": h.sum / h.count * 1e3,
+                         "p50_ms": h.quantile(0.5) * 1e3, "p95_ms": h.quantile(0.95) * 1e3, "max_ms": h.max * 1e3})
+        cols = ["stage", "labels", "count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"]
+        out = pd.DataFrame(rows, columns=cols)
+        return out if by_label else out.drop(columns="labels")
+
+    def render_prometheus(self) -> str:
+        """Teks exposition format Prometheus 0.0.4."""
+        with self._lock:
+            items = sorted(((stage, labels, list(h.counts), h.count, h.sum)
+                            for (stage, labels), h in self._hist.items()))
+        lines = [f"# HELP {METRIC} Durasi tahap dashboard/ingest Smallow.", f"# TYPE {METRIC} histogram"]
+        for stage, labels, counts, count, total in items:
+            base = [("stage", stage), *labels]
+            cum = 0
+            for le, c in zip([*map(_fmt, self.buckets), "+Inf"], counts):
+                cum += c
+                lines.append(f"{METRIC}_bucket{{{_labels(base + [('le', le)])}}} {cum}")
+            lines.append(f"{METRIC}_sum{{{_labels(base)}}} {total!r}")
+            lines.append(f"{METRIC}_count{{{_labels(base)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> Optional["ThreadingHTTPServer"]:
+        """Endpoint GET /metrics di thread latar; sekali per proses (panggilan berikutnya diabaikan)."""
+        if not port:
+            return None
+        from http.server import ThreadingHTTPServer
+
+        with self._lock:
+            if self._server is None:
+                self._server = ThreadingHTTPServer((host, int(port)), _handler(self))
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="stage-metrics", daemon=True).start()
+            return self._server
+
+
+def _merge(hs: List[Histogram], buckets: Tuple[float, ...]) -> Histogram:
+    out = Histogram(buckets)
+    for h in hs:
+        out.counts = [a + b for a, b in zip(out.counts, h.counts)]
+        out.count += h.count
+        out.sum += h.sum
+        out.max = max(out.max, h.max)
+    return out
+
+
+def _fmt(x: float) -> str:
+    return repr(float(x))
+
+
+def _labels(pairs) -> str:
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return ",".join(f'{k}="{esc(v)}"' for k, v in pairs)
+
+
+def _handler(timings: StageTimings):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = timings.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return MetricsHandler
+
+
+TIMINGS = StageTimings()
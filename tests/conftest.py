@@ -0,0 +1,39 @@
+# conftest.py — Smallow • Fixture bersama pytest (emulator Ubidots lokal, MongoDB mongomock)
+# ==========================================================
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from ubidots_emulator import Config, start  # noqa: E402
+
+
+@pytest.fixture
+def emulator():
+    """Emulator Ubidots v1.6 di port bebas (data sintetis 7 hari); counter request per endpoint."""
+    srv = start(Config(days=7))
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+MONGO_URI = "mongodb://test"
+
+
+@pytest.fixture
+def mongo_db():
+    """Database mongomock di balik mongo_store.get_client(MONGO_URI); cache high-water mark & celah dikosongkan."""
+    mongomock = pytest.importorskip("mongomock")
+    import mongo_store
+    mongo_store._clients[MONGO_URI] = mongomock.MongoClient()
+    mongo_store._saved_hw.clear()
+    mongo_store._gaps.clear()
+    yield mongo_store._clients[MONGO_URI]["smallow"]
+    mongo_store._clients.pop(MONGO_URI, None)
+    mongo_store._saved_hw.clear()
+    mongo_store._gaps.clear()
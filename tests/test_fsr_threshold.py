@@ -0,0 +1,47 @@
+# test_fsr_threshold.py — Smallow • Ambang FSR dari sketsa per malam (label Ubidots asli, seri yang dibandingkan)
+# ==========================================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alignment
+import mongo_store
+import sleep_analysis
+from history_store import to_ms
+from tests.conftest import MONGO_URI
+
+COLL = "sensor_data"
+
+
+def _frame(var: str, values, start: str = "2025-10-09 15:00") -> pd.DataFrame:
+    t = pd.date_range(start, periods=len(values), freq="min", tz="UTC")
+    return pd.DataFrame({"time": t, "value": list(values), "variable": var})
+
+
+def test_sketch_is_keyed_by_raw_ubidots_label(mongo_db):
+    df = _frame("FSR", range(50))   # default app2.py: UBIDOTS_VARS="temperature,FSR"
+    mongo_store.save_dataframe(df, MONGO_URI, "smallow", COLL)
+    start, end = to_ms(df["time"].iloc[0]), to_ms(df["time"].iloc[-1])
+    sk = mongo_store.read_sketch(mongo_db[COLL], ["FSR"], start, end)
+    assert sk is not None and sk.n == 50
+    assert sk.percentile(30) == pytest.approx(14.7)
+    assert mongo_store.read_sketch(mongo_db[COLL], ["fsr"], start, end) is None   # kolom yang sudah di-lower
+
+
+def test_combined_sketch_matches_dashboard_combined_series(mongo_db):
+    # fsr1 & fsr2 dengan skala berbeda: persentil gabungan mentah ≠ persentil rata-rata per payload
+    rng = np.random.default_rng(0)
+    fsr1, fsr2 = rng.uniform(0, 100, 200), rng.uniform(500, 900, 200)
+    fsr2[::7] = np.nan   # payload tanpa fsr2 → rata-rata = fsr1 saja
+    df = pd.concat([_frame("fsr1-raw", fsr1), _frame("fsr2-raw", fsr2).dropna()], ignore_index=True)
+    df.loc[df["variable"] == "fsr2-raw", "time"] += pd.Timedelta(milliseconds=15)   # jitter antar variabel
+    mongo_store.save_dataframe(df, MONGO_URI, "smallow", COLL)
+
+    wide = alignment.align_wide(df, "Asia/Jakarta")
+    combined = pd.concat([wide["fsr1-raw"].dropna(), wide["fsr2-raw"].dropna()]).groupby(level=0).mean()  # newapp.py
+    start, end = to_ms(df["time"].min()), to_ms(df["time"].max())
+    sk = mongo_store.read_sketch(mongo_db[COLL], (sleep_analysis.FSR_COMBINED,), start, end)
+    assert sk.n == len(combined) == 200
+    assert sk.percentile(sleep_analysis.FSR_PERCENTILE) == pytest.approx(
+        np.nanpercentile(combined.values, sleep_analysis.FSR_PERCENTILE))
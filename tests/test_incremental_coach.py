@@ -0,0 +1,78 @@
+# test_incremental_coach.py — Smallow • IncrementalCoach vs hitung ulang penuh (jendela tail per variabel)
+# ==========================================================
+
+import numpy as np
+import pytest
+
+import alignment
+import sleep_analysis as sa
+from synthetic import INTERVAL_MS, LOCAL_TZ, VARIABLES, generate, long_frame
+
+LIMIT = 300     # titik per variabel, seperti fetch_tail(limit)
+SLIDES = 150
+
+
+def _gappy_series(seed: int, drop: float):
+    """Deret sintetis dengan lubang tambahan per variabel (bukan per payload)."""
+    rng = np.random.default_rng(seed)
+    out = {}
+    for var, (t, v) in generate((LIMIT + SLIDES * 3) * len(VARIABLES) * 2, seed=seed).items():
+        keep = rng.random(len(t)) >= drop
+        out[var] = (t[keep], v[keep])
+    return out
+
+
+def _window(series, end_ms: int):
+    """Tiap variabel: tail(LIMIT) titik ≤ end_ms → frame lebar (seperti load_wide)."""
+    tail = {}
+    for var, (t, v) in series.items():
+        n = int(np.searchsorted(t, end_ms, side="right"))
+        tail[var] = (t[max(0, n - LIMIT):n], v[max(0, n - LIMIT):n])
+    return alignment.align_wide(long_frame(tail), LOCAL_TZ)
+
+
+def _assert_same(got: dict, want: dict):
+    assert got["rows"] == want["rows"]
+    assert got["sleep_hours"] == want["sleep_hours"]
+    assert got["score"] == want["score"]
+    for k in sa.COACH_COLS:
+        for stat in ("mean", "std"):
+            a, b = got[f"{k}_{stat}"], want[f"{k}_{stat}"]
+            assert (a is None) == (b is None)
+            if a is not None:
+                assert a == pytest.approx(b, rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize("drop", [0.01, 0.05])
+def test_sliding_gappy_windows_match_full_recompute(drop):
+    series = _gappy_series(seed=7, drop=drop)
+    start = int(series["fsr1-raw"][0][0]) + LIMIT * INTERVAL_MS
+    rng = np.random.default_rng(1)
+    eng = sa.IncrementalCoach()
+    end = start
+    for _ in range(SLIDES):
+        end += int(rng.integers(1, 4)) * INTERVAL_MS
+        wide = _window(series, end)
+        _assert_same(eng.update(wide), sa.IncrementalCoach().update(wide))
+    assert eng.rebuilds < SLIDES // 10   # jalur inkremental tetap dipakai
+
+
+def test_middle_row_eviction_is_removed():
+    series = _gappy_series(seed=3, drop=0.0)
+    end = int(series["fsr1-raw"][0][0]) + (LIMIT + 10) * INTERVAL_MS
+    wide = _window(series, end)
+    eng = sa.IncrementalCoach()
+    eng.update(wide)
+    # nilai tertua satu variabel keluar dari jendelanya; panjang & ujung frame tetap
+    shifted = wide.copy()
+    shifted.iloc[:6, shifted.columns.get_loc("temp-c")] = np.nan
+    shifted.iloc[:3, shifted.columns.get_loc("fsr2-raw")] = np.nan
+    before = eng.rebuilds
+    _assert_same(eng.update(shifted), sa.IncrementalCoach().update(shifted))
+    assert eng.rebuilds == before   # dibuang per kolom, tanpa bangun ulang
+
+    # lubang di tengah (bukan nilai tertua) → jumlah nilai valid berbeda → bangun ulang
+    holed = shifted.copy()
+    holed.iloc[50, holed.columns.get_loc("co2-ppm")] = np.nan
+    _assert_same(eng.update(holed), sa.IncrementalCoach().update(holed))
+    assert eng.rebuilds == before + 1
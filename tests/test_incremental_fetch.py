@@ -0,0 +1,62 @@
+# test_incremental_fetch.py — Smallow • fetch_tail hanya meminta ekor baru (regresi [user-002])
+# ==========================================================
+# Refresh inkremental (fetch_tail) hanya meminta ekor baru sejak high-water mark,
+# juga saat riwayat terpotong limit (setelan default dashboard: 7 hari, 400 titik).
+
+import pytest
+
+import ubidots_client
+from history_store import HistoryStore
+
+VAR = "temp-c"
+MIN_MS = 60_000
+
+
+def _refresh(srv, store, end_ms, days, limit):
+    before = srv.stats().get("values", 0)
+    df = ubidots_client.fetch_tail(VAR, base=srv.base, device="smallow-001", token="t",
+                                   start_ms=end_ms - days * ubidots_client.DAY_MS, end_ms=end_ms,
+                                   limit=limit, store=store)
+    return df, srv.stats().get("values", 0) - before
+
+
+@pytest.mark.parametrize("days,limit", [(7, 400), (1, 2000)])
+def test_refresh_requests_only_the_tail(emulator, days, limit):
+    store = HistoryStore()
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    _, first = _refresh(emulator, store, end, days, limit)
+    assert first >= 2                       # fetch penuh, beberapa halaman
+    for i in range(1, 4):                   # tiap refresh jendela maju 2 menit → 1 request /values
+        df, n = _refresh(emulator, store, end + i * 2 * MIN_MS, days, limit)
+        assert n == 1
+
+
+def test_truncated_tail_matches_full_fetch(emulator):
+    store = HistoryStore()
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    _refresh(emulator, store, end, 7, 400)
+    df, _ = _refresh(emulator, store, end + 5 * MIN_MS, 7, 400)
+    full = ubidots_client.fetch_values(VAR, base=emulator.base, device="smallow-001", token="t",
+                                       start_ms=end + 5 * MIN_MS - 7 * ubidots_client.DAY_MS,
+                                       end_ms=end + 5 * MIN_MS, limit=400)
+    assert len(df) == 400
+    assert df["time"].tolist() == full["time"].tolist()
+    assert df["value"].tolist() == full["value"].tolist()
+
+
+def test_concurrent_clear_between_check_and_read(emulator, monkeypatch):
+    # riwayat dikosongkan sesi lain tepat setelah cek cakupan → tetap satu jendela valid, tanpa TypeError
+    store = HistoryStore()
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    _refresh(emulator, store, end, 1, 400)
+    check = store.covering_high_water
+
+    def racing(*args, **kwargs):
+        hw = check(*args, **kwargs)
+        store.clear()
+        return hw
+
+    monkeypatch.setattr(store, "covering_high_water", racing)
+    df, n = _refresh(emulator, store, end + 2 * MIN_MS, 1, 400)
+    assert n == 1
+    assert not df.empty
@@ -0,0 +1,57 @@
+# test_mongo_gaps.py — Smallow • Celah di MongoDB diisi ulang (delta simpan + ekor Ubidots terpotong limit)
+# ==========================================================
+
+import pandas as pd
+
+import mongo_store
+import ubidots_client
+from history_store import HistoryStore, to_ms
+from tests.conftest import MONGO_URI
+
+VAR = "temp-c"
+COLL = "sensor_data"
+MIN_MS = 60_000
+
+
+def _frame(n: int, start_ms: int = 1_760_000_000_000) -> pd.DataFrame:
+    t = pd.to_datetime(start_ms + pd.RangeIndex(n) * MIN_MS, unit="ms", utc=True)
+    return pd.DataFrame({"time": t, "value": [20.0 + i % 7 for i in range(n)], "variable": VAR})
+
+
+def _stored_ms(db) -> list:
+    return sorted(to_ms(d["time_utc"]) for d in db[COLL].find({"variable": VAR}, {"_id": 0, "time_utc": 1}))
+
+
+def test_points_below_high_water_are_backfilled(mongo_db):
+    df = _frame(300)
+    mongo_store.save_dataframe(df.iloc[:100], MONGO_URI, "smallow", COLL)
+    mongo_store.save_dataframe(df.iloc[200:], MONGO_URI, "smallow", COLL)   # high-water mark melompati 100..199
+    assert len(_stored_ms(mongo_db)) == 200
+
+    msg = mongo_store.save_dataframe(df, MONGO_URI, "smallow", COLL)
+    assert "celah=100" in msg
+    assert _stored_ms(mongo_db) == (df["time"].astype("int64") // 1_000_000).tolist()
+    # rollup ikut lengkap, tanpa hitung ganda
+    rolled = mongo_store.rollup_collection(mongo_db, COLL, "1h").find({"variable": VAR})
+    assert sum(d["count"] for d in rolled) == 300
+
+    assert mongo_store.save_dataframe(df, MONGO_URI, "smallow", COLL) == "Mongo: tidak ada titik baru."
+
+
+def test_truncated_ubidots_tail_gap_is_backfilled(emulator, mongo_db):
+    conn = dict(base=emulator.base, device="smallow-001", token="t")
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    start = end - ubidots_client.DAY_MS
+    # Mongo berisi riwayat sampai ±1000 menit lalu; ekor baru jauh lebih panjang dari limit
+    old = ubidots_client.fetch_values(VAR, start_ms=start, end_ms=end - 1000 * MIN_MS, limit=300, **conn)
+    mongo_store.save_dataframe(old, MONGO_URI, "smallow", COLL)
+
+    df = mongo_store.fetch_var_mongo_first(VAR, coll=mongo_db[COLL], days_back=1, limit_points=400, end_ms=end,
+                                           store=HistoryStore(), **conn)
+    assert len(df) == 400
+    assert mongo_store._gaps   # celah antara titik tersimpan terakhir & awal ekor tercatat
+
+    mongo_store.save_dataframe(df, MONGO_URI, "smallow", COLL)
+    assert not mongo_store._gaps
+    full = ubidots_client.fetch_values(VAR, start_ms=to_ms(old["time"].iloc[0]), end_ms=end, limit=10_000, **conn)
+    assert _stored_ms(mongo_db) == (full["time"].astype("int64") // 1_000_000).tolist()
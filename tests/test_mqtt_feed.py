@@ -0,0 +1,79 @@
+# test_mqtt_feed.py — Smallow • Parsing payload MQTT, ring buffer, dan KPI REST + nilai MQTT terbaru
+# ==========================================================
+
+import pandas as pd
+import pytest
+
+import alignment
+import mqtt_feed
+
+DEVICE = "smallow-001"
+TOPIC = f"/v1.6/devices/{DEVICE}"
+TZ = "Asia/Jakarta"
+NOW = 1_760_000_000_000
+
+
+@pytest.mark.parametrize("topic,payload,want", [
+    (TOPIC, b'{"temp-c": 24.5}', [("temp-c", NOW, 24.5)]),
+    (TOPIC, b'{"temp-c": {"value": 24.5, "timestamp": 123}, "hum-rh": 55}',
+     [("temp-c", 123, 24.5), ("hum-rh", NOW, 55.0)]),
+    (f"{TOPIC}/co2-ppm", b'{"value": 700, "timestamp": 456, "context": {}}', [("co2-ppm", 456, 700.0)]),
+    (f"{TOPIC}/co2-ppm/lv", b" 701.5 ", [("co2-ppm", NOW, 701.5)]),
+    (TOPIC, b'{"temp-c": {"timestamp": 123}}', []),           # tanpa value → dilewati
+])
+def test_parse_message(topic, payload, want):
+    assert mqtt_feed.parse_message(topic, payload, DEVICE, NOW) == want
+
+
+@pytest.mark.parametrize("topic,payload", [
+    (TOPIC, b"{not json"),
+    (TOPIC, b"[1, 2]"),
+    (TOPIC, b'{"temp-c": "panas"}'),
+    (f"{TOPIC}/temp-c/lv", b"nan?"),
+    (TOPIC, b"\xff\xfe"),
+    ("/v1.6/devices/lain", b'{"temp-c": 24.5}'),               # device lain
+])
+def test_parse_message_malformed(topic, payload):
+    assert mqtt_feed.parse_message(topic, payload, DEVICE, NOW) == []
+
+
+def test_ring_buffer_wraps_in_order():
+    buf = mqtt_feed.RingBuffer(capacity=4)
+    for i in range(10):
+        assert buf.append("temp-c", NOW + i * 1000, float(i))
+    assert not buf.append("temp-c", NOW + 5000, 99.0)        # tidak lebih baru → diabaikan
+    buf.append("hum-rh", NOW, 50.0)
+
+    df = buf.frame()
+    temp = df[df["variable"] == "temp-c"]
+    assert temp["value"].tolist() == [6.0, 7.0, 8.0, 9.0]
+    assert temp["time"].is_monotonic_increasing
+    assert buf.latest() == {"temp-c": (NOW + 9000, 9.0), "hum-rh": (NOW, 50.0)}
+    assert buf.frame(since_ms=NOW + 8000)["value"].tolist() == [8.0, 9.0]
+    assert buf.version == 11
+
+
+def _wide():
+    t = pd.to_datetime(NOW + pd.RangeIndex(3) * 60_000, unit="ms", utc=True)
+    long = pd.concat([pd.DataFrame({"time": t, "value": [20.0, 21.0, 22.0], "variable": "temp-c"}),
+                      pd.DataFrame({"time": t, "value": [50.0, 51.0, 52.0], "variable": "hum-rh"})],
+                     ignore_index=True)
+    return alignment.align_wide(long, TZ)
+
+
+def test_merge_latest_overlays_newer_mqtt_values():
+    latest = alignment.latest_values(_wide())
+    assert mqtt_feed.merge_latest(latest, None, TZ) is latest
+
+    feed = mqtt_feed.MqttFeed("localhost", device=DEVICE, vars_=["temp-c", "hum-rh", "co2-ppm"])
+    end = NOW + 2 * 60_000
+    assert feed.on_message(TOPIC, f'{{"temp-c": {{"value": 23.5, "timestamp": {end + 60_000}}}}}'.encode()) == 1
+    feed.on_message(f"{TOPIC}/hum-rh", f'{{"value": 10, "timestamp": {end - 60_000}}}'.encode())   # lebih lama
+    feed.on_message(f"{TOPIC}/co2-ppm", f'{{"value": 700, "timestamp": {end}}}'.encode())
+
+    got = mqtt_feed.merge_latest(latest, feed, TZ).set_index("variable")
+    assert list(got.index) == list(latest["variable"]) + ["co2-ppm"]   # urutan REST, lalu variabel baru
+    assert got.loc["temp-c", "value"] == 23.5
+    assert got.loc["temp-c", "time_local"] == pd.Timestamp(end + 60_000, unit="ms", tz="UTC").tz_convert(TZ)
+    assert got.loc["hum-rh", "value"] == 52.0                 # nilai REST lebih baru dipertahankan
+    assert got.loc["co2-ppm", "value"] == 700.0               # variabel yang hanya ada di MQTT ditambahkan
@@ -0,0 +1,42 @@
+# test_rollup_resolution.py — Smallow • pick_resolution memakai tiap rollup; read_rollup per device
+# ==========================================================
+
+import pandas as pd
+import pytest
+
+import mongo_store
+from tests.conftest import MONGO_URI
+
+FLEET = "fleet_data"
+
+
+@pytest.mark.parametrize("days,limit,want", [
+    (1, 2000, None),      # 1440 titik mentah muat dalam limit
+    (1, 400, "1min"),
+    (3, 1000, "5min"),
+    (7, 400, "1h"),
+    (30, 1000, "1h"),
+    (90, 1000, "1d"),
+])
+def test_pick_resolution(days, limit, want):
+    assert mongo_store.pick_resolution(days, limit) == want
+
+
+def test_every_rollup_is_selectable():
+    picked = {mongo_store.pick_resolution(d, 50) for d in range(1, 366)}
+    assert set(mongo_store.ROLLUPS) <= picked
+
+
+def test_read_rollup_filters_by_device(mongo_db):
+    start = 1_760_000_000_000
+    t = pd.to_datetime(start + pd.RangeIndex(120) * 60_000, unit="ms", utc=True)
+    df = pd.concat([pd.DataFrame({"device": dev, "time": t, "value": value, "variable": "temp-c"})
+                    for dev, value in (("kamar-1", 20.0), ("kamar-2", 30.0))], ignore_index=True)
+    mongo_store.save_dataframe(df, MONGO_URI, "smallow", FLEET)
+
+    coll, end = mongo_db[FLEET], start + 120 * 60_000
+    for dev, value in (("kamar-1", 20.0), ("kamar-2", 30.0)):
+        roll = mongo_store.read_rollup(coll, "temp-c", "1h", start, end, device=dev)
+        assert roll["count"].sum() == 120
+        assert (roll["value"] == value).all()
+    assert mongo_store.read_rollup(coll, "temp-c", "1h", start, end)["count"].sum() == 240
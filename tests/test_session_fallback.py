@@ -0,0 +1,58 @@
+# test_session_fallback.py — Smallow • Sesi per malam tanpa indeks sesi (ingest.py belum berjalan)
+# ==========================================================
+
+import pandas as pd
+
+import alignment
+import mongo_store
+import sleep_analysis
+import sleep_sessions
+
+COLL = "sensor_data"
+TZ = "Asia/Jakarta"
+MIN_MS = 60_000
+NIGHT_START = 1_760_040_000_000   # 2025-10-09 20:00 UTC → 2025-10-10 03:00 WIB
+NIGHT_H = 8
+DAY_MS = 24 * 3_600_000
+
+
+def _night() -> pd.DataFrame:
+    """FSR 3000 selama NIGHT_H jam, diapit 2 jam tanpa tekanan; satu titik per menit per variabel."""
+    n = (NIGHT_H + 4) * 60
+    t = pd.to_datetime(NIGHT_START - 2 * 60 * MIN_MS + pd.RangeIndex(n) * MIN_MS, unit="ms", utc=True)
+    pressed = [120 <= i < 120 + NIGHT_H * 60 for i in range(n)]
+    frames = [pd.DataFrame({"time": t, "value": [3000.0 if p else 0.0 for p in pressed], "variable": v})
+              for v in sleep_analysis.FSR_COLS]
+    frames.append(pd.DataFrame({"time": t, "value": 22.0, "variable": "temp-c"}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _window():
+    """Jendela 3 hari di sekitar malam itu (seperti days=3 di dashboard)."""
+    return NIGHT_START - DAY_MS, NIGHT_START + 2 * DAY_MS
+
+
+def test_empty_index_segments_stored_raw_points(mongo_db):
+    mongo_db[COLL].insert_many(mongo_store.build_documents(_night()).to_dict("records"))
+    start, end = _window()
+    sessions, indexed = sleep_sessions.read_or_segment(mongo_db[COLL], TZ, start, end)
+    assert not indexed
+    assert len(sessions) == 1
+    assert abs(float(sessions["duration_h"].iloc[0]) - NIGHT_H) < 0.05
+
+
+def test_rollup_spaced_frame_cannot_be_segmented():
+    # alasan fallback di atas: bucket 1h berjarak > SESSION_GAP_S → tiap titik jadi run nol detik
+    df = _night()
+    hourly = df.assign(time=df["time"].dt.floor("1h")).groupby(["time", "variable"], as_index=False)["value"].mean()
+    assert sleep_analysis.segment_sessions(alignment.align_wide(hourly, TZ)).empty
+    assert len(sleep_analysis.segment_sessions(alignment.align_wide(df, TZ))) == 1
+
+
+def test_index_is_preferred_when_filled(mongo_db):
+    mongo_db[COLL].insert_many(mongo_store.build_documents(_night()).to_dict("records"))
+    start, end = _window()
+    assert sleep_sessions.refresh(mongo_db[COLL], TZ, end_ms=end, lookback_h=(end - start) / 3_600_000) == 1
+    sessions, indexed = sleep_sessions.read_or_segment(mongo_db[COLL], TZ, start, end)
+    assert indexed
+    assert len(sessions) == 1
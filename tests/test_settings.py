@@ -0,0 +1,20 @@
+# test_settings.py — Smallow • Parsing Secrets dashboard (smallow.settings)
+# ==========================================================
+
+import pytest
+
+from smallow.settings import Settings
+
+
+@pytest.mark.parametrize("value,expected", [
+    (True, True), (False, False), (1, True), (0, False),
+    ("true", True), ("True", True), ("1", True), ("yes", True),
+    ("false", False), ("False", False), ("0", False), ("", False), ("no", False),
+])
+def test_ingest_daemon_flag(value, expected):
+    cfg = Settings({"INGEST_DAEMON": value, "MONGO_URI": "mongodb://x"})
+    assert cfg.read_only is expected
+
+
+def test_read_only_needs_mongo_uri():
+    assert Settings({"INGEST_DAEMON": "true"}).read_only is False
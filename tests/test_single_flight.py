@@ -0,0 +1,70 @@
+# test_single_flight.py — Smallow • fetch_values ikut hasil leader hanya jika jendelanya benar-benar tercakup
+# ==========================================================
+
+from concurrent.futures import Future
+
+import ubidots_client
+from single_flight import FLIGHTS
+
+VAR = "temp-c"
+MIN_MS = 60_000
+
+
+def _fetch(srv, start_ms, end_ms, limit):
+    return ubidots_client.fetch_values(VAR, base=srv.base, device="smallow-001", token="t",
+                                       start_ms=start_ms, end_ms=end_ms, limit=limit)
+
+
+def _in_flight(srv, start_ms, end_ms, limit, result):
+    """Daftarkan panggilan leader palsu yang hasilnya sudah selesai."""
+    fut = Future()
+    fut.set_result(result)
+    entry = (start_ms, end_ms, limit, fut)
+    key = (srv.base, "smallow-001", VAR, "t", ubidots_client.FALLBACK_STATUS)
+    FLIGHTS._calls.setdefault(key, []).append(entry)
+    return lambda: FLIGHTS._calls.pop(key, None)
+
+
+def test_follower_with_later_end_fetches_itself(emulator):
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    start = end - 60 * MIN_MS
+    leader = _fetch(emulator, start, end - 2000, 100)
+    done = _in_flight(emulator, start, end - 2000, 100, leader)
+    try:
+        before = FLIGHTS.stats()["shared"]
+        got = _fetch(emulator, start, end, 100)
+    finally:
+        done()
+    assert FLIGHTS.stats()["shared"] == before   # akhir leader lebih awal → tidak dibagi
+    assert got.equals(_fetch(emulator, start, end, 100))
+
+
+def test_covering_leader_is_shared(emulator):
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    start = end - 60 * MIN_MS
+    leader = _fetch(emulator, start - 30 * MIN_MS, end + 2000, 200)
+    done = _in_flight(emulator, start - 30 * MIN_MS, end + 2000, 200, leader)
+    try:
+        before = FLIGHTS.stats()["shared"]
+        got = _fetch(emulator, start, end, 20)
+    finally:
+        done()
+    assert FLIGHTS.stats()["shared"] == before + 1
+    assert got.equals(_fetch(emulator, start, end, 20))
+
+
+def test_truncated_leader_short_in_window_fetches_itself(emulator):
+    end = ubidots_client.now_ms() - 10 * MIN_MS
+    start = end - 60 * MIN_MS
+    leader = _fetch(emulator, start - 30 * MIN_MS, end, 500)
+    # hasil leader yang terpotong: cukup banyak titik, tapi hanya 5 di jendela pengikut
+    lo = ubidots_client.pd.to_datetime(start, unit="ms", utc=True)
+    short = ubidots_client.pd.concat([leader[leader["time"] < lo], leader.tail(5)], ignore_index=True)
+    assert len(short) >= 20
+    done = _in_flight(emulator, start - 30 * MIN_MS, end, len(short), short)
+    try:
+        got = _fetch(emulator, start, end, 20)
+    finally:
+        done()
+    assert len(got) == 20
+    assert got.equals(_fetch(emulator, start, end, 20))
@@ -0,0 +1,337 @@
+# ubidots_client.py — Smallow • Lapisan fetch Ubidots bersama
+# ==========================================================
+# Dipakai oleh app.py / app2.py / newapp.py.
+# - Satu requests.Session per token (keep-alive + pool koneksi) untuk seluruh proses
+# - Semua variabel diambil paralel lewat thread pool dengan batas paralelisme
+# - /values dibaca per halaman (ikuti `next`, hormati limit) dengan prefetch halaman berikutnya
+# - Error sementara (koneksi, 429, 5xx) di-retry dengan jitter (lihat endpoint_health)
+# - Mode inkremental: hanya titik setelah high-water mark per (device, variabel),
+#   riwayat disimpan di memori + disk (history_store / disk_cache) untuk warm start
+# - Permintaan /values & /lv yang sama dari sesi berbeda digabung saat sedang berjalan (single_flight)
+# - Waktu per tahap (fetch per variabel, request HTTP, decode) dicatat di stage_timing.TIMINGS
+# - Decode kolom-per-kolom: array int64/float64 + satu to_datetime vektor per halaman;
+#   JSON di-parse dengan orjson jika ter-install (opsional), selain itu modul json bawaan
+# Modul ini sengaja tidak meng-import streamlit agar bisa dipakai di luar dashboard.
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from endpoint_health import retry_call
+from history_store import STORE, HistoryStore, to_ms
+from single_flight import FLIGHTS
+from stage_timing import TIMINGS
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ModuleNotFoundError:
+    _loads = json.loads
+
+DAY_MS = 24 * 60 * 60 * 1000
+VALUES_TIMEOUT = 12   # detik, /values
+LV_TIMEOUT = 10       # detik, /lv
+MAX_WORKERS = 8       # batas request paralel ke Ubidots (per proses)
+PAGE_SIZE = 200       # page_size maksimum per halaman /values
+FALLBACK_STATUS = (401, 403, 404)
+COLUMNS = ["time", "value", "variable"]
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_prefetcher: Optional[ThreadPoolExecutor] = None
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=COLUMNS)
+
+
+def parse_json(content: bytes):
+    """Body respons → objek Python (orjson jika ada)."""
+    return _loads(content)
+
+
+def get_session(token: str) -> requests.Session:
+    """Session bersama per token; koneksi HTTP dipakai ulang antar rerun & antar variabel."""
+    with _lock:
+        s = _sessions.get(token)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=2 * MAX_WORKERS)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update({"X-Auth-Token": token, "Content-Type": "application/json"})
+            _sessions[token] = s
+        return s
+
+
+def _get_executor(prefetch: bool = False) -> ThreadPoolExecutor:
+    """Pool fetch per variabel, atau pool terpisah untuk prefetch halaman (hindari deadlock nested)."""
+    global _executor, _prefetcher
+    with _lock:
+        if prefetch:
+            if _prefetcher is None:
+                _prefetcher = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ubidots-page")
+            return _prefetcher
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ubidots")
+        return _executor
+
+
+def fetch_lv(var: str, *, base: str, device: str, token: str, default_ts: int) -> pd.DataFrame:
+    """Nilai terakhir (/lv) sebagai DataFrame 1 baris."""
+    def get_lv() -> dict:
+        with TIMINGS.time("ubidots_http", endpoint="lv"):
+            r2 = get_session(token).get(f"{base}/api/v1.6/devices/{device}/{var}/lv", timeout=LV_TIMEOUT)
+        r2.raise_for_status()
+        return parse_json(r2.content)
+
+    last, _ = FLIGHTS.do((base, device, var, token, "lv"), 0, 0, 0, lambda: retry_call(get_lv))
+    return pd.DataFrame([{
+        "time": pd.to_datetime(last.get("timestamp", default_ts), unit="ms", utc=True),
+        "value": last.get("value", np.nan),
+        "variable": var
+    }])
+
+
+class ValuesUnavailable(Exception):
+    """/values ditolak (mis. 401/403/404) → pemanggil sebaiknya fallback ke /lv."""
+
+
+def decode_results(results: List[dict], var: str) -> pd.DataFrame:
+    """
+    Hasil /values (terbaru dulu) → DataFrame [time, value (float64), variable (categorical)] urut naik.
+    Timestamp & nilai dikumpulkan ke array lalu dikonversi sekali (tanpa Timestamp per titik).
+    """
+    if not results:
+        return empty_frame()
+    with TIMINGS.time("decode", variable=var):
+        n = len(results)
+        t_ms = np.fromiter((x["timestamp"] for x in reversed(results)), dtype=np.int64, count=n)
+        try:
+            values = np.fromiter((x["value"] for x in reversed(results)), dtype=np.float64, count=n)
+        except (TypeError, ValueError):   # ada nilai None/non-numerik → NaN
+            values = pd.to_numeric(pd.Series([x.get("value") for x in reversed(results)], dtype=object),
+                                   errors="coerce").to_numpy(np.float64)
+        return pd.DataFrame({
+            "time": pd.to_datetime(t_ms, unit="ms", utc=True),
+            "value": values,
+            "variable": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[var]),
+        })
+
+
+def iter_value_pages(var: str, *, base: str, device: str, token: str, start_ms: int, end_ms: int,
+                     limit: int, extra_params: Optional[dict] = None,
+                     fallback_status: Tuple[int, ...] = FALLBACK_STATUS) -> Iterator[List[dict]]:
+    """
+    Generator halaman /values (list results, terbaru dulu) sampai `limit` titik atau `next` habis.
+    Halaman N+1 sudah diminta (prefetch) selagi halaman N diproses pemanggil.
+    Melempar ValuesUnavailable jika status termasuk fallback_status.
+    """
+    session = get_session(token)
+
+    def get_page(url: str, params: Optional[dict]) -> dict:
+        def once() -> dict:
+            with TIMINGS.time("ubidots_http", endpoint="values"):
+                r = session.get(url, params=params, timeout=VALUES_TIMEOUT)
+            if r.status_code in fallback_status:
+                raise ValuesUnavailable(f"/values HTTP {r.status_code}")
+            r.raise_for_status()
+            return parse_json(r.content)
+        return retry_call(once)
+
+    # page_size tetap di semua halaman agar offset pada link `next` konsisten
+    params = {"start": start_ms, "end": end_ms, "page_size": min(limit, PAGE_SIZE), **(extra_params or {})}
+    data = get_page(f"{base}/api/v1.6/devices/{device}/{var}/values", params)
+    left, pending = limit, None
+    try:
+        while True:
+            results = data.get("results", [])[:left]
+            left -= len(results)
+            next_url = data.get("next")
+            pending = (_get_executor(prefetch=True).submit(get_page, next_url, None)
+                       if next_url and results and left > 0 else None)
+            if results:
+                yield results
+            if pending is None:
+                return
+            data = pending.result()
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def fetch_values(var: str, *, base: str, device: str, token: str, start_ms: int, end_ms: int,
+                 limit: int, fallback_status: Tuple[int, ...] = FALLBACK_STATUS) -> pd.DataFrame:
+    """
+    Semua halaman /values dalam jendela (maks. `limit` titik terbaru), urut naik.
+    Melempar ValuesUnavailable jika /values ditolak sehingga pemanggil bisa fallback ke /lv.
+    Jika permintaan yang mencakup jendela ini sedang berjalan, hasilnya dipakai bersama lalu dipotong;
+    bila hasil leader terpotong limit-nya dan memuat < limit titik di jendela ini → ambil sendiri.
+    """
+    def fetch() -> pd.DataFrame:
+        frames = [decode_results(page, var) for page in iter_value_pages(
+            var, base=base, device=device, token=token, start_ms=start_ms, end_ms=end_ms, limit=limit,
+            fallback_status=fallback_status)]
+        if not frames:
+            return empty_frame()
+        return pd.concat(frames[::-1], ignore_index=True)  # halaman terakhir = titik tertua
+
+    df, shared = FLIGHTS.do((base, device, var, token, fallback_status), start_ms, end_ms, limit, fetch)
+    if not shared:
+        return df
+    t = df["time"]
+    lo, hi = pd.to_datetime(start_ms, unit="ms", utc=True), pd.to_datetime(end_ms, unit="ms", utc=True)
+    own = df[(t >= lo) & (t <= hi)]
+    if len(own) < limit and len(df) >= limit:
+        return fetch()   # titik lama jendela ini mungkin terbuang oleh limit leader
+    return own.tail(limit).reset_index(drop=True)
+
+
+def fetch_var(var: str, *, base: str, device: str, token: str, days_back: int,
+              limit_points: int, end_ms: Optional[int] = None) -> pd.DataFrame:
+    """
+    Ambil 1 variabel dari Ubidots /values dengan fallback /lv.
+    Return DataFrame: [time (UTC tz-aware), value, variable]. Error HTTP dilempar ke pemanggil.
+    """
+    end = end_ms if end_ms is not None else now_ms()
+    start = end - days_back * DAY_MS
+    conn = dict(base=base, device=device, token=token)
+    try:
+        df = fetch_values(var, start_ms=start, end_ms=end, limit=limit_points, **conn)
+    except ValuesUnavailable:
+        df = empty_frame()
+    if df.empty:
+        return fetch_lv(var, default_ts=end, **conn)
+    return df
+
+
+def fetch_tail(var: str, *, base: str, device: str, token: str, start_ms: int, end_ms: int, limit: int,
+               store: HistoryStore = STORE, fallback_status: Tuple[int, ...] = FALLBACK_STATUS) -> pd.DataFrame:
+    """
+    Jendela [start_ms, end_ms] dari store (memori/disk). Jika riwayat sudah mencakup jendela —
+    termasuk riwayat yang terpotong limit tetapi sudah berisi `limit` titik sejak start_ms —
+    hanya titik setelah high-water mark (start=hw+1) yang diminta, lalu dipotong ke `limit` titik
+    terbaru; selain itu jendela diambil penuh. Melempar ValuesUnavailable seperti fetch_values.
+    """
+    conn = dict(base=base, device=device, token=token, end_ms=end_ms, limit=limit,
+                fallback_status=fallback_status)
+    hw = store.covering_high_water(device, var, start_ms, min_points=limit)   # satu baca: replace paralel aman
+    if hw is not None:
+        new = fetch_values(var, start_ms=hw + 1, **conn)
+        if len(new) >= limit:
+            # Limit penuh → ada celah sejak hw; hasil ini sama dengan fetch penuh jendela
+            store.replace(device, var, new, since_ms=to_ms(new["time"].iloc[0]))
+        else:
+            store.append(device, var, new, now_ms=end_ms)
+    else:
+        full = fetch_values(var, start_ms=start_ms, **conn)
+        # Jika terpotong limit, jendela yang benar-benar tercakup mulai dari titik tertua
+        since = to_ms(full["time"].iloc[0]) if len(full) >= limit else start_ms
+        store.replace(device, var, full, since_ms=since)
+    return store.window(device, var, start_ms, limit)
+
+
+def fetch_var_incremental(var: str, *, base: str, device: str, token: str, days_back: int,
+                          limit_points: int, end_ms: Optional[int] = None,
+                          store: HistoryStore = STORE) -> pd.DataFrame:
+    """Seperti fetch_var, tetapi lewat fetch_tail (hanya ekor baru sejak high-water mark)."""
+    end = end_ms if end_ms is not None else now_ms()
+    conn = dict(base=base, device=device, token=token)
+    try:
+        out = fetch_tail(var, start_ms=end - days_back * DAY_MS, end_ms=end, limit=limit_points,
+                         store=store, **conn)
+    except ValuesUnavailable:
+        out = empty_frame()
+    if out.empty:
+        return fetch_lv(var, default_ts=end, **conn)
+    return out
+
+
+def _timed_fetch(fetch: Callable[..., pd.DataFrame], var: str, **kwargs) -> pd.DataFrame:
+    """fetch per variabel (Ubidots/Mongo, termasuk retry & fallback) → histogram tahap "fetch"."""
+    with TIMINGS.time("fetch", variable=var):
+        return fetch(var, **kwargs)
+
+
+def fetch_many(vars_: Iterable[str], *, base: str, device: str, token: str, days_back: int,
+               limit_points: int, incremental: bool = False,
+               fetch: Optional[Callable[..., pd.DataFrame]] = None) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Ambil banyak variabel sekaligus secara paralel (satu jendela waktu yang sama).
+    incremental=True → hanya ekor baru sejak high-water mark per variabel (lihat history_store).
+    fetch → fungsi per variabel lain dengan signature fetch_var (mis. mongo_store.fetch_var_mongo_first).
+    Return: ({var: df}, {var: pesan_error}) — urutan mengikuti vars_.
+    """
+    vars_ = list(vars_)
+    end = now_ms()
+    fetch = fetch or (fetch_var_incremental if incremental else fetch_var)
+    ex = _get_executor()
+    futures = {
+        v: ex.submit(_timed_fetch, fetch, v, base=base, device=device, token=token,
+                     days_back=days_back, limit_points=limit_points, end_ms=end)
+        for v in vars_
+    }
+    frames, errors = {}, {}
+    for v, fut in futures.items():
+        try:
+            frames[v] = fut.result()
+        except Exception as e:
+            errors[v] = str(e)
+            frames[v] = empty_frame()
+    return frames, errors
+
+
+def list_devices(*, base: str, token: str, prefix: str = "") -> List[str]:
+    """Label semua device di akun (/datasources, ikuti `next`), opsional disaring awalan label."""
+    session = get_session(token)
+    url, params, labels = f"{base}/api/v1.6/datasources/", {"page_size": PAGE_SIZE}, []
+    while url:
+        def get_page(url=url, params=params) -> dict:
+            r = session.get(url, params=params, timeout=VALUES_TIMEOUT)
+            r.raise_for_status()
+            return parse_json(r.content)
+        data = retry_call(get_page)
+        labels += [d["label"] for d in data.get("results", []) if str(d.get("label", "")).startswith(prefix)]
+        url, params = data.get("next"), None
+    return sorted(labels)
+
+
+def fetch_fleet(devices: Iterable[str], vars_: Iterable[str], *, base: str, token: str, days_back: int,
+                limit_points: int, fetch: Optional[Callable[..., pd.DataFrame]] = None
+                ) -> Tuple[pd.DataFrame, Dict[Tuple[str, str], str]]:
+    """
+    Banyak device × variabel lewat thread pool bersama (paralelisme dibatasi MAX_WORKERS,
+    berapa pun jumlah device). Return: (long [time, value, variable, device], {(device, var): error}).
+    """
+    end = now_ms()
+    fetch = fetch or fetch_var_incremental
+    ex = _get_executor()
+    futures = {
+        (d, v): ex.submit(_timed_fetch, fetch, v, base=base, device=d, token=token,
+                          days_back=days_back, limit_points=limit_points, end_ms=end)
+        for d in devices for v in vars_
+    }
+    frames, errors = [], {}
+    for (d, v), fut in futures.items():
+        try:
+            df = fut.result()
+        except Exception as e:
+            errors[(d, v)] = str(e)
+            continue
+        if not df.empty:
+            frames.append(df.assign(device=d))
+    if not frames:
+        return empty_frame().assign(device=pd.Series(dtype=str)), errors
+    return pd.concat(frames, ignore_index=True), errors